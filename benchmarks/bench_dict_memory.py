@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark of utils.object_to_dict in default and compact form.
+
+Converts the same packet a number of times, keeping every result alive as a
+corpus loader would, and reports the memory retained per copy as measured by
+tracemalloc.
+
+Usage::
+
+    python benchmarks/bench_dict_memory.py [--copies N] [--file PATH]
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+
+from libxmp import XMPMeta
+from libxmp.utils import object_to_dict
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir,
+                      'test', 'samples', 'BlueSquare.xmp')
+
+
+def retained(xmp, copies, compact):
+    """Return bytes retained by `copies` results of object_to_dict."""
+    gc.collect()
+    tracemalloc.start()
+    results = [object_to_dict(xmp, compact=compact) for _ in range(copies)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--copies', type=int, default=1000,
+                        help='results kept alive (default: %(default)s)')
+    parser.add_argument('--file', default=SAMPLE,
+                        help='XMP packet to convert (default: BlueSquare.xmp)')
+    args = parser.parse_args()
+
+    with open(args.file, 'r') as fptr:
+        xmp = XMPMeta(xmp_str=fptr.read())
+
+    # Warm up so one-off allocations (interned names, shared flags) are not
+    # attributed to the first measured mode.
+    object_to_dict(xmp, compact=True)
+
+    default = retained(xmp, args.copies, False)
+    compact = retained(xmp, args.copies, True)
+    print('{0:<10}{1:>16}'.format('format', 'bytes per copy'))
+    print('{0:<10}{1:>16.0f}'.format('default', default / args.copies))
+    print('{0:<10}{1:>16.0f}'.format('compact', compact / args.copies))
+    print('reduction: {0:.1f}x'.format(default / compact))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of XMPMeta.from_dict against setting each property in turn.
+
+Builds a packet holding a single bag of the requested number of items, with
+XMPMeta.from_dict and with one set_property/append_array_item call per node.
+
+Usage::
+
+    python benchmarks/bench_from_dict.py [--items N [N ...]] [--repeat N]
+"""
+import argparse
+import timeit
+
+from libxmp import XMPMeta
+from libxmp.consts import XMP_NS_DC
+from libxmp.utils import object_to_dict
+
+
+def make_dict(items):
+    """Return the object_to_dict output of a packet with `items` subjects."""
+    xmp = XMPMeta()
+    for index in range(items):
+        xmp.append_array_item(XMP_NS_DC, 'subject', 'keyword %d' % index,
+                              {'prop_value_is_array': True})
+    return object_to_dict(xmp)
+
+
+def one_by_one(dxmp):
+    xmp = XMPMeta()
+    for schema, props in dxmp.items():
+        for name, value, options in props:
+            if options['VALUE_IS_ARRAY']:
+                xmp.set_property(schema, name, None,
+                                 prop_value_is_array=True)
+            elif name.endswith(']'):
+                xmp.append_array_item(schema, name[:name.rindex('[')], value)
+            else:
+                xmp.set_property(schema, name, value)
+    return xmp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000],
+                        help='array sizes to build (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='packets built per measurement '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    print('{0:>8}{1:>18}{2:>18}'.format('items', 'one by one (ms)',
+                                        'from_dict (ms)'))
+    for items in args.items:
+        dxmp = make_dict(items)
+        results = []
+        for func in (one_by_one, XMPMeta.from_dict):
+            best = min(timeit.repeat(lambda: func(dxmp), number=args.repeat,
+                                     repeat=3))
+            results.append(best / args.repeat * 1e3)
+        print('{0:>8}{1:>18.3f}{2:>18.3f}'.format(items, *results))
+
+
+if __name__ == '__main__':
+    main()
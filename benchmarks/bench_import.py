@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Import time regression benchmark for libxmp.
+
+Runs a fresh interpreter with ``-X importtime`` for each module, keeps the
+best cumulative import time over several runs, and fails when importing the
+libxmp package exceeds the budget.
+
+Usage::
+
+    python benchmarks/bench_import.py [--runs N] [--budget MS]
+"""
+import argparse
+import subprocess
+import sys
+
+MODULES = ('libxmp', 'libxmp.core', 'libxmp.files', 'libxmp.utils')
+
+
+def import_time(module):
+    """Return the cumulative time in microseconds to import `module`."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           'import ' + module],
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+    for line in proc.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    raise RuntimeError('no import time reported for ' + module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10,
+                        help='interpreters started per module '
+                             '(default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=10.0,
+                        help='maximum time to import libxmp, in ms '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    print('{0:<16}{1:>14}'.format('module', 'import (ms)'))
+    best = {}
+    for module in MODULES:
+        best[module] = min(import_time(module) for _ in range(args.runs)) / 1e3
+        print('{0:<16}{1:>14.3f}'.format(module, best[module]))
+
+    if best['libxmp'] > args.budget:
+        print('import libxmp takes {0:.3f} ms, over the budget of {1} ms'
+              .format(best['libxmp'], args.budget))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of XMPIterator with and without raw option flags.
+
+Walks a synthetic packet holding an array of the requested number of items,
+once decoding the option flags of every node into a dict and once with
+``raw=True``.
+
+Usage::
+
+    python benchmarks/bench_iterator.py [--nodes N] [--repeat N]
+"""
+import argparse
+import timeit
+
+from libxmp import XMPMeta, XMPIterator
+from libxmp.consts import XMP_NS_DC
+
+
+def make_packet(nodes):
+    """Return an XMPMeta with a dc:subject bag of `nodes` items."""
+    xmp = XMPMeta()
+    for index in range(nodes):
+        xmp.append_array_item(XMP_NS_DC, 'subject', 'keyword %d' % index,
+                              {'prop_value_is_array': True})
+    return xmp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=2000,
+                        help='array items in the packet (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='walks per measurement (default: %(default)s)')
+    args = parser.parse_args()
+
+    xmp = make_packet(args.nodes)
+    t_dict = min(timeit.repeat(lambda: list(XMPIterator(xmp)),
+                               number=args.repeat, repeat=3))
+    t_raw = min(timeit.repeat(lambda: list(XMPIterator(xmp, raw=True)),
+                              number=args.repeat, repeat=3))
+    print('{0:<10}{1:>14}'.format('mode', 'walk (ms)'))
+    print('{0:<10}{1:>14.3f}'.format('dict', t_dict / args.repeat * 1e3))
+    print('{0:<10}{1:>14.3f}'.format('raw', t_raw / args.repeat * 1e3))
+    print('speedup: {0:.2f}x'.format(t_dict / t_raw))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of the per-call overhead of the exempi wrappers.
+
+Compares the wrappers in :mod:`libxmp.exempi`, which call function objects
+whose prototypes were bound once when the library was loaded, against the
+former calling convention that looked the routine up through the lazy
+library wrapper and reassigned ``restype``/``argtypes`` on every call.
+
+Usage::
+
+    python benchmarks/bench_prototypes.py [--number N]
+"""
+import argparse
+import ctypes
+import os
+import timeit
+
+from libxmp import exempi
+from libxmp.consts import XMP_NS_DC
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir,
+                      'test', 'samples', 'BlueSquare.xmp')
+
+
+def legacy_get_property(xmp, schema, name):
+    """get_property as it was written before prototypes were bound once."""
+    lib = exempi.EXEMPI._exempi
+    lib.xmp_get_property.restype = exempi.check_error
+    lib.xmp_get_property.argtypes = [ctypes.c_void_p,
+                                     ctypes.c_char_p,
+                                     ctypes.c_char_p,
+                                     ctypes.c_void_p,
+                                     ctypes.POINTER(ctypes.c_uint32)]
+    lib.xmp_string_new.restype = ctypes.c_void_p
+    value = lib.xmp_string_new()
+    prop_bits = ctypes.c_uint32(0)
+    lib.xmp_get_property(xmp,
+                         ctypes.c_char_p(schema.encode('utf-8')),
+                         ctypes.c_char_p(name.encode('utf-8')),
+                         value, ctypes.byref(prop_bits))
+    lib.xmp_string_cstr.restype = ctypes.c_char_p
+    lib.xmp_string_cstr.argtypes = [ctypes.c_void_p]
+    result = lib.xmp_string_cstr(value).decode('utf-8')
+    lib.xmp_string_free.argtypes = [ctypes.c_void_p]
+    lib.xmp_string_free(value)
+    return result, prop_bits.value
+
+
+def legacy_get_error():
+    """get_error as it was written before prototypes were bound once."""
+    lib = exempi.EXEMPI._exempi
+    lib.xmp_get_error.restype = ctypes.c_int32
+    return lib.xmp_get_error()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=100000,
+                        help='calls per measurement (default: %(default)s)')
+    args = parser.parse_args()
+
+    with open(SAMPLE, 'r') as fptr:
+        xmp = exempi.new_empty()
+        exempi.parse(xmp, fptr.read())
+
+    cases = [
+        ('get_error', legacy_get_error, exempi.get_error),
+        ('get_property',
+         lambda: legacy_get_property(xmp, XMP_NS_DC, 'format'),
+         lambda: exempi.get_property(xmp, XMP_NS_DC, 'format')),
+    ]
+    print('{0:<16}{1:>14}{2:>14}{3:>10}'.format('wrapper', 'before (us)',
+                                               'after (us)', 'speedup'))
+    for name, before, after in cases:
+        t_before = min(timeit.repeat(before, number=args.number, repeat=3))
+        t_after = min(timeit.repeat(after, number=args.number, repeat=3))
+        print('{0:<16}{1:>14.3f}{2:>14.3f}{3:>9.2f}x'.format(
+            name, t_before / args.number * 1e6, t_after / args.number * 1e6,
+            t_before / t_after))
+
+    exempi.free(xmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of XMPMeta.set_properties against one set_property call per field.
+
+Fills an empty packet with the requested number of simple properties of
+mixed types, once per method.
+
+Usage::
+
+    python benchmarks/bench_set_properties.py [--props N] [--repeat N]
+"""
+import argparse
+import timeit
+
+from libxmp import XMPMeta
+
+NS = 'http://ns.example.com/bench/1.0/'
+
+
+def make_mapping(props):
+    """Return a mapping of `props` properties of mixed types."""
+    XMPMeta.register_namespace(NS, 'bench')
+    mapping = {}
+    for index in range(props):
+        kind = index % 4
+        value = ('text %d' % index, index, index * 0.5, bool(index % 2))[kind]
+        mapping[(NS, 'bench:p%d' % index)] = value
+    return mapping
+
+
+def one_by_one(mapping):
+    xmp = XMPMeta()
+    for (schema, name), value in mapping.items():
+        if isinstance(value, bool):
+            xmp.set_property_bool(schema, name, value)
+        elif isinstance(value, int):
+            xmp.set_property_int(schema, name, value)
+        elif isinstance(value, float):
+            xmp.set_property_float(schema, name, value)
+        else:
+            xmp.set_property(schema, name, value)
+    return xmp
+
+
+def bulk(mapping, single_parse):
+    xmp = XMPMeta()
+    xmp.set_properties(mapping, single_parse=single_parse)
+    return xmp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--props', type=int, default=2000,
+                        help='properties to set (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='packets built per measurement '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    mapping = make_mapping(args.props)
+    cases = [('set_property', lambda: one_by_one(mapping)),
+             ('set_properties', lambda: bulk(mapping, False)),
+             ('single_parse', lambda: bulk(mapping, True))]
+    print('{0:<16}{1:>14}'.format('method', 'build (ms)'))
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=args.repeat, repeat=3))
+        print('{0:<16}{1:>14.3f}'.format(name, best / args.repeat * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for parsing, serializing, iterating and file I/O.
+
+Times XMPMeta.parse_from_str, XMPMeta.serialize_to_str, full XMPIterator
+walks and utils.object_to_dict over synthetic packets of increasing size and
+over the packets of test/samples, and an XMPFiles open/get/put/close cycle
+on a copy of every sample file.  Results are written as JSON so that runs of
+different releases can be compared with ``--compare``.
+
+Usage::
+
+    python benchmarks/suite.py [--output FILE] [--sizes N [N ...]]
+                               [--compare FILE]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+import libxmp
+from libxmp import XMPError, XMPFiles, XMPMeta, XMPIterator
+from libxmp.consts import XMP_NS_DC
+from libxmp.utils import object_to_dict
+
+SAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'test',
+                       'samples')
+
+
+def measure(func, repeat):
+    """Return (number, best seconds per call) of `func`."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return number, best / number
+
+
+def synthetic_packet(items):
+    """Return an XMPMeta with a bag and a sequence of `items` entries each."""
+    xmp = XMPMeta()
+    for index in range(items):
+        xmp.append_array_item(XMP_NS_DC, 'subject', 'keyword %d' % index,
+                              {'prop_value_is_array': True})
+        xmp.append_array_item(XMP_NS_DC, 'creator', 'creator %d' % index,
+                              {'prop_value_is_array': True,
+                               'prop_array_is_ordered': True})
+    return xmp
+
+
+def packets(sizes):
+    """Yield (name, XMPMeta) for the synthetic and sample packets."""
+    for size in sizes:
+        yield 'synthetic-{0}'.format(size), synthetic_packet(size)
+    for filename in sorted(os.listdir(SAMPLES)):
+        with XMPFiles(file_path=os.path.join(SAMPLES, filename)) as xmpfile:
+            xmp = xmpfile.get_xmp()
+        if xmp is not None:
+            yield filename, xmp
+
+
+def packet_cases(xmp):
+    """Yield (case, func) timing the in-memory operations on `xmp`."""
+    packet = str(xmp)
+
+    def parse():
+        XMPMeta().parse_from_str(packet)
+
+    def serialize():
+        # Serializations are cached until the packet changes.
+        xmp.invalidate()
+        xmp.serialize_to_str()
+
+    yield 'parse_from_str', parse
+    yield 'serialize_to_str', serialize
+    yield 'iterate', lambda: list(XMPIterator(xmp))
+    yield 'object_to_dict', lambda: object_to_dict(xmp)
+
+
+def file_cases(tmpdir):
+    """Yield (name, case, func) timing XMPFiles on a copy of each sample."""
+    for filename in sorted(os.listdir(SAMPLES)):
+        path = os.path.join(tmpdir, filename)
+        shutil.copy(os.path.join(SAMPLES, filename), path)
+        try:
+            with XMPFiles(file_path=path, open_forupdate=True) as xmpfile:
+                xmp = xmpfile.get_xmp()
+                writable = xmp is not None and xmpfile.can_put_xmp(xmp)
+        except XMPError:
+            writable = False
+
+        def cycle(path=path, writable=writable):
+            with XMPFiles() as xmpfile:
+                xmpfile.open_file(path, open_forupdate=writable)
+                xmp = xmpfile.get_xmp()
+                if writable:
+                    xmpfile.put_xmp(xmp)
+
+        yield filename, 'files_update' if writable else 'files_read', cycle
+
+
+def run(sizes, repeat):
+    """Run every case and return the list of results."""
+    results = []
+
+    def record(name, case, func):
+        number, best = measure(func, repeat)
+        results.append({'packet': name, 'case': case, 'number': number,
+                        'seconds': best})
+        print('{0:<24}{1:<20}{2:>14.3f}'.format(name, case, best * 1e3))
+
+    print('{0:<24}{1:<20}{2:>14}'.format('packet', 'case', 'time (ms)'))
+    for name, xmp in packets(sizes):
+        for case, func in packet_cases(xmp):
+            record(name, case, func)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name, case, func in file_cases(tmpdir):
+            record(name, case, func)
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def compare(results, baseline_file):
+    """Print the ratio of each result to the same case of a previous run."""
+    with open(baseline_file) as fptr:
+        baseline = json.load(fptr)
+    previous = {(r['packet'], r['case']): r['seconds']
+                for r in baseline['results']}
+    print('\n{0:<24}{1:<20}{2:>14}'.format('packet', 'case', 'ratio'))
+    for result in results:
+        key = (result['packet'], result['case'])
+        if key in previous:
+            print('{0:<24}{1:<20}{2:>14.2f}'.format(
+                key[0], key[1], result['seconds'] / previous[key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help='JSON file to write (default: %(default)s)')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000],
+                        help='array items of the synthetic packets '
+                             '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='measurements per case, the best is kept '
+                             '(default: %(default)s)')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='results of a previous run to compare against')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    report = {
+        'libxmp': libxmp.__version__,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'results': results,
+    }
+    with open(args.output, 'w') as fptr:
+        json.dump(report, fptr, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -34,10 +34,7 @@
 
 """XMP I/O wrapping Exempi"""
 
-import ctypes
-import ctypes.util
-from ctypes.util import find_library
-import os
+import importlib
 
 class ExempiLoadError(Exception):
     """ Error signaling that the Exempi library cannot be loaded. """
@@ -45,15 +42,38 @@ class ExempiLoadError(Exception):
 
 class XMPError(Exception):
     """ General XMP Error. """
-    pass
+    #: Exempi error code when raised for a failed library routine, else None.
+    code = None
 
-# Import classes into global namespace
-from .core import XMPMeta, XMPIterator
-from . import files, core, version
-from .files import XMPFiles
-__version__ = version.VERSION
+# Submodules and classes are imported on first access (PEP 562), so that
+# "import libxmp" does not load ctypes and the exempi bindings.
+_SUBMODULES = ('batch', 'consts', 'core', 'exempi', 'files', 'index',
+               'instrument', 'metrics', 'patch', 'utils', 'version')
+_LAZY_ATTRS = {
+    'XMPMeta': ('core', 'XMPMeta'),
+    'XMPIterator': ('core', 'XMPIterator'),
+    'XMPFiles': ('files', 'XMPFiles'),
+    'diff': ('patch', 'diff'),
+    'apply_patch': ('patch', 'apply_patch'),
+    '__version__': ('version', 'VERSION'),
+}
 
 __all__ = ['XMPMeta', 'XMPFiles', 'XMPError', 'ExempiLoadError', 'files',
-           'core']
+           'core', 'diff', 'apply_patch']
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    try:
+        module, attr = _LAZY_ATTRS[name]
+    except KeyError:
+        raise AttributeError("module {0!r} has no attribute {1!r}"
+                             .format(__name__, name)) from None
+    value = getattr(importlib.import_module('.' + module, __name__), attr)
+    globals()[name] = value
+    return value
+
 
-from . import exempi
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_LAZY_ATTRS))
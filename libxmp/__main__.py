@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Command line interface of libxmp.
+
+``python -m libxmp dump`` writes the XMP of files as newline-delimited JSON,
+one line per file, reading them with a pool of workers::
+
+    python -m libxmp dump photos/ --schema dc --property dc:subject \
+        --workers 8 --output photos.ndjson
+
+Each line is an object with the ``path`` of the file, its ``xmp`` as
+returned by :func:`libxmp.utils.object_to_dict`, or null if it has none,
+and the ``error`` that prevented reading it, or null; a file that cannot be
+read does not stop the dump. Lines are written as files are read, so the
+output of a large tree is never held in memory.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+
+from . import XMPError
+from . import batch
+from . import exempi as _cexempi
+
+__all__ = ['main']
+
+
+def _schema_uri(schema):
+    """Resolve a namespace prefix such as 'dc' to its URI; URIs, which
+    contain '/' or '#', are returned unchanged."""
+    if '/' in schema or '#' in schema:
+        return schema
+    return _cexempi.prefix_namespace_uri(schema.rstrip(':'))
+
+
+def _selected(name, properties):
+    """Tell whether the property path name is, or is below, one of the
+    properties."""
+    for prop in properties:
+        if name == prop or (name.startswith(prop)
+                            and name[len(prop)] in '[/?'):
+            return True
+    return False
+
+
+def _filter(xmp, schemas, properties):
+    """Keep the given schemas and properties of an object_to_dict result."""
+    if schemas:
+        xmp = {uri: props for uri, props in xmp.items() if uri in schemas}
+    if properties:
+        xmp = {uri: [prop for prop in props
+                     if _selected(prop[0], properties)]
+               for uri, props in xmp.items()}
+        xmp = {uri: props for uri, props in xmp.items() if props}
+    return xmp
+
+
+def dump(args):
+    """Run the dump command, returning the exit status."""
+    try:
+        schemas = set(_schema_uri(schema) for schema in args.schema)
+    except XMPError:
+        sys.stderr.write('dump: unknown namespace prefix in {0}\n'
+                         .format(', '.join(args.schema)))
+        return 2
+
+    failed = []
+
+    def report(err):
+        failed.append(err)
+        sys.stderr.write('dump: cannot list {0}: {1}\n'
+                         .format(err.filename, err.strerror))
+
+    output = sys.stdout
+    if args.output != '-':
+        output = open(args.output, 'w')
+    try:
+        paths = itertools.chain.from_iterable(
+            batch.iter_paths(path, report) for path in args.paths)
+        if output is not sys.stdout:
+            # Do not read the output file, which is being written, when it
+            # lies in the tree being dumped.
+            output_path = os.path.abspath(args.output)
+            paths = (path for path in paths
+                     if os.path.abspath(path) != output_path)
+        for result in batch.extract(paths, workers=args.workers,
+                                    executor=args.executor,
+                                    ordered=args.ordered,
+                                    compact=args.compact):
+            xmp = result.xmp
+            if xmp is not None and (schemas or args.property):
+                xmp = _filter(xmp, schemas, args.property)
+            error = None if result.error is None else str(result.error)
+            output.write(json.dumps({'path': os.fsdecode(result.path),
+                                     'xmp': xmp, 'error': error}))
+            output.write('\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+def _positive_int(text):
+    """Argument type accepting integers greater than zero."""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(
+            'must be a positive integer, not {0!r}'.format(text))
+    return value
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m libxmp',
+                                     description='XMP metadata tools.')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    parser_dump = commands.add_parser(
+        'dump', help='write the XMP of files as JSON lines',
+        description='Write the XMP of files as newline-delimited JSON, one '
+                    'line per file.')
+    parser_dump.add_argument('paths', nargs='+', metavar='path',
+                             help='file or directory to walk recursively')
+    parser_dump.add_argument('-o', '--output', default='-',
+                             help='output file (default: standard output)')
+    parser_dump.add_argument('-s', '--schema', action='append', default=[],
+                             help='only output this schema, given by '
+                                  'namespace URI or prefix; repeatable')
+    parser_dump.add_argument('-p', '--property', action='append',
+                             default=[],
+                             help='only output this property and its '
+                                  'children, e.g. dc:creator; repeatable')
+    parser_dump.add_argument('-j', '--workers', type=_positive_int,
+                             default=None,
+                             help='parallel workers (default: number of '
+                                  'CPUs)')
+    parser_dump.add_argument('--executor', choices=['thread', 'process'],
+                             default='thread',
+                             help='worker pool type (default: %(default)s)')
+    parser_dump.add_argument('--ordered', action='store_true',
+                             help='write files in input order instead of '
+                                  'as they are read')
+    parser_dump.add_argument('--compact', action='store_true',
+                             help='write property options as integer bit '
+                                  'masks instead of objects')
+    parser_dump.set_defaults(func=dump)
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    :param argv: Arguments, sys.argv[1:] if None.
+    :returns: The exit status.
+    """
+    args = _parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # The reader went away, e.g. "python -m libxmp dump . | head".
+        sys.stderr.close()
+        sys.exit(1)
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Reading and writing XMP of many files at once.
+
+:func:`extract` reads the XMP of every file in an iterable of paths or a
+directory tree using a pool of threads or processes, and streams the results
+back as they become available::
+
+    from libxmp import batch
+
+    for result in batch.extract('/data/photos', workers=8):
+        if result.error is None:
+            print(result.path, len(result.xmp))
+
+:func:`apply` edits the XMP of many files the same way::
+
+    def stamp_rights(xmp):
+        xmp.set_localized_text(consts.XMP_NS_DC, 'rights', None, 'x-default',
+                               'Copyright ACME')
+
+    for result in batch.apply('/data/photos', stamp_rights,
+                              journal='rights.log'):
+        if not result.ok:
+            print(result.path, result.error)
+
+Only a bounded number of files are in flight at any time, so memory use does
+not grow with the size of the tree.
+"""
+import collections
+import concurrent.futures
+import json
+import os
+import time
+
+from .consts import XMP_CLOSE_NOOPTION, XMP_CLOSE_SAFEUPDATE
+from .core import XMPMeta
+from .files import XMPFilesPool
+from .patch import apply_patch
+from .utils import object_to_dict
+
+__all__ = ['extract', 'ExtractResult', 'apply', 'ApplyResult', 'iter_paths']
+
+ExtractResult = collections.namedtuple('ExtractResult',
+                                       ['path', 'xmp', 'error'])
+ExtractResult.__doc__ = """
+Outcome of extracting the XMP of a single file.
+
+``xmp`` is the dictionary produced by :func:`libxmp.utils.object_to_dict`,
+or None if the file has no XMP or could not be read. ``error`` is the
+exception raised while reading the file, or None on success.
+"""
+
+ApplyResult = collections.namedtuple('ApplyResult',
+                                     ['path', 'ok', 'changed', 'in_place',
+                                      'duration', 'error'])
+ApplyResult.__doc__ = """
+Outcome of editing the XMP of a single file.
+
+``ok`` tells whether the edit succeeded, in which case ``error`` is None,
+otherwise ``error`` is the exception raised. ``changed`` is True if the edit
+modified the XMP and the file was written. ``in_place`` is True if the new
+packet was written over the old one within its padding, without rewriting
+the rest of the file, see :meth:`libxmp.files.XMPFiles.put_xmp`; a safe
+update is never in place.
+``duration`` is the time spent on the file, in seconds.
+"""
+
+# Native file handles reused by the workers of this process.
+_HANDLES = XMPFilesPool()
+
+_EXECUTORS = {
+    'thread': concurrent.futures.ThreadPoolExecutor,
+    'process': concurrent.futures.ProcessPoolExecutor,
+}
+
+
+def _raise(err):
+    raise err
+
+
+def iter_paths(source, onerror=None):
+    """
+    Yield the file paths of a path, a directory or an iterable of paths.
+
+    Directories are walked recursively, in sorted order. Other paths are
+    yielded as they are, whether they exist or not.
+
+    :param source: A file path, a directory or an iterable of file paths.
+    :param onerror: Function called with the :class:`OSError` raised when a
+        directory of the tree cannot be listed, after which the walk goes on
+        without it. If None, the error is raised.
+    :raises OSError: if a directory cannot be listed and `onerror` is None.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        if not os.path.isdir(source):
+            yield source
+            return
+        walk = os.walk(source, onerror=onerror or _raise)
+        for dirpath, dirnames, filenames in walk:
+            dirnames.sort()
+            for filename in sorted(filenames):
+                yield os.path.join(dirpath, filename)
+    else:
+        for path in source:
+            yield path
+
+
+def _extract_file(path, compact):
+    """Read the XMP of a single file. Runs inside a worker."""
+    try:
+        with _HANDLES.handle() as xmpfile:
+            xmpfile.open_file(path, open_read=True)
+            try:
+                xmp = xmpfile.get_xmp()
+            finally:
+                xmpfile.close_file()
+        if xmp is None:
+            return ExtractResult(path, None, None)
+        return ExtractResult(path, object_to_dict(xmp, compact=compact), None)
+    except Exception as err:
+        return ExtractResult(path, None, err)
+
+
+def _apply_file(path, edit, safe_update):
+    """Edit the XMP of a single file. Runs inside a worker."""
+    start = time.perf_counter()
+    changed = in_place = False
+    try:
+        with _HANDLES.handle() as xmpfile:
+            xmpfile.open_file(path, open_forupdate=True)
+            close_flags = XMP_CLOSE_NOOPTION
+            try:
+                xmp = xmpfile.get_xmp() or XMPMeta()
+                fingerprint = xmp.fingerprint()
+                if callable(edit):
+                    edit(xmp)
+                else:
+                    apply_patch(xmp, edit)
+                changed = xmp.fingerprint() != fingerprint
+                if changed and safe_update:
+                    xmpfile.put_xmp(xmp)
+                    close_flags = XMP_CLOSE_SAFEUPDATE
+                elif changed:
+                    in_place = xmpfile.put_xmp(xmp, in_place=True)
+            finally:
+                xmpfile.close_file(close_flags)
+        error = None
+    except Exception as err:
+        error = err
+    return ApplyResult(path, error is None, changed, in_place,
+                       time.perf_counter() - start, error)
+
+
+def _run(func, paths, args, workers, executor, ordered, max_in_flight):
+    """Call func(path, *args) for every path in a pool.
+
+    The arguments are checked straight away rather than when the returned
+    generator of results is first iterated.
+    """
+    try:
+        executor_class = _EXECUTORS[executor]
+    except KeyError:
+        raise ValueError("executor must be one of {0}, not {1!r}".format(
+            sorted(_EXECUTORS), executor))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers < 1:
+        raise ValueError("workers must be at least 1, not {0!r}".format(
+            workers))
+    if max_in_flight is None:
+        max_in_flight = 4 * workers
+    max_in_flight = max(1, max_in_flight)
+    return _results(func, paths, args, executor_class, workers, ordered,
+                    max_in_flight)
+
+
+def _results(func, paths, args, executor_class, workers, ordered,
+             max_in_flight):
+    """Generator of the results of _run."""
+    pending = collections.deque() if ordered else set()
+    exhausted = False
+
+    with executor_class(max_workers=workers) as pool:
+        try:
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        path = next(paths)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = pool.submit(func, path, *args)
+                    if ordered:
+                        pending.append(future)
+                    else:
+                        pending.add(future)
+
+                if not pending:
+                    break
+
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, pending = concurrent.futures.wait(
+                        pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        finally:
+            # Do not run work nobody will collect if the caller stops early.
+            for future in pending:
+                future.cancel()
+
+
+def extract(source, workers=None, executor='thread', ordered=False,
+            max_in_flight=None, compact=False, onerror=None):
+    """
+    Extract the XMP of many files in parallel.
+
+    :param source: A file path, a directory to walk recursively or an
+        iterable of file paths.
+    :param workers: Number of worker threads or processes. Defaults to the
+        number of CPUs.
+    :param executor: ``'thread'`` or ``'process'``.
+    :param ordered: If True, results are yielded in input order, otherwise in
+        order of completion.
+    :param max_in_flight: Maximum number of files submitted but not yet
+        yielded. Defaults to four times the number of workers.
+    :param compact: Use the compact format of
+        :func:`libxmp.utils.object_to_dict`.
+    :param onerror: Handler of directories that cannot be listed, see
+        :func:`iter_paths`.
+    :return: A generator of :class:`ExtractResult`, one per file. Errors
+        reading a file are reported in its result and do not stop the run.
+    :raises OSError: if a directory cannot be listed and `onerror` is None.
+    :raises ValueError: if `executor` or `workers` is invalid, as soon as the
+        function is called.
+    """
+    return _run(_extract_file, iter_paths(source, onerror), (compact,),
+                workers, executor, ordered, max_in_flight)
+
+
+def _read_journal(journal):
+    """Return the paths recorded as successfully edited in a journal."""
+    done = set()
+    try:
+        with open(journal, 'r') as fptr:
+            for line in fptr:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Line cut short by an interruption.
+                    continue
+                if entry.get('ok'):
+                    done.add(entry['path'])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def apply(source, edit, workers=None, executor='thread', ordered=False,
+          max_in_flight=None, safe_update=True, journal=None, onerror=None):
+    """
+    Edit the XMP of many files in parallel.
+
+    Each file is opened for update and its XMP, or an empty packet if it has
+    none, is passed to `edit`. The file is only written if the XMP was
+    modified.
+
+    :param source: A file path, a directory to walk recursively or an
+        iterable of file paths.
+    :param edit: Either a function called with the
+        :class:`libxmp.core.XMPMeta` of each file, which it modifies in place,
+        or a patch as returned by :func:`libxmp.diff`. With the process
+        executor, the function must be picklable, i.e. defined at the top
+        level of a module.
+    :param workers: Number of worker threads or processes. Defaults to the
+        number of CPUs.
+    :param executor: ``'thread'`` or ``'process'``.
+    :param ordered: If True, results are yielded in input order, otherwise in
+        order of completion.
+    :param max_in_flight: Maximum number of files submitted but not yet
+        yielded. Defaults to four times the number of workers.
+    :param bool safe_update: Close modified files with
+        :data:`libxmp.consts.XMP_CLOSE_SAFEUPDATE`, so that the file is
+        written to a temporary copy which then replaces the original.
+        Otherwise the new packet is written over the old one when it fits
+        in its padding, and the file is updated by exempi if it does not.
+    :param journal: Optional path of a file recording the outcome of every
+        file, one JSON object per line. Files already recorded as successful
+        in it are skipped, so an interrupted run can be resumed by calling
+        this function again with the same journal.
+    :param onerror: Handler of directories that cannot be listed, see
+        :func:`iter_paths`.
+    :return: A generator of :class:`ApplyResult`, one per file not skipped.
+        Errors are reported in the file's result and do not stop the run.
+    :raises OSError: if a directory cannot be listed and `onerror` is None.
+    :raises ValueError: if `executor` or `workers` is invalid, as soon as the
+        function is called.
+    """
+    paths = iter_paths(source, onerror)
+    if journal is not None:
+        done = _read_journal(journal)
+        paths = (path for path in paths if os.fsdecode(path) not in done)
+    results = _run(_apply_file, paths, (edit, safe_update), workers,
+                   executor, ordered, max_in_flight)
+    if journal is None:
+        return results
+    return _journaled(journal, results)
+
+
+def _journaled(journal, results):
+    """Yield the results of apply, recording them in the journal."""
+    with open(journal, 'a') as fptr:
+        for result in results:
+            entry = result._asdict()
+            entry['path'] = os.fsdecode(result.path)
+            entry['error'] = None if result.error is None else str(result.error)
+            fptr.write(json.dumps(entry) + '\n')
+            fptr.flush()
+            yield result
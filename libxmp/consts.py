@@ -37,6 +37,7 @@
 """
 Constants from exempi headers.
 """
+import enum
 
 #
 # Open options
@@ -170,6 +171,29 @@ XMP_PROP_ARRAY_FORM_MASK  = XMP_PROP_VALUE_IS_ARRAY    | XMP_PROP_ARRAY_IS_ORDER
 XMP_PROP_COMPOSITE_MASK   = XMP_PROP_VALUE_IS_STRUCT | XMP_PROP_ARRAY_FORM_MASK  #Is it simple or composite (array or struct)?
 XMP_IMPL_RESERVED_MASK    = 0x70000000   # Reserved for transient use by the implementation.
 
+
+class PropFlags(enum.IntFlag):
+    """Property option bits as reported by XMPIterator, as an integer flag.
+
+    Used by the compact output of :func:`libxmp.utils.object_to_dict`.
+    """
+    VALUE_IS_URI     = XMP_PROP_VALUE_IS_URI
+    HAS_QUALIFIERS   = XMP_PROP_HAS_QUALIFIERS
+    IS_QUALIFIER     = XMP_PROP_IS_QUALIFIER
+    HAS_LANG         = XMP_PROP_HAS_LANG
+    HAS_TYPE         = XMP_PROP_HAS_TYPE
+    VALUE_IS_STRUCT  = XMP_PROP_VALUE_IS_STRUCT
+    VALUE_IS_ARRAY   = XMP_PROP_VALUE_IS_ARRAY
+    ARRAY_IS_ORDERED = XMP_PROP_ARRAY_IS_ORDERED
+    ARRAY_IS_ALT     = XMP_PROP_ARRAY_IS_ALT
+    ARRAY_IS_ALTTEXT = XMP_PROP_ARRAY_IS_ALTTEXT
+    IS_ALIAS         = XMP_PROP_IS_ALIAS
+    HAS_ALIASES      = XMP_PROP_HAS_ALIASES
+    IS_INTERNAL      = XMP_PROP_IS_INTERNAL
+    IS_STABLE        = XMP_PROP_IS_STABLE
+    IS_DERIVED       = XMP_PROP_IS_DERIVED
+    IS_SCHEMA        = XMP_PROP_IS_SCHEMA
+
 #####################
 # Common Namespaces #
 #####################
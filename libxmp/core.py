@@ -38,12 +38,16 @@ has no knowledge of files. The core API is provided by the :class:`XMPMeta` and
 :class:`XMPIterator` classes.
 """
 
+import datetime
+import functools
+import hashlib
 import re
 import sys
+import weakref
 
 from . import XMPError
 from . import consts
-from .consts import options_mask, has_option
+from .consts import options_mask
 from .consts import XMP_SERIAL_OPTIONS
 from .consts import XMP_PROP_OPTIONS
 
@@ -51,6 +55,257 @@ from . import exempi as _cexempi
 
 __all__ = ['XMPMeta','XMPIterator']
 
+# Option flags reported for each node by XMPIterator, as (name, bit) pairs.
+_PROP_FLAGS = tuple((opt, getattr(consts, 'XMP_PROP_' + opt))
+                    for opt in ('VALUE_IS_URI', 'IS_QUALIFIER',
+                                'HAS_QUALIFIERS', 'HAS_LANG', 'HAS_TYPE',
+                                'VALUE_IS_STRUCT', 'VALUE_IS_ARRAY',
+                                'ARRAY_IS_ORDERED', 'ARRAY_IS_ALT',
+                                'ARRAY_IS_ALTTEXT', 'IS_ALIAS', 'HAS_ALIASES',
+                                'IS_INTERNAL', 'IS_STABLE', 'IS_DERIVED',
+                                'IS_SCHEMA'))
+
+
+def _mutator(method):
+    """Decorator for XMPMeta methods that modify the packet.
+
+    Drops everything cached about the packet before running the method.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.invalidate()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Exempi setter, accepted value types and value conversion for each type
+# name accepted by XMPMeta.set_properties.
+_SETTER_KINDS = {'str': ('str', (str, int, float), str),
+                 'bool': ('bool', (bool,), None),
+                 'int': ('int32', (int,), None),
+                 'long': ('int64', (int,), None),
+                 'float': ('float', (int, float), float),
+                 'datetime': ('date', (datetime.datetime,), None)}
+
+# Bits of the integers taken by the exempi int setters.
+_INT_BITS = {'int32': 32, 'int64': 64}
+
+# Property names, with or without a prefix, which can be written as a plain
+# RDF element.
+_SIMPLE_NAME = re.compile(r'^(?:([A-Za-z_][\w.-]*):)?[A-Za-z_][\w.-]*$')
+
+
+def _value_kind(value):
+    """Pick the exempi setter for a Python value."""
+    # bool is a subclass of int, so test it first.
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        kind = 'int32' if -2**31 <= value < 2**31 else 'int64'
+        _check_int(kind, value)
+        return kind
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, datetime.datetime):
+        return 'date'
+    if isinstance(value, str):
+        return 'str'
+    raise XMPError('Cannot set a property of type {0}'.format(
+        type(value).__name__))
+
+
+def _check_int(kind, value):
+    """Raise XMPError if an integer would wrap around in its setter."""
+    _cexempi.check_int(value, _INT_BITS[kind])
+
+
+def _rdf_value(kind, value):
+    """Text of a simple property value as XMP stores it, or None."""
+    if kind == 'str':
+        return value
+    if kind == 'bool':
+        return 'True' if value else 'False'
+    if kind in ('int32', 'int64'):
+        return str(int(value))
+    if kind == 'float':
+        # The format exempi's set_property_float uses.
+        return '%f' % float(value)
+    return None
+
+
+def _rdf_escape(text):
+    """Escape text for an RDF/XML element."""
+    # xml.sax.saxutils is not used as it imports urllib, which is slow to
+    # import.  A literal carriage return would be read back as a line feed.
+    return (text.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('\r', '&#xD;'))
+
+
+def _rdf_attr(text):
+    """Quote text as an RDF/XML attribute value."""
+    return '"{0}"'.format(_rdf_escape(text).replace('"', '&quot;')
+                          .replace('\n', '&#10;').replace('\t', '&#9;'))
+
+
+def _option_bits(options):
+    """Option bits from a dict of option names, as XMPIterator yields them, or
+    from an integer bit mask."""
+    if isinstance(options, dict):
+        return sum(bit for opt, bit in _PROP_FLAGS if options.get(opt))
+    return int(options)
+
+
+def _split_path(path):
+    """Split an XMP path into the path of its parent and its last step.
+
+    The parent is None for top-level properties.  The last step is either
+    a qualified name, an array index such as '[2]' or a qualifier name
+    prefixed by '?'.
+    """
+    if path.endswith(']'):
+        index = path.rindex('[')
+        return path[:index], path[index:]
+    index = path.rfind('/')
+    if index < 0:
+        return None, path
+    return path[:index], path[index + 1:]
+
+
+class _RDFNode(object):
+    """Property, array item, field or qualifier of a packet being built."""
+    __slots__ = ('name', 'value', 'flags', 'children', 'qualifiers')
+
+    def __init__(self, name, value, flags):
+        self.name = name
+        self.value = value
+        self.flags = flags
+        self.children = []
+        self.qualifiers = []
+
+
+class _RDFBuilder(object):
+    """Builds an RDF/XML packet from the nodes of XMPIterator."""
+
+    def __init__(self):
+        self.namespaces = {}
+        self.top = []
+        self.nodes = {}
+
+    def add(self, schema_ns, path, value, flags):
+        """
+        Add a node below its parent, which must have been added before.
+
+        :returns: False if the node cannot be represented, in which case it
+            has to be set on the parsed packet afterwards.
+        :raises XMPError: if the value of a simple node is not a str.
+        """
+        if not path or flags & consts.XMP_PROP_IS_SCHEMA:
+            return True
+        if (not flags & (consts.XMP_PROP_VALUE_IS_ARRAY
+                         | consts.XMP_PROP_VALUE_IS_STRUCT)
+                and not isinstance(value, str)):
+            raise XMPError('Value of {0} must be a str, not {1}'.format(
+                path, type(value).__name__))
+        parent_path, step = _split_path(path)
+        node = _RDFNode(step, value, flags)
+
+        if parent_path is None:
+            prefix = step.split(':', 1)[0]
+            if self.namespaces.setdefault(prefix, schema_ns) != schema_ns:
+                return False
+            self.top.append(node)
+        else:
+            parent = self.nodes.get((schema_ns, parent_path))
+            if parent is None:
+                return False
+            composite = parent.flags & (consts.XMP_PROP_VALUE_IS_ARRAY
+                                        | consts.XMP_PROP_VALUE_IS_STRUCT)
+            if step.startswith('?'):
+                node.name = step[1:]
+                if composite and node.name != 'xml:lang':
+                    return False
+                siblings = parent.qualifiers
+            elif step.startswith('['):
+                if not parent.flags & consts.XMP_PROP_VALUE_IS_ARRAY:
+                    return False
+                node.name = 'rdf:li'
+                siblings = parent.children
+            else:
+                if not parent.flags & consts.XMP_PROP_VALUE_IS_STRUCT:
+                    return False
+                siblings = parent.children
+
+            prefix = node.name.split(':', 1)[0]
+            if prefix not in ('rdf', 'xml') and prefix not in self.namespaces:
+                try:
+                    uri = _cexempi.prefix_namespace_uri(prefix)
+                except XMPError:
+                    # Prefix of a namespace registered by the parse, e.g.
+                    # one whose schema comes later in the dictionary.
+                    return False
+                self.namespaces[prefix] = uri
+            siblings.append(node)
+
+        self.nodes[(schema_ns, path)] = node
+        return True
+
+    def packet(self):
+        """Serialize the nodes added so far as an x:xmpmeta element."""
+        out = ['<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+               '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+               '<rdf:Description rdf:about=""']
+        for prefix, uri in self.namespaces.items():
+            out.append(' xmlns:{0}={1}'.format(prefix, _rdf_attr(uri)))
+        out.append('>')
+        for node in self.top:
+            self._emit(node, out)
+        out.append('</rdf:Description></rdf:RDF></x:xmpmeta>')
+        return ''.join(out)
+
+    def _emit(self, node, out):
+        name, flags = node.name, node.flags
+        lang = ''
+        qualifiers = []
+        for qualifier in node.qualifiers:
+            if qualifier.name == 'xml:lang':
+                lang = ' xml:lang={0}'.format(_rdf_attr(qualifier.value))
+            else:
+                qualifiers.append(qualifier)
+
+        if flags & consts.XMP_PROP_VALUE_IS_ARRAY:
+            if flags & consts.XMP_PROP_ARRAY_IS_ALT:
+                form = 'rdf:Alt'
+            elif flags & consts.XMP_PROP_ARRAY_IS_ORDERED:
+                form = 'rdf:Seq'
+            else:
+                form = 'rdf:Bag'
+            out.append('<{0}{1}><{2}>'.format(name, lang, form))
+            for child in node.children:
+                self._emit(child, out)
+            out.append('</{0}></{1}>'.format(form, name))
+        elif flags & consts.XMP_PROP_VALUE_IS_STRUCT:
+            out.append('<{0}{1} rdf:parseType="Resource">'.format(name, lang))
+            for child in node.children:
+                self._emit(child, out)
+            out.append('</{0}>'.format(name))
+        elif qualifiers:
+            out.append('<{0}{1} rdf:parseType="Resource">'.format(name, lang))
+            self._emit_simple('rdf:value', '', node, out)
+            for qualifier in qualifiers:
+                self._emit(qualifier, out)
+            out.append('</{0}>'.format(name))
+        else:
+            self._emit_simple(name, lang, node, out)
+
+    @staticmethod
+    def _emit_simple(name, lang, node, out):
+        if node.flags & consts.XMP_PROP_VALUE_IS_URI:
+            out.append('<{0}{1} rdf:resource={2}/>'.format(
+                name, lang, _rdf_attr(node.value)))
+        else:
+            out.append('<{0}{1}>{2}</{0}>'.format(name, lang,
+                                                  _rdf_escape(node.value)))
+
 
 def _remove_trailing_whitespace(xstr):
     """Remove trailing white space.
@@ -74,6 +329,23 @@ def _remove_trailing_whitespace(xstr):
 class XMPMeta(object):
     """
     XMPMeta is the class providing the core services of the library
+
+    Two instances compare equal if they hold the same property tree, see
+    :func:`fingerprint`. Instances are hashable on the same basis, so an
+    instance used as a dict key or set member must not be modified.
+
+    Serialized output and the fingerprint are cached until the packet is next
+    modified through the methods of this class. Modifying the packet directly
+    through :mod:`libxmp.exempi` with the :attr:`xmpptr` of an instance
+    bypasses this tracking and requires calling :func:`invalidate`
+    afterwards.
+
+    The native XMP object is released when the instance is garbage collected,
+    or as soon as :func:`free` is called. Instances can be used as context
+    managers, in which case :func:`free` is called on exit::
+
+        with XMPMeta(xmp_str=packet) as xmp:
+            creator = xmp.get_property(consts.XMP_NS_DC, 'creator[1]')
     """
 
     def __init__( self, **kwargs ):
@@ -81,6 +353,10 @@ class XMPMeta(object):
         :param xmp_str Optional.
         :param xmp_internal_ref Optional - used for internal purposes.
         """
+        # Serialized output by serialization parameters.
+        self._serialized = {}
+        self._fingerprint = None
+
         if '_xmp_internal_ref' in kwargs:
             self.xmpptr = kwargs['_xmp_internal_ref']
         else:
@@ -91,16 +367,37 @@ class XMPMeta(object):
 
         self.iterator = None
 
-    def __del__(self):
+        # Ensures memory is deallocated when the object is garbage collected.
+        self._finalizer = weakref.finalize(self, _cexempi.free, self.xmpptr)
+        self._finalizer.atexit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
+
+    def free(self):
         """
-        Ensures memory is deallocated when destroying object.
+        Release the native XMP object right away instead of waiting for garbage
+        collection. The instance cannot be used afterwards. Calling this method
+        more than once is harmless.
         """
-        if self.xmpptr is not None:
-            _cexempi.free(self.xmpptr)
-
         if self.iterator is not None:
-            del self.iterator
+            self.iterator.free()
+            self.iterator = None
+        self.invalidate()
+        self._finalizer()
+        self.xmpptr = None
 
+    def invalidate(self):
+        """
+        Forget the cached serializations and fingerprint. Only needed after
+        modifying the packet directly through :mod:`libxmp.exempi`; the
+        methods of this class do it themselves.
+        """
+        self._serialized.clear()
+        self._fingerprint = None
 
     def __iter__(self):
         """
@@ -128,17 +425,58 @@ class XMPMeta(object):
 
         Must be a bytes string in Python 2.
         """
+        try:
+            return self._serialized['str']
+        except KeyError:
+            pass
         xstr = self.serialize_to_str()
         xstr = _remove_trailing_whitespace(xstr)
+        self._serialized['str'] = xstr
         return xstr
 
     def __eq__(self, other):
-        """ Checks if two XMPMeta objects are equal."""
-        return self.xmpptr == other.xmpptr
+        """ Checks if two XMPMeta objects hold the same properties."""
+        if not isinstance(other, XMPMeta):
+            return NotImplemented
+        return self is other or self.fingerprint() == other.fingerprint()
 
     def __ne__(self, other):
-        """ Checks if two XMPMeta object are not equal. """
-        return self.xmpptr != other.xmpptr
+        """ Checks if two XMPMeta object hold different properties. """
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.fingerprint())
+
+    def fingerprint(self):
+        """
+        Compute a digest of the property tree.
+
+        Every node (schema, property, array item, field or qualifier) is hashed
+        from its schema, path, value and option flags, and the node hashes are
+        added together. The result therefore does not depend on the order in
+        which properties or schemas appear in the serialized packet, and is
+        computed in a single walk of the tree. Array items are distinguished
+        by their index in the path.
+
+        :returns: A 16 bytes digest.
+        :rtype: bytes
+        """
+        if self._fingerprint is None:
+            total = 0
+            blake2b = hashlib.blake2b
+            iterator = XMPIterator(self, raw=True)
+            try:
+                for schema, name, value, options in iterator:
+                    node = '{0}\0{1}\0{2}\0{3:x}'.format(schema, name, value,
+                                                         options)
+                    digest = blake2b(node.encode('utf-8'),
+                                     digest_size=16).digest()
+                    total += int.from_bytes(digest, 'big')
+            finally:
+                iterator.free()
+            self._fingerprint = (total % (1 << 128)).to_bytes(16, 'big')
+        return self._fingerprint
 
     # -------------------------------------
     # Functions for getting property values
@@ -167,6 +505,154 @@ class XMPMeta(object):
         value, _ = _cexempi.get_property(self.xmpptr, schema_ns, prop_name)
         return value
 
+    def get_properties(self, props, default=None):
+        """Retrieves the values of several properties at once.
+
+        Cheaper than calling get_property() for each property, and a missing
+        property does not raise an exception.
+
+        :param props: An iterable of (schema_ns, prop_name) tuples; see
+            get_property().
+        :param default: Value reported for properties which do not exist.
+
+        :returns: A dict mapping each (schema_ns, prop_name) tuple to the
+            property's value, or to `default` if the property does not exist.
+        """
+        props = list(props)
+        values = _cexempi.get_properties(self.xmpptr, props)
+        return {prop: (default if value is None else value[0])
+                for prop, value in zip(props, values)}
+
+    @_mutator
+    def set_properties(self, mapping, types=None, single_parse=False):
+        """Sets the values of several properties at once.
+
+        Values are set with the setter matching their Python type: bool,
+        int (32 or 64 bits depending on its magnitude), float,
+        datetime.datetime or str. Integers that do not fit in 64 bits, or in
+        the bits of the type given in `types`, are rejected.
+
+        With `single_parse`, simple top-level properties with a str, bool,
+        int or float value are not set one by one: an RDF description holding
+        them is generated and parsed together with the current packet, which
+        is much faster for large mappings. Other properties are set one by one
+        afterwards.
+
+        :param mapping: A mapping or an iterable of pairs from
+            (schema_ns, prop_name) tuples to values; see set_property().
+        :param types: Optional mapping from some of the (schema_ns, prop_name)
+            keys to a type name overriding the dispatch on the value: one of
+            'str', 'bool', 'int', 'long', 'float' or 'datetime', matching the
+            set_property_* methods. The value must have the matching Python
+            type, except that 'str' also formats an int or a float and
+            'float' also takes an int.
+        :param bool single_parse: Generate RDF and parse it once instead of
+            setting simple properties one by one.
+        :raises XMPError: if a value has an unsupported type or cannot be
+            set.
+        """
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        types = types or {}
+        props = []
+        for (schema_ns, prop_name), value in mapping:
+            key = (schema_ns, prop_name)
+            if key in types:
+                try:
+                    kind, accepted, convert = _SETTER_KINDS[types[key]]
+                except KeyError:
+                    raise XMPError('Unknown property type {0!r}'.format(
+                        types[key]))
+                if not isinstance(value, accepted):
+                    raise XMPError(
+                        'Cannot set a property of type {0} as {1!r}'.format(
+                            type(value).__name__, types[key]))
+                if convert is not None:
+                    value = convert(value)
+                if kind in _INT_BITS:
+                    _check_int(kind, value)
+            else:
+                kind = _value_kind(value)
+            props.append((schema_ns, prop_name, kind, value, 0))
+
+        if single_parse:
+            props = self._set_by_parse(props)
+        _cexempi.set_properties(self.xmpptr, props)
+
+    def _set_by_parse(self, props):
+        """Set simple properties by parsing generated RDF.
+
+        :returns: The properties that could not be included in the RDF.
+        """
+        # Top-level properties already present in the schemas concerned.
+        existing = set()
+        for schema_ns in set(prop[0] for prop in props):
+            iterator = XMPIterator(self, schema_ns, raw=True,
+                                   iter_justchildren=True)
+            try:
+                for schema, name, _, _ in iterator:
+                    existing.add((schema, name))
+            except XMPError:
+                # Schema not registered yet, so nothing to find in it.
+                pass
+            finally:
+                iterator.free()
+
+        namespaces = {}
+        # Registered prefix of each schema, for unprefixed names.
+        prefixes = {}
+        elements = []
+        remaining = []
+        for prop in props:
+            schema, name, kind, value, _ = prop
+            match = _SIMPLE_NAME.match(name)
+            text = _rdf_value(kind, value)
+            prefix = match.group(1) if match is not None else None
+            if match is not None and prefix is None:
+                if schema not in prefixes:
+                    try:
+                        prefixes[schema] = _cexempi.namespace_prefix(
+                            schema).rstrip(':')
+                    except XMPError:
+                        # Unregistered namespace.
+                        prefixes[schema] = None
+                prefix = prefixes[schema]
+                name = '{0}:{1}'.format(prefix, name)
+            if (prefix is None or text is None or (schema, name) in existing
+                    or namespaces.setdefault(prefix, schema) != schema):
+                remaining.append(prop)
+                continue
+            existing.add((schema, name))
+            elements.append('<{0}>{1}</{0}>'.format(name, _rdf_escape(text)))
+
+        if elements:
+            xmlns = ''.join(' xmlns:{0}={1}'.format(prefix, _rdf_attr(uri))
+                            for prefix, uri in namespaces.items())
+            description = '<rdf:Description rdf:about=""{0}>{1}' \
+                          '</rdf:Description>'.format(xmlns, ''.join(elements))
+            packet = self.serialize_to_str(omit_packet_wrapper=True)
+            index = packet.rindex('</rdf:RDF>')
+            packet = packet[:index] + description + packet[index:]
+
+            # Parse into a new object, so that this one is left untouched if
+            # the generated packet is rejected.
+            xmp = XMPMeta()
+            _cexempi.parse(xmp.xmpptr, packet)
+            self._replace(xmp)
+
+        return remaining
+
+    def _replace(self, other):
+        """Take over the native XMP object of other, freeing our own."""
+        if self.iterator is not None:
+            self.iterator.free()
+            self.iterator = None
+        self.invalidate()
+        other._finalizer.detach()
+        self._finalizer()
+        self.xmpptr, other.xmpptr = other.xmpptr, None
+        self._finalizer = weakref.finalize(self, _cexempi.free, self.xmpptr)
+        self._finalizer.atexit = False
 
     def get_array_item(self, schema_ns, array_prop_name, index):
         """Get an item from an array property.
@@ -195,6 +681,7 @@ class XMPMeta(object):
     # -------------------------------------
     # Functions for setting property values
     # -------------------------------------
+    @_mutator
     def set_property(self, schema_ns, prop_name, prop_value, **kwargs ):
         """Creates or sets a property value.
 
@@ -219,6 +706,7 @@ class XMPMeta(object):
         _cexempi.set_property(self.xmpptr, schema_ns, prop_name, prop_value,
                               options)
 
+    @_mutator
     def set_array_item(self, schema_ns, array_name, item_index, item_value,
                        **kwargs):
         """Creates or sets the value of an item within an array.
@@ -250,6 +738,7 @@ class XMPMeta(object):
                                 item_value, options)
 
 
+    @_mutator
     def append_array_item(self, schema_ns, array_name, item_value,
                           array_options=None, **kwargs ):
         """Adds an item to an array, creating the array if necessary.
@@ -372,7 +861,8 @@ class XMPMeta(object):
             first component can be a namespace prefix; if present without a
             schema_ns value, the prefix specifies the namespace.
 
-        :returns: datetime.datetime instance.
+        :returns: datetime.datetime instance, aware of the UTC offset stored
+            in the packet.
 
         :raises: IOError if operation fails.
         """
@@ -404,6 +894,7 @@ class XMPMeta(object):
         return value
 
 
+    @_mutator
     def set_property_bool(self, schema_ns, prop_name, prop_value, **kwargs ):
         """Set a boolean property.
 
@@ -421,6 +912,7 @@ class XMPMeta(object):
         _cexempi.set_property_bool(self.xmpptr, schema_ns, prop_name,
                                    bool(prop_value), options)
 
+    @_mutator
     def set_property_int(self, schema_ns, prop_name, prop_value, **kwargs ):
         """Set an integer property.
 
@@ -438,6 +930,7 @@ class XMPMeta(object):
         _cexempi.set_property_int32(self.xmpptr, schema_ns, prop_name,
                                     int(prop_value), options)
 
+    @_mutator
     def set_property_long(self, schema_ns, prop_name, prop_value, **kwargs ):
         """Set a long integer (int64) property.
 
@@ -455,6 +948,7 @@ class XMPMeta(object):
         _cexempi.set_property_int64(self.xmpptr, schema_ns, prop_name,
                                     prop_value, options)
 
+    @_mutator
     def set_property_float(self, schema_ns, prop_name, prop_value, **kwargs ):
         """Set a floating point property.
 
@@ -473,6 +967,7 @@ class XMPMeta(object):
                                     float(prop_value), options)
 
 
+    @_mutator
     def set_property_datetime(self, schema_ns, prop_name, prop_value, **kwargs):
         """Set a datetime property.
 
@@ -489,6 +984,7 @@ class XMPMeta(object):
                                    prop_value, options)
 
 
+    @_mutator
     def set_localized_text(self, schema_ns, alt_text_name, generic_lang,
                            specific_lang, prop_value, **kwargs):
         """Creates or sets a localized text value.
@@ -519,6 +1015,7 @@ class XMPMeta(object):
     # ------------------------------------------------
     # Functions for deleting and detecting properties.
     # ------------------------------------------------
+    @_mutator
     def delete_localized_text(self, schema_ns, alt_text_name, generic_lang,
                               specific_lang):
         """Remove a localized property.
@@ -539,6 +1036,7 @@ class XMPMeta(object):
                                        generic_lang, specific_lang)
 
 
+    @_mutator
     def delete_property(self, schema_ns, prop_name ):
         """Delete a property from XMP packet.
 
@@ -592,6 +1090,7 @@ class XMPMeta(object):
     # -------------------------------------
     # These functions support parsing serialized RDF into an XMP object, and
     # serializing an XMP object into RDF.  Serialization is always as UTF-8.
+    @_mutator
     def parse_from_str(self, xmp_packet_str, xmpmeta_wrap=False,
                        input_encoding=None ):
         """Parses RDF from a string into a XMP object.
@@ -646,8 +1145,15 @@ class XMPMeta(object):
         :rtype: utf-8 string.
         """
         options = options_mask( XMP_SERIAL_OPTIONS, **kwargs )
-        return _cexempi.serialize_and_format(self.xmpptr, options, padding,
+        key = (options, padding, newlinechr, tabchr, indent)
+        try:
+            return self._serialized[key]
+        except KeyError:
+            pass
+        xstr = _cexempi.serialize_and_format(self.xmpptr, options, padding,
                                              newlinechr, tabchr, indent)
+        self._serialized[key] = xstr
+        return xstr
 
 
 
@@ -699,13 +1205,60 @@ class XMPMeta(object):
             a file).
         """
         options = options_mask(XMP_SERIAL_OPTIONS, **kwargs)
+        key = (options, padding)
+        try:
+            return self._serialized[key]
+        except KeyError:
+            pass
         xstr = _cexempi.serialize(self.xmpptr, options, padding)
+        self._serialized[key] = xstr
         return xstr
 
 
     # -------------------------------------
     # Misceallaneous functions
     # -------------------------------------
+    @classmethod
+    def from_dict(cls, dxmp):
+        """
+        Create an XMP packet from a dictionary, the inverse of
+        :func:`libxmp.utils.object_to_dict`.
+
+        The whole packet is generated as RDF/XML and loaded with a single parse,
+        which is much faster than setting properties one by one for large
+        arrays. The few nodes RDF cannot express directly, such as qualifiers
+        of arrays or structs, are set individually afterwards.
+
+        :param dict dxmp: Mapping from namespace URIs to lists of
+            (name, value, options) entries in document order, as returned by
+            :func:`libxmp.utils.object_to_dict` in either format. Options may
+            be a dict of option names or an integer bit mask.
+        :returns: A new XMPMeta instance.
+        :raises XMPError: if the dictionary does not describe a valid packet.
+        """
+        builder = _RDFBuilder()
+        remaining = []
+        for schema_ns, props in dxmp.items():
+            for name, value, options in props:
+                flags = _option_bits(options)
+                if not builder.add(schema_ns, name, value, flags):
+                    remaining.append((schema_ns, name, value, flags))
+
+        xmp = cls()
+        if builder.top:
+            xmp.parse_from_str(builder.packet())
+        settable = (consts.XMP_PROP_VALUE_IS_URI
+                    | consts.XMP_PROP_VALUE_IS_STRUCT
+                    | consts.XMP_PROP_VALUE_IS_ARRAY
+                    | consts.XMP_PROP_ARRAY_FORM_MASK)
+        for schema_ns, name, value, flags in remaining:
+            if flags & (consts.XMP_PROP_VALUE_IS_ARRAY
+                        | consts.XMP_PROP_VALUE_IS_STRUCT):
+                value = None
+            _cexempi.set_property(xmp.xmpptr, schema_ns, name, value,
+                                  flags & settable)
+        return xmp
+
     def clone( self ):
         """
         Create a new XMP packet from this one.
@@ -782,10 +1335,14 @@ class XMPIterator(object):
     :param obj xmp_obj:   an XMPMeta instance
     :param str schema_ns: Optional namespace URI to restrict the iteration.
     :param str prop_name: Optional property name to restrict the iteration.
+    :param bool raw:      Optional - If True, the option flags of each node are
+        returned as an integer bit mask (see the XMP_PROP_* constants) instead
+        of a dict.  This is considerably faster for large packets.
     :param **kwargs:      Optional keyword arguments from XMP_ITERATOR_OPTIONS
     :returns: an iterator for the given xmp_obj
     """
-    def __init__( self, xmp_obj, schema_ns=None, prop_name=None, **kwargs ):
+    def __init__( self, xmp_obj, schema_ns=None, prop_name=None, raw=False,
+                  **kwargs ):
         if kwargs:
             self.options = options_mask(consts.XMP_ITERATOR_OPTIONS, **kwargs)
         else:
@@ -795,9 +1352,19 @@ class XMPIterator(object):
                                                     prop_name, self.options)
         self.schema = schema_ns
         self.prop_name = prop_name
+        self.raw = raw
 
-    def __del__(self):
-        _cexempi.iterator_free(self.xmpiteratorptr)
+        self._finalizer = weakref.finalize(self, _cexempi.iterator_free,
+                                           self.xmpiteratorptr)
+        self._finalizer.atexit = False
+
+    def free(self):
+        """
+        Release the native iterator right away instead of waiting for garbage
+        collection. The iterator cannot be used afterwards.
+        """
+        self._finalizer()
+        self.xmpiteratorptr = None
 
     def __iter__(self):
         return self
@@ -819,28 +1386,13 @@ class XMPIterator(object):
         :raises: StopIteration
         """
         schema, name, value, options = _cexempi.iterator_next(self.xmpiteratorptr)
+        options = options.value
+
+        if self.raw:
+            return (schema, name, value, options)
 
         #decode option bits into a human-readable format (that is, a dict)
-        opts = { 'VALUE_IS_URI'     : False,
-                 'IS_QUALIFIER'     : False,
-                 'HAS_QUALIFIERS'   : False,
-                 'HAS_LANG'         : False,
-                 'HAS_TYPE'         : False,
-                 'VALUE_IS_STRUCT'  : False,
-                 'VALUE_IS_ARRAY'   : False,
-                 'ARRAY_IS_ORDERED' : False,
-                 'ARRAY_IS_ALT'     : False,
-                 'ARRAY_IS_ALTTEXT' : False,
-                 'IS_ALIAS'         : False,
-                 'HAS_ALIASES'      : False,
-                 'IS_INTERNAL'      : False,
-                 'IS_STABLE'        : False,
-                 'IS_DERIVED'       : False,
-                 'IS_SCHEMA'        : False, }
-
-        for opt in opts:
-            if has_option(options.value, getattr(consts, 'XMP_PROP_' + opt)):
-                opts[opt] = True
+        opts = {opt: bool(options & bit) for opt, bit in _PROP_FLAGS}
 
         return(schema, name, value, opts)
 
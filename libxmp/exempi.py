@@ -35,12 +35,11 @@
 """
 Wrapper functions for individual exempi library routines.
 """
-import ctypes, ctypes.util
+import ctypes
 import datetime
 import os
-import platform
+import threading
 
-import pytz
 
 from . import XMPError, ExempiLoadError
 from .consts import XMP_OPEN_READ, XMP_OPEN_NOOPTION
@@ -49,6 +48,10 @@ def _load_exempi():
     """
     Loads exempi library.
     """
+    # Only needed here, and slow enough to import to matter at startup.
+    import ctypes.util
+    import platform
+
     path = ctypes.util.find_library('exempi')
     if path is None:
         if platform.system().startswith('Darwin'):
@@ -72,14 +75,20 @@ def _load_exempi():
 
 class LazyExempi:
     """Wrapper for ctypes library making it loaded on actual first use.
+
+    When the library is loaded, every routine listed in ``_PROTOTYPES`` is
+    resolved and has its ``restype`` and ``argtypes`` set up once.  The
+    configured function objects are then stored on the instance itself, so
+    that wrapper calls find them without going through ``__getattr__``.
     """
     def __init__(self):
-        self._exempi = None
+        self.__dict__['_exempi'] = None
+        self.__dict__['_lock'] = threading.Lock()
 
     def __getattr__(self, attr):
         if self._exempi is None:
-            self._exempi = _load_exempi()
-            init()
+            self._load()
+            return getattr(self, attr)
         return getattr(self._exempi, attr)
 
     def __setattr__(self, attr, value):
@@ -88,6 +97,25 @@ class LazyExempi:
         else:
             return setattr(self._exempi, attr, value)
 
+    def _load(self):
+        """Load the library and bind all known function prototypes."""
+        with self._lock:
+            if self._exempi is not None:
+                return
+            library = _load_exempi()
+            for name, (restype, argtypes) in _PROTOTYPES.items():
+                try:
+                    func = library[_ALIASES.get(name, name)]
+                except AttributeError:
+                    # Not provided by this version of exempi.
+                    continue
+                func.restype = restype
+                if argtypes is not None:
+                    func.argtypes = argtypes
+                self.__dict__[name] = func
+            init()
+            self._exempi = library
+
 
 EXEMPI = LazyExempi()
 
@@ -156,6 +184,19 @@ class XmpDateTime(ctypes.Structure):
         ("nanosecond",  ctypes.c_int32)]
 
 
+class XmpPacketInfo(ctypes.Structure):
+    """Corresponds to XmpPacketInfo type in exempi headers.
+    """
+    _fields_ = [
+        ("offset",      ctypes.c_int64),
+        ("length",      ctypes.c_int32),
+        ("padSize",     ctypes.c_int32),
+        ("charForm",    ctypes.c_uint8),
+        ("writeable",   ctypes.c_bool),
+        ("hasWrapper",  ctypes.c_bool),
+        ("pad",         ctypes.c_uint8)]
+
+
 def append_array_item(xmp, schema, name, array_options, value, option_bits):
     """Append a value to the XMP property array in the XMP packet.
 
@@ -180,34 +221,15 @@ def append_array_item(xmp, schema, name, array_options, value, option_bits):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_append_array_item.restype = check_error
-    if value is None:
-        EXEMPI.xmp_append_array_item.argtypes = [ctypes.c_void_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_uint32,
-                                                 ctypes.c_uint32,
-                                                 ctypes.c_uint32]
-        EXEMPI.xmp_append_array_item(xmp,
-                                     schema.encode('utf-8'),
-                                     name.encode('utf-8'),
-                                     array_options,
-                                     ctypes.c_uint32(0),
-                                     option_bits)
-    else:
-        EXEMPI.xmp_append_array_item.argtypes = [ctypes.c_void_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_uint32,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_uint32]
-
-        EXEMPI.xmp_append_array_item(xmp,
-                                     schema.encode('utf-8'),
-                                     name.encode('utf-8'),
-                                     array_options,
-                                     value.encode('utf-8'),
-                                     option_bits)
+    if value is not None:
+        value = value.encode('utf-8')
+
+    EXEMPI.xmp_append_array_item(xmp,
+                                 schema.encode('utf-8'),
+                                 name.encode('utf-8'),
+                                 array_options,
+                                 value,
+                                 option_bits)
 
 
 def copy(xmp):
@@ -225,10 +247,8 @@ def copy(xmp):
     newxmp : XmpPtr instance.
         A copy of the XMP packet object.
     """
-    EXEMPI.xmp_copy.restype = ctypes.c_void_p
-    EXEMPI.xmp_copy.argtypes = [ctypes.c_void_p]
     newxmp = EXEMPI.xmp_copy(xmp)
-    return newxmp
+    return _track('xmp', newxmp, 1)
 
 
 def files_can_put_xmp(xfptr, xmp):
@@ -246,8 +266,6 @@ def files_can_put_xmp(xfptr, xmp):
     tf : bool
        True if the XMP packet can be written to the file.
     """
-    EXEMPI.xmp_files_can_put_xmp.restype = ctypes.c_bool
-    EXEMPI.xmp_files_can_put_xmp.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
     value = EXEMPI.xmp_files_can_put_xmp(xfptr, xmp)
     return value == 1
 
@@ -264,8 +282,6 @@ def files_check_file_format(filename):
     """
     if not os.path.exists(filename):
         raise IOError("{0} does not exist.".format(filename))
-    EXEMPI.xmp_files_check_file_format.restype = ctypes.c_int32
-    EXEMPI.xmp_files_check_file_format.argtypes = [ctypes.c_char_p]
     return EXEMPI.xmp_files_check_file_format(filename.encode('utf-8'))
 
 
@@ -293,13 +309,6 @@ def delete_localized_text(xmp, schema, name, generic_lang, specific_lang):
 
     .. versionadded:: 2.0.0
     """
-    EXEMPI.xmp_delete_localized_text.restype = check_error
-    EXEMPI.xmp_delete_localized_text.argtypes = [ctypes.c_void_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_char_p,
-                                                 ctypes.c_char_p]
-
     EXEMPI.xmp_delete_localized_text(xmp,
                                      schema.encode('utf-8'),
                                      name.encode('utf-8'),
@@ -325,10 +334,6 @@ def delete_property(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_delete_property.restype = check_error
-    EXEMPI.xmp_delete_property.argtypes = [ctypes.c_void_p,
-                                           ctypes.c_char_p,
-                                           ctypes.c_char_p]
     EXEMPI.xmp_delete_property(xmp, schema.encode('utf-8'), name.encode('utf-8'))
 
 
@@ -348,8 +353,6 @@ def files_close(xfptr, options):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_files_close.restype = check_error
-    EXEMPI.xmp_files_close.argtypes = [ctypes.c_void_p, ctypes.c_int32]
     EXEMPI.xmp_files_close(xfptr, options)
 
 
@@ -368,9 +371,8 @@ def files_free(xfptr):
     XMPError : if the corresponding library routine fails
 
     """
-    EXEMPI.xmp_files_free.restype = check_error
-    EXEMPI.xmp_files_free.argtypes = [ctypes.c_void_p]
     EXEMPI.xmp_files_free(xfptr)
+    _track('files', xfptr, -1)
 
 
 def files_get_file_info(xfptr):
@@ -398,25 +400,20 @@ def files_get_file_info(xfptr):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_files_get_file_info.restype = check_error
-    EXEMPI.xmp_files_get_file_info.argtypes = [ctypes.c_void_p,
-                                               ctypes.c_void_p,
-                                               ctypes.POINTER(ctypes.c_int32),
-                                               ctypes.POINTER(ctypes.c_int32),
-                                               ctypes.POINTER(ctypes.c_int32)]
-    _file_path = _string_new()
     options = ctypes.c_int32(0)
     file_format = ctypes.c_int32(0)
     handler_flags = ctypes.c_int32(0)
 
-    EXEMPI.xmp_files_get_file_info(xfptr,
-                                   _file_path,
-                                   ctypes.byref(options),
-                                   ctypes.byref(file_format),
-                                   ctypes.byref(handler_flags))
-
-    file_path = string_cstr(_file_path)
-    _string_free(_file_path)
+    _file_path = _acquire_string()
+    try:
+        EXEMPI.xmp_files_get_file_info(xfptr,
+                                       _file_path,
+                                       ctypes.byref(options),
+                                       ctypes.byref(file_format),
+                                       ctypes.byref(handler_flags))
+        file_path = string_cstr(_file_path)
+    finally:
+        _release_string(_file_path)
 
     return file_path, options.value, file_format.value, handler_flags.value
 
@@ -434,10 +431,8 @@ def files_get_new_xmp(xfptr):
     xmp_ptr : ctypes pointer
         XMP pointer
     """
-    EXEMPI.xmp_files_get_new_xmp.restype = ctypes.c_void_p
-    EXEMPI.xmp_files_get_new_xmp.argtypes = [ctypes.c_void_p]
     xmp_ptr = EXEMPI.xmp_files_get_new_xmp(xfptr)
-    return xmp_ptr
+    return _track('xmp', xmp_ptr, 1)
 
 
 def files_get_xmp(xfptr):
@@ -457,14 +452,45 @@ def files_get_xmp(xfptr):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_files_get_xmp.restype = check_error
-    EXEMPI.xmp_files_get_xmp.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
-
     xmp = new_empty()
     EXEMPI.xmp_files_get_xmp(xfptr, xmp)
     return xmp
 
 
+def files_get_xmp_xmpstring(xfptr):
+    """Get the raw XMP packet of the open file and where it is stored.
+
+    Wrapper for xmp_files_get_xmp_xmpstring library routine.
+
+    Parameters
+    ----------
+    xfptr : file pointer
+        File pointer
+
+    Returns
+    -------
+    packet : str
+        The XMP packet as found in the file.
+    packet_info : XmpPacketInfo
+        Offset, length, padding and encoding of the packet in the file.  The
+        offset is negative if the handler does not know it.
+
+    Raises
+    ------
+    XMPError : if the corresponding library routine fails
+    """
+    packet_info = XmpPacketInfo()
+    _packet = _acquire_string()
+    try:
+        EXEMPI.xmp_files_get_xmp_xmpstring(xfptr, _packet,
+                                           ctypes.byref(packet_info))
+        packet = string_cstr(_packet)
+    finally:
+        _release_string(_packet)
+
+    return packet, packet_info
+
+
 def files_open(xfptr, filename, options):
     """Wrapper for xmp_files_open library routine.
 
@@ -472,7 +498,7 @@ def files_open(xfptr, filename, options):
     ----------
     xfptr : object
         XMP file object (with no associated file)
-    filename : str
+    filename : str, bytes or path-like
         File to be opened.
     options : XmpFileOpenOptions
         How the file is to be opened.
@@ -484,11 +510,7 @@ def files_open(xfptr, filename, options):
     if (((not os.path.exists(filename)) and
          ((options == XMP_OPEN_NOOPTION) or (options & XMP_OPEN_READ)))):
         raise IOError("{0} does not exist.".format(filename))
-    EXEMPI.xmp_files_open.restype = check_error
-    EXEMPI.xmp_files_open.argtypes = [ctypes.c_void_p,
-                                      ctypes.c_char_p,
-                                      ctypes.c_int32]
-    EXEMPI.xmp_files_open(xfptr, filename.encode('utf-8'), options)
+    EXEMPI.xmp_files_open(xfptr, os.fsencode(filename), options)
 
 
 def files_new():
@@ -499,10 +521,9 @@ def files_new():
     xfptr : ctypes pointer
         File pointer.
     """
-    EXEMPI.xmp_files_new.restype = ctypes.c_void_p
     xfptr = EXEMPI.xmp_files_new()
 
-    return xfptr
+    return _track('files', xfptr, 1)
 
 
 def files_open_new(filename, options):
@@ -510,7 +531,7 @@ def files_open_new(filename, options):
 
     Parameters
     ----------
-    filename : str
+    filename : str, bytes or path-like
         File to be opened.
     options : XmpFileOpenOptions
         How the file is to be opened.
@@ -522,11 +543,9 @@ def files_open_new(filename, options):
     """
     if not os.path.exists(filename) and options & XMP_OPEN_READ:
         raise IOError("{0} does not exist.".format(filename))
-    EXEMPI.xmp_files_open_new.restype = ctypes.c_void_p
-    EXEMPI.xmp_files_open_new.argtypes = [ctypes.c_void_p, ctypes.c_int32]
-    xfptr = EXEMPI.xmp_files_open_new(filename.encode('utf-8'), options)
+    xfptr = EXEMPI.xmp_files_open_new(os.fsencode(filename), options)
 
-    return xfptr
+    return _track('files', xfptr, 1)
 
 
 def files_put_xmp(xfptr, xmp):
@@ -543,8 +562,6 @@ def files_put_xmp(xfptr, xmp):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_files_put_xmp.restype = check_error
-    EXEMPI.xmp_files_put_xmp.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
     EXEMPI.xmp_files_put_xmp(xfptr, xmp)
 
 
@@ -575,25 +592,19 @@ def get_array_item(xmp, schema, name, index):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_get_array_item.restype = check_error
-    EXEMPI.xmp_get_array_item.argtypes = [ctypes.c_void_p,
-                                          ctypes.c_char_p,
-                                          ctypes.c_char_p,
-                                          ctypes.c_int32,
-                                          ctypes.c_void_p,
-                                          ctypes.POINTER(ctypes.c_uint32)]
-    _item = _string_new()
     property_bits = ctypes.c_uint32(0)
 
-    EXEMPI.xmp_get_array_item(xmp,
-                              schema.encode('utf-8'),
-                              name.encode('utf-8'),
-                              ctypes.c_int32(index),
-                              _item,
-                              ctypes.byref(property_bits))
-
-    item = string_cstr(_item)
-    _string_free(_item)
+    _item = _acquire_string()
+    try:
+        EXEMPI.xmp_get_array_item(xmp,
+                                  schema.encode('utf-8'),
+                                  name.encode('utf-8'),
+                                  ctypes.c_int32(index),
+                                  _item,
+                                  ctypes.byref(property_bits))
+        item = string_cstr(_item)
+    finally:
+        _release_string(_item)
 
     return item, property_bits.value
 
@@ -628,38 +639,71 @@ def get_localized_text(xmp, schema, name, generic_lang, specific_lang):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_get_localized_text.restype = check_error
-    EXEMPI.xmp_get_localized_text.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_void_p,
-                                              ctypes.c_void_p,
-                                              ctypes.POINTER(ctypes.c_uint32)]
-
     if generic_lang is not None:
         generic_lang = generic_lang.encode('utf-8')
 
-    _item = _string_new()
     prop_bits = ctypes.c_uint32(0)
-    _actual_lang = _string_new()
 
-    EXEMPI.xmp_get_localized_text(xmp,
-                                  schema.encode('utf-8'),
-                                  name.encode('utf-8'),
-                                  generic_lang,
-                                  specific_lang.encode('utf-8'),
-                                  _actual_lang, _item,
-                                  ctypes.byref(prop_bits))
+    _item = _acquire_string()
+    _actual_lang = _acquire_string()
+    try:
+        EXEMPI.xmp_get_localized_text(xmp,
+                                      schema.encode('utf-8'),
+                                      name.encode('utf-8'),
+                                      generic_lang,
+                                      specific_lang.encode('utf-8'),
+                                      _actual_lang, _item,
+                                      ctypes.byref(prop_bits))
+        item = string_cstr(_item)
+        actual_lang = string_cstr(_actual_lang)
+    finally:
+        _release_string(_actual_lang)
+        _release_string(_item)
+
+    return item, prop_bits.value, actual_lang
 
-    item = string_cstr(_item)
-    _string_free(_item)
 
-    actual_lang = string_cstr(_actual_lang)
-    _string_free(_actual_lang)
+def get_properties(xmp, props):
+    """Retrieve several properties with a single string.
 
-    return item, prop_bits.value, actual_lang
+    Wrapper for xmp_get_property library routine.  Unlike get_property, a
+    property that cannot be retrieved does not raise an exception.
+
+    Parameters
+    ----------
+    xmp : pointer
+        The XMP packet.
+    props : iterable
+        (schema, name) tuples of the properties to retrieve.
+
+    Returns
+    -------
+    values : list
+        For each requested property, in order, a (value, prop_bits) tuple, or
+        None if the property could not be retrieved.
+    """
+    encoded = {}
+    values = []
+    prop_bits = ctypes.c_uint32(0)
+
+    _value = _acquire_string()
+    try:
+        for schema, name in props:
+            if schema not in encoded:
+                encoded[schema] = schema.encode('utf-8')
+            found = EXEMPI._xmp_get_property_unchecked(xmp,
+                                                       encoded[schema],
+                                                       name.encode('utf-8'),
+                                                       _value,
+                                                       ctypes.byref(prop_bits))
+            if found:
+                values.append((string_cstr(_value), prop_bits.value))
+            else:
+                values.append(None)
+    finally:
+        _release_string(_value)
+
+    return values
 
 
 def get_property(xmp, schema, name):
@@ -685,24 +729,17 @@ def get_property(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_get_property.restype = check_error
-    EXEMPI.xmp_get_property.argtypes = [ctypes.c_void_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_void_p,
-                                        ctypes.POINTER(ctypes.c_uint32)]
-
-    _value = _string_new()
     prop_bits = ctypes.c_uint32(0)
 
-    EXEMPI.xmp_get_property(xmp,
-                            ctypes.c_char_p(schema.encode('utf-8')),
-                            ctypes.c_char_p(name.encode('utf-8')),
-                            _value, ctypes.byref(prop_bits))
-
-    value = string_cstr(_value)
-    _string_free(_value)
+    _value = _acquire_string()
+    try:
+        EXEMPI.xmp_get_property(xmp,
+                                schema.encode('utf-8'),
+                                name.encode('utf-8'),
+                                _value, ctypes.byref(prop_bits))
+        value = string_cstr(_value)
+    finally:
+        _release_string(_value)
 
     return value, prop_bits.value
 
@@ -730,14 +767,6 @@ def get_property_bool(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_get_property_bool.restype = check_error
-    EXEMPI.xmp_get_property_bool.argtypes = [ctypes.c_void_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_char_p,
-                                             ctypes.POINTER(ctypes.c_bool),
-                                             ctypes.POINTER(ctypes.c_uint32)]
-
     bool_value = ctypes.c_bool(0)
     prop_bits = ctypes.c_uint32(0)
 
@@ -764,7 +793,7 @@ def get_property_date(xmp, schema, name):
     Returns
     -------
     date : datetime.datetime
-        Date structure.
+        Date structure, with the UTC offset stored in the packet.
     prop_bits : unsigned int
         option bit mask
 
@@ -772,14 +801,6 @@ def get_property_date(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_get_property_date.restype = check_error
-    EXEMPI.xmp_get_property_date.argtypes = [ctypes.c_void_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_char_p,
-                                             ctypes.POINTER(XmpDateTime),
-                                             ctypes.POINTER(ctypes.c_uint32)]
-
     xmp_date_time = XmpDateTime()
     prop_bits = ctypes.c_uint32(0)
 
@@ -789,22 +810,16 @@ def get_property_date(xmp, schema, name):
                                  ctypes.byref(xmp_date_time),
                                  ctypes.byref(prop_bits))
 
-    date1 = datetime.datetime(xmp_date_time.year,
-                              xmp_date_time.month,
-                              xmp_date_time.day,
-                              xmp_date_time.hour,
-                              xmp_date_time.minute,
-                              xmp_date_time.second)
-    utc = pytz.timezone('utc')
-    utc_date = utc.localize(date1)
-    delta = datetime.timedelta(hours=xmp_date_time.tzhour,
-                               minutes=xmp_date_time.tzminute,
-                               microseconds=xmp_date_time.nanosecond * 1000)
-
-    if xmp_date_time.tzsign < 0:
-        the_date = utc_date - delta
-    else:
-        the_date = utc_date + delta
+    the_date = datetime.datetime(xmp_date_time.year,
+                                 xmp_date_time.month,
+                                 xmp_date_time.day,
+                                 xmp_date_time.hour,
+                                 xmp_date_time.minute,
+                                 xmp_date_time.second,
+                                 xmp_date_time.nanosecond // 1000,
+                                 _fixed_offset(xmp_date_time.tzsign,
+                                               xmp_date_time.tzhour,
+                                               xmp_date_time.tzminute))
 
     return the_date, prop_bits.value
 
@@ -832,14 +847,6 @@ def get_property_int32(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_get_property_int32.restype = check_error
-    EXEMPI.xmp_get_property_int32.argtypes = [ctypes.c_void_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_char_p,
-                                             ctypes.POINTER(ctypes.c_int32),
-                                             ctypes.POINTER(ctypes.c_uint32)]
-
     ivalue = ctypes.c_int32(0)
     prop_bits = ctypes.c_uint32(0)
 
@@ -874,14 +881,6 @@ def get_property_int64(xmp, schema, name):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_get_property_int64.restype = check_error
-    EXEMPI.xmp_get_property_int64.argtypes = [ctypes.c_void_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_char_p,
-                                             ctypes.POINTER(ctypes.c_int64),
-                                             ctypes.POINTER(ctypes.c_uint32)]
-
     ivalue = ctypes.c_int64(0)
     prop_bits = ctypes.c_uint32(0)
 
@@ -921,14 +920,12 @@ def get_property_float(xmp, schema, name):
 
 def free(xmp):
     """Wrapper for xmp_free library routine."""
-    EXEMPI.xmp_free.argtypes = [ctypes.c_void_p]
-    EXEMPI.xmp_free.restype = None
     EXEMPI.xmp_free(xmp)
+    _track('xmp', xmp, -1)
 
 
 def get_error():
     """Wrapper for xmp_get_error library routine."""
-    EXEMPI.xmp_get_error.restype = ctypes.c_int32
     code = EXEMPI.xmp_get_error()
     return code
 
@@ -945,10 +942,6 @@ def has_property(xmp, schema, name):
     name : str
         The name of the property.
     """
-    EXEMPI.xmp_has_property.restype = ctypes.c_bool
-    EXEMPI.xmp_has_property.argtypes = [ctypes.c_void_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_char_p]
     ret = EXEMPI.xmp_has_property(xmp,
                                   schema.encode('utf-8'),
                                   name.encode('utf-8'))
@@ -965,7 +958,6 @@ def init():
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_init.restype = check_error
     EXEMPI.xmp_init()
 
 
@@ -981,10 +973,8 @@ def iterator_free(iterator):
     ------
     XMPError : if the corresponding library routine fails
     """
-
-    EXEMPI.xmp_iterator_free.argtypes = [ctypes.c_void_p]
-    EXEMPI.xmp_iterator_free.restype = check_error
     EXEMPI.xmp_iterator_free(iterator)
+    _track('iterator', iterator, -1)
 
 
 def iterator_next(iterator):
@@ -1008,37 +998,26 @@ def iterator_next(iterator):
     ------
     StopIteration : when the library determines that the iteration is finished.
     """
-
-    EXEMPI.xmp_iterator_next.argtypes = [ctypes.c_void_p,
-                                         ctypes.c_void_p,
-                                         ctypes.c_void_p,
-                                         ctypes.c_void_p,
-                                         ctypes.POINTER(ctypes.c_uint32)]
-    EXEMPI.xmp_iterator_next.restype = ctypes.c_bool
-
-    _schema = _string_new()
-    _propname = _string_new()
-    _propvalue = _string_new()
     options = ctypes.c_uint32(0)
 
-    success = EXEMPI.xmp_iterator_next(iterator, _schema, _propname, _propvalue,
-                                   ctypes.byref(options))
+    _schema = _acquire_string()
+    _propname = _acquire_string()
+    _propvalue = _acquire_string()
+    try:
+        success = EXEMPI.xmp_iterator_next(iterator, _schema, _propname,
+                                           _propvalue, ctypes.byref(options))
+        if success:
+            schema = string_cstr(_schema)
+            propname = string_cstr(_propname)
+            propvalue = string_cstr(_propvalue)
+    finally:
+        _release_string(_propvalue)
+        _release_string(_propname)
+        _release_string(_schema)
 
     if not success:
-        _string_free(_schema)
-        _string_free(_propname)
-        _string_free(_propvalue)
         raise StopIteration()
 
-    schema = string_cstr(_schema)
-    _string_free(_schema)
-
-    propname = string_cstr(_propname)
-    _string_free(_propname)
-
-    propvalue = string_cstr(_propvalue)
-    _string_free(_propvalue)
-
     return schema, propname, propvalue, options
 
 
@@ -1059,13 +1038,6 @@ def iterator_new(xmp, schema, propname, options):
     iterator : XmpIteratorPtr
         iterator for use with iterator_next
     """
-
-    EXEMPI.xmp_iterator_new.argtypes = [ctypes.c_void_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_int32]
-    EXEMPI.xmp_iterator_new.restype = ctypes.c_void_p
-
     if schema is not None:
         schema = schema.encode('utf-8')
 
@@ -1073,7 +1045,7 @@ def iterator_new(xmp, schema, propname, options):
         propname = propname.encode('utf-8')
 
     iterator = EXEMPI.xmp_iterator_new(xmp, schema, propname, options)
-    return iterator
+    return _track('iterator', iterator, 1)
 
 
 def iterator_skip(iterator, options):
@@ -1090,9 +1062,6 @@ def iterator_skip(iterator, options):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_iterator_skip.argtypes = [ctypes.c_void_p,
-                                         ctypes.c_int32]
-    EXEMPI.xmp_iterator_skip.restype = ctypes.c_bool
     success = EXEMPI.xmp_iterator_skip(iterator, options)
     check_error(success)
 
@@ -1117,13 +1086,12 @@ def namespace_prefix(namespace):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_namespace_prefix.restype = check_error
-    EXEMPI.xmp_namespace_prefix.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
-    _prefix = _string_new()
-    EXEMPI.xmp_namespace_prefix(namespace.encode('utf-8'), _prefix)
-
-    prefix = string_cstr(_prefix)
-    _string_free(_prefix)
+    _prefix = _acquire_string()
+    try:
+        EXEMPI.xmp_namespace_prefix(namespace.encode('utf-8'), _prefix)
+        prefix = string_cstr(_prefix)
+    finally:
+        _release_string(_prefix)
 
     return prefix
 
@@ -1139,9 +1107,8 @@ def new_empty():
         Opaque pointer to an XMP string.  It is your responsibility to properly
         dispose of the string.
     """
-    EXEMPI.xmp_new_empty.restype = ctypes.c_void_p
     xmp = EXEMPI.xmp_new_empty()
-    return xmp
+    return _track('xmp', xmp, 1)
 
 
 def parse(xmp, strbuffer):
@@ -1160,11 +1127,6 @@ def parse(xmp, strbuffer):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_parse.restype = check_error
-    EXEMPI.xmp_parse.argtypes = [ctypes.c_void_p,
-                                 ctypes.c_char_p,
-                                 ctypes.c_size_t]
     strbuffer = strbuffer.encode('utf-8')
     EXEMPI.xmp_parse(xmp, strbuffer, len(strbuffer))
 
@@ -1188,15 +1150,12 @@ def prefix_namespace_uri(prefix):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_prefix_namespace_uri.restype = check_error
-    EXEMPI.xmp_prefix_namespace_uri.argtypes = [ctypes.c_char_p,
-                                                ctypes.c_void_p]
-
-    _namespace = _string_new()
-    EXEMPI.xmp_prefix_namespace_uri(prefix.encode('utf-8'), _namespace)
-
-    namespace = string_cstr(_namespace)
-    _string_free(_namespace)
+    _namespace = _acquire_string()
+    try:
+        EXEMPI.xmp_prefix_namespace_uri(prefix.encode('utf-8'), _namespace)
+        namespace = string_cstr(_namespace)
+    finally:
+        _release_string(_namespace)
 
     return namespace
 
@@ -1222,19 +1181,14 @@ def register_namespace(namespace_uri, prefix):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_register_namespace.restype = check_error
-    EXEMPI.xmp_register_namespace.argtypes = [ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_void_p]
-
-    _registered_prefix = _string_new()
-
-    EXEMPI.xmp_register_namespace(namespace_uri.encode('utf-8'),
-                                  prefix.encode('utf-8'),
-                                  _registered_prefix)
-
-    registered_prefix = string_cstr(_registered_prefix)
-    _string_free(_registered_prefix)
+    _registered_prefix = _acquire_string()
+    try:
+        EXEMPI.xmp_register_namespace(namespace_uri.encode('utf-8'),
+                                      prefix.encode('utf-8'),
+                                      _registered_prefix)
+        registered_prefix = string_cstr(_registered_prefix)
+    finally:
+        _release_string(_registered_prefix)
 
     return registered_prefix
 
@@ -1261,16 +1215,12 @@ def serialize(xmp, options, padding):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_serialize.restype = check_error
-    EXEMPI.xmp_serialize.argtypes = [ctypes.c_void_p,
-                                     ctypes.c_void_p,
-                                     ctypes.c_uint32,
-                                     ctypes.c_uint32]
-    _item = _string_new()
-    EXEMPI.xmp_serialize(xmp, _item, options, padding)
-
-    item = string_cstr(_item)
-    _string_free(_item)
+    _item = _acquire_string()
+    try:
+        EXEMPI.xmp_serialize(xmp, _item, options, padding)
+        item = string_cstr(_item)
+    finally:
+        _release_string(_item)
 
     return item
 
@@ -1302,20 +1252,14 @@ def serialize_and_format(xmp, options, padding, newline, tab, indent):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_serialize_and_format.restype = check_error
-    EXEMPI.xmp_serialize_and_format.argtypes = [ctypes.c_void_p,
-                                                ctypes.c_void_p,
-                                                ctypes.c_uint32,
-                                                ctypes.c_uint32,
-                                                ctypes.c_char_p,
-                                                ctypes.c_char_p,
-                                                ctypes.c_int32]
-    _item = _string_new()
-    EXEMPI.xmp_serialize_and_format(xmp, _item, options, padding,
-                                    newline.encode('utf-8'), tab.encode('utf-8'), indent)
-
-    item = string_cstr(_item)
-    _string_free(_item)
+    _item = _acquire_string()
+    try:
+        EXEMPI.xmp_serialize_and_format(xmp, _item, options, padding,
+                                        newline.encode('utf-8'),
+                                        tab.encode('utf-8'), indent)
+        item = string_cstr(_item)
+    finally:
+        _release_string(_item)
 
     return item
 
@@ -1340,33 +1284,15 @@ def set_array_item(xmp, schema, name, index, value, option_bits):
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_set_array_item.restype = check_error
-    if value is None:
-        EXEMPI.xmp_set_array_item.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_int32,
-                                              ctypes.c_uint32,
-                                              ctypes.c_uint32]
-        EXEMPI.xmp_set_array_item(xmp,
-                                  schema.encode('utf-8'),
-                                  name.encode('utf-8'),
-                                  ctypes.c_int32(index),
-                                  ctypes.c_uint32(0),
-                                  option_bits)
-    else:
-        EXEMPI.xmp_set_array_item.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_int32,
-                                              ctypes.c_char_p,
-                                              ctypes.c_uint32]
-        EXEMPI.xmp_set_array_item(xmp,
-                                  schema.encode('utf-8'),
-                                  name.encode('utf-8'),
-                                  ctypes.c_int32(index),
-                                  value.encode('utf-8'),
-                                  option_bits)
+    if value is not None:
+        value = value.encode('utf-8')
+
+    EXEMPI.xmp_set_array_item(xmp,
+                              schema.encode('utf-8'),
+                              name.encode('utf-8'),
+                              ctypes.c_int32(index),
+                              value,
+                              option_bits)
 
 
 def set_localized_text(xmp, schema, name, generic_lang, specific_lang, value,
@@ -1396,15 +1322,6 @@ def set_localized_text(xmp, schema, name, generic_lang, specific_lang, value,
     ------
     XMPError : if the corresponding library routine fails
     """
-    EXEMPI.xmp_set_localized_text.restype = check_error
-    EXEMPI.xmp_set_localized_text.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_uint32]
-
     if generic_lang is not None:
         generic_lang = generic_lang.encode('utf-8')
 
@@ -1430,8 +1347,9 @@ def set_property(xmp, schema, name, value, option_bits=0):
         The schema of the property.
     name : str
         The name of the property.
-    value : str
-        The name of the property.
+    value : str or None
+        The value of the property, None when creating an empty array or
+        struct.
     option_bits : unsigned int
         Mask of options.
 
@@ -1439,18 +1357,12 @@ def set_property(xmp, schema, name, value, option_bits=0):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property.restype = check_error
-    EXEMPI.xmp_set_property.argtypes = [ctypes.c_void_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_char_p,
-                                        ctypes.c_uint32]
-
+    if value is not None:
+        value = value.encode('utf-8')
     EXEMPI.xmp_set_property(xmp,
                             schema.encode('utf-8'),
                             name.encode('utf-8'),
-                            value.encode('utf-8'),
+                            value,
                             ctypes.c_uint32(option_bits))
 
 
@@ -1476,14 +1388,6 @@ def set_property_bool(xmp, schema, name, value, option_bits=0):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property_bool.restype = check_error
-    EXEMPI.xmp_set_property_bool.argtypes = [ctypes.c_void_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_char_p,
-                                             ctypes.c_bool,
-                                             ctypes.c_uint32]
-
     bvalue = ctypes.c_bool(value)
     EXEMPI.xmp_set_property_bool(xmp,
                                  schema.encode('utf-8'),
@@ -1506,7 +1410,8 @@ def set_property_date(xmp, schema, name, the_date, option_bits=0):
     name : str
         The name of the property.
     the_date : datetime.datetime
-        The date and time
+        The date and time.  The UTC offset of an aware datetime is kept;
+        naive datetimes are written as UTC.
     option_bits : unsigned int
         Mask of options.
 
@@ -1514,16 +1419,31 @@ def set_property_date(xmp, schema, name, the_date, option_bits=0):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property_date.restype = check_error
-    EXEMPI.xmp_set_property_date.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.POINTER(XmpDateTime),
-                                              ctypes.c_uint32]
+    xmp_date = _to_xmp_date(the_date)
+
+    EXEMPI.xmp_set_property_date(xmp,
+                                 schema.encode('utf-8'),
+                                 name.encode('utf-8'),
+                                 ctypes.byref(xmp_date),
+                                 ctypes.c_uint32(option_bits))
+
+
+def _to_xmp_date(the_date):
+    """Convert a datetime into an XmpDateTime structure.
 
-    if the_date.tzinfo is not None:
-        the_date = the_date.astimezone(pytz.utc)
+    The UTC offset of an aware datetime is kept; naive datetimes are written
+    as UTC.
+    """
+    tzsign = tzhour = tzminute = 0
+    offset = the_date.utcoffset()
+    if offset:
+        seconds = int(offset.total_seconds())
+        if seconds % 60 or offset.microseconds:
+            # XMP offsets are whole minutes.
+            the_date = the_date.astimezone(datetime.timezone.utc)
+        else:
+            tzsign = 1 if seconds > 0 else -1
+            tzhour, tzminute = divmod(abs(seconds) // 60, 60)
 
     xmp_date = XmpDateTime()
     xmp_date.year = the_date.year
@@ -1532,16 +1452,99 @@ def set_property_date(xmp, schema, name, the_date, option_bits=0):
     xmp_date.hour = the_date.hour
     xmp_date.minute = the_date.minute
     xmp_date.second = the_date.second
-    xmp_date.tzsign = 0
-    xmp_date.tzhour = 0
-    xmp_date.tzminute = 0
-    xmp_date.nanosecond = 0
+    xmp_date.tzsign = tzsign
+    xmp_date.tzhour = tzhour
+    xmp_date.tzminute = tzminute
+    xmp_date.nanosecond = the_date.microsecond * 1000
+    return xmp_date
 
-    EXEMPI.xmp_set_property_date(xmp,
-                                 ctypes.c_char_p(schema.encode('utf-8')),
-                                 ctypes.c_char_p(name.encode('utf-8')),
-                                 ctypes.byref(xmp_date),
-                                 ctypes.c_uint32(option_bits))
+
+_TIMEZONES = {(0, 0, 0): datetime.timezone.utc}
+
+
+def _fixed_offset(tzsign, tzhour, tzminute):
+    """Return the tzinfo of an XmpDateTime offset.
+
+    Instances are shared between calls, so that reading many dates does not
+    create a timezone object for each of them.
+    """
+    key = (tzsign, tzhour, tzminute)
+    try:
+        return _TIMEZONES[key]
+    except KeyError:
+        pass
+    minutes = tzhour * 60 + tzminute
+    if minutes == 0:
+        tzinfo = datetime.timezone.utc
+    else:
+        sign = -1 if tzsign < 0 else 1
+        tzinfo = datetime.timezone(datetime.timedelta(minutes=sign * minutes))
+    return _TIMEZONES.setdefault(key, tzinfo)
+
+
+def check_int(value, bits):
+    """Raise XMPError if an integer does not fit in a signed C integer.
+
+    ctypes silently wraps such integers around.
+
+    Parameters
+    ----------
+    value : int
+        The integer.
+    bits : int
+        Width of the C integer, 32 or 64.
+
+    Raises
+    ------
+    XMPError : if value is out of range
+    """
+    if not -2**(bits - 1) <= value < 2**(bits - 1):
+        raise XMPError('Integer {0} does not fit in {1} bits'.format(
+            value, bits))
+
+
+def set_properties(xmp, props):
+    """Set many properties of the XMP packet.
+
+    Each schema is only encoded once, however many properties it has.  The
+    properties are set in order, and setting stops at the first failure.
+
+    Parameters
+    ----------
+    xmp : pointer
+        The XMP packet.
+    props : iterable
+        Sequence of (schema, name, kind, value, option_bits) tuples, where
+        kind selects the type of value: 'str', 'bool', 'int32', 'int64',
+        'float' or 'date'.  A 'str' value may be None to create an empty
+        array or struct.
+
+    Raises
+    ------
+    XMPError : if the corresponding library routine fails
+    """
+    setters = {'str': EXEMPI.xmp_set_property,
+               'bool': EXEMPI.xmp_set_property_bool,
+               'int32': EXEMPI.xmp_set_property_int32,
+               'int64': EXEMPI.xmp_set_property_int64,
+               'float': EXEMPI.xmp_set_property_float,
+               'date': EXEMPI.xmp_set_property_date}
+    schemas = {}
+    for schema, name, kind, value, option_bits in props:
+        try:
+            bschema = schemas[schema]
+        except KeyError:
+            bschema = schemas[schema] = schema.encode('utf-8')
+        if kind == 'str':
+            if value is not None:
+                value = value.encode('utf-8')
+        elif kind == 'date':
+            value = ctypes.byref(_to_xmp_date(value))
+        elif kind == 'int32':
+            check_int(value, 32)
+        elif kind == 'int64':
+            check_int(value, 64)
+        setters[kind](xmp, bschema, name.encode('utf-8'), value, option_bits)
 
 
 def set_property_int32(xmp, schema, name, value, option_bits=0):
@@ -1564,16 +1567,10 @@ def set_property_int32(xmp, schema, name, value, option_bits=0):
 
     Raises
     ------
-    XMPError : if the corresponding library routine fails
+    XMPError : if the value does not fit in 32 bits or the corresponding
+        library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property_int32.restype = check_error
-    EXEMPI.xmp_set_property_int32.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_int32,
-                                              ctypes.c_uint32]
-
+    check_int(value, 32)
     ivalue = ctypes.c_int32(value)
     EXEMPI.xmp_set_property_int32(xmp,
                                   schema.encode('utf-8'),
@@ -1602,16 +1599,10 @@ def set_property_int64(xmp, schema, name, value, option_bits=0):
 
     Raises
     ------
-    XMPError : if the corresponding library routine fails
+    XMPError : if the value does not fit in 64 bits or the corresponding
+        library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property_int64.restype = check_error
-    EXEMPI.xmp_set_property_int64.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_int64,
-                                              ctypes.c_uint32]
-
+    check_int(value, 64)
     ivalue = ctypes.c_int64(value)
     EXEMPI.xmp_set_property_int64(xmp,
                                   schema.encode('utf-8'),
@@ -1642,14 +1633,6 @@ def set_property_float(xmp, schema, name, value, option_bits=0):
     ------
     XMPError : if the corresponding library routine fails
     """
-    # Use a function callback instead of returning a boolean value.
-    EXEMPI.xmp_set_property_float.restype = check_error
-    EXEMPI.xmp_set_property_float.argtypes = [ctypes.c_void_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_char_p,
-                                              ctypes.c_double,
-                                              ctypes.c_uint32]
-
     dvalue = ctypes.c_double(value)
     EXEMPI.xmp_set_property_float(xmp,
                                   schema.encode('utf-8'),
@@ -1671,8 +1654,6 @@ def string_cstr(xmpstr):
     pystr : UTF-8 str
         Python string
     """
-    EXEMPI.xmp_string_cstr.restype = ctypes.c_char_p
-    EXEMPI.xmp_string_cstr.argtypes = [ctypes.c_void_p]
     cstr = EXEMPI.xmp_string_cstr(xmpstr)
     cstr = cstr.decode('utf-8')
     return cstr
@@ -1689,7 +1670,6 @@ def _string_free(xmp_string):
     xmp_string : exempi XmpStringPtr
         The resource to free.
     """
-    EXEMPI.xmp_string_free.argtypes = [ctypes.c_void_p]
     EXEMPI.xmp_string_free(xmp_string)
 
 
@@ -1703,13 +1683,104 @@ def _string_new():
         Opaque pointer to a string.
     """
     # This is an opaque type that we should not peek into!
-    EXEMPI.xmp_string_new.restype = ctypes.c_void_p
     return EXEMPI.xmp_string_new()
 
 
+# Upper bound on the number of idle XmpString handles kept by each thread.
+_STRING_POOL_SIZE = 8
+
+_string_pool = threading.local()
+
+
+class _StringPool(object):
+    """Idle XmpString handles owned by a single thread.
+
+    The handles are freed when the pool is garbage collected, i.e. when its
+    thread exits.
+    """
+    def __init__(self):
+        self.handles = []
+
+    def __del__(self):
+        try:
+            for handle in self.handles:
+                _string_free(handle)
+        except Exception:
+            # The interpreter is shutting down.
+            pass
+
+
+def _acquire_string():
+    """Take an XmpStringPtr from the calling thread's pool.
+
+    A new string is allocated if the pool is empty.  Every string must be
+    handed back with _release_string once its value has been read.  The
+    contents of a pooled string are those of its previous use.
+
+    Returns
+    -------
+    ptr : pointer
+        Opaque pointer to a string.
+    """
+    try:
+        return _string_pool.pool.handles.pop()
+    except AttributeError:
+        _string_pool.pool = _StringPool()
+    except IndexError:
+        pass
+    return _string_new()
+
+
+def _release_string(xmp_string):
+    """Return an XmpStringPtr obtained from _acquire_string to the pool.
+
+    Parameters
+    ----------
+    xmp_string : exempi XmpStringPtr
+        The string to recycle.
+    """
+    handles = _string_pool.pool.handles
+    if len(handles) < _STRING_POOL_SIZE:
+        handles.append(xmp_string)
+    else:
+        _string_free(xmp_string)
+
+
+# Native handles allocated through this module and not yet freed, by kind.
+_live_handles = {'xmp': 0, 'files': 0, 'iterator': 0}
+
+_live_handles_lock = threading.Lock()
+
+
+def _track(kind, ptr, delta):
+    """Add delta to the live handle count of the given kind.
+
+    Null pointers are not counted.  Returns ptr unchanged.
+    """
+    if ptr:
+        with _live_handles_lock:
+            _live_handles[kind] += delta
+    return ptr
+
+
+def live_handles():
+    """Count the native handles that are currently allocated.
+
+    This is a debugging aid for finding objects whose memory or file
+    descriptors are never released.
+
+    Returns
+    -------
+    counts : dict
+        Number of live handles keyed by kind: 'xmp' for XMP packets, 'files'
+        for XMP file handles and 'iterator' for iterators.
+    """
+    with _live_handles_lock:
+        return dict(_live_handles)
+
+
 def terminate():
     """Wrapper for xmp_terminate library routine"""
-    EXEMPI.xmp_terminate.restype = ctypes.c_void_p
     EXEMPI.xmp_terminate()
 
 
@@ -1735,4 +1806,190 @@ def check_error(success):
         else:
             error_msg = "Unexpected error code " + str(ecode)
         msg = 'Exempi function failure ("{0}").'.format(error_msg)
-        raise XMPError(msg)
+        error = XMPError(msg)
+        error.code = ecode
+        raise error
+
+
+# Function prototypes of the exempi routines wrapped above, as
+# ``name: (restype, argtypes)``.  An ``argtypes`` of None means the routine
+# takes no arguments.  Names listed in ``_ALIASES`` give a second prototype
+# for an existing routine.
+_PROTOTYPES = {
+    'xmp_append_array_item': (check_error, [ctypes.c_void_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_uint32,
+                                            ctypes.c_char_p,
+                                            ctypes.c_uint32]),
+    'xmp_copy': (ctypes.c_void_p, [ctypes.c_void_p]),
+    'xmp_delete_localized_text': (check_error, [ctypes.c_void_p,
+                                                ctypes.c_char_p,
+                                                ctypes.c_char_p,
+                                                ctypes.c_char_p,
+                                                ctypes.c_char_p]),
+    'xmp_delete_property': (check_error, [ctypes.c_void_p,
+                                          ctypes.c_char_p,
+                                          ctypes.c_char_p]),
+    'xmp_files_can_put_xmp': (ctypes.c_bool, [ctypes.c_void_p,
+                                              ctypes.c_void_p]),
+    'xmp_files_check_file_format': (ctypes.c_int32, [ctypes.c_char_p]),
+    'xmp_files_close': (check_error, [ctypes.c_void_p, ctypes.c_int32]),
+    'xmp_files_free': (check_error, [ctypes.c_void_p]),
+    'xmp_files_get_file_info': (check_error, [ctypes.c_void_p,
+                                              ctypes.c_void_p,
+                                              ctypes.POINTER(ctypes.c_int32),
+                                              ctypes.POINTER(ctypes.c_int32),
+                                              ctypes.POINTER(ctypes.c_int32)]),
+    'xmp_files_get_new_xmp': (ctypes.c_void_p, [ctypes.c_void_p]),
+    'xmp_files_get_xmp': (check_error, [ctypes.c_void_p, ctypes.c_void_p]),
+    'xmp_files_get_xmp_xmpstring': (check_error,
+                                    [ctypes.c_void_p,
+                                     ctypes.c_void_p,
+                                     ctypes.POINTER(XmpPacketInfo)]),
+    'xmp_files_new': (ctypes.c_void_p, None),
+    'xmp_files_open': (check_error, [ctypes.c_void_p,
+                                     ctypes.c_char_p,
+                                     ctypes.c_int32]),
+    'xmp_files_open_new': (ctypes.c_void_p, [ctypes.c_char_p,
+                                             ctypes.c_int32]),
+    'xmp_files_put_xmp': (check_error, [ctypes.c_void_p, ctypes.c_void_p]),
+    'xmp_free': (None, [ctypes.c_void_p]),
+    'xmp_get_array_item': (check_error, [ctypes.c_void_p,
+                                         ctypes.c_char_p,
+                                         ctypes.c_char_p,
+                                         ctypes.c_int32,
+                                         ctypes.c_void_p,
+                                         ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_error': (ctypes.c_int32, None),
+    'xmp_get_localized_text': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_void_p,
+                                             ctypes.c_void_p,
+                                             ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_property': (check_error, [ctypes.c_void_p,
+                                       ctypes.c_char_p,
+                                       ctypes.c_char_p,
+                                       ctypes.c_void_p,
+                                       ctypes.POINTER(ctypes.c_uint32)]),
+    '_xmp_get_property_unchecked': (ctypes.c_bool, [ctypes.c_void_p,
+                                                    ctypes.c_char_p,
+                                                    ctypes.c_char_p,
+                                                    ctypes.c_void_p,
+                                                    ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_property_bool': (check_error, [ctypes.c_void_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_char_p,
+                                            ctypes.POINTER(ctypes.c_bool),
+                                            ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_property_date': (check_error, [ctypes.c_void_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_char_p,
+                                            ctypes.POINTER(XmpDateTime),
+                                            ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_property_int32': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.POINTER(ctypes.c_int32),
+                                             ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_get_property_int64': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.POINTER(ctypes.c_int64),
+                                             ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_has_property': (ctypes.c_bool, [ctypes.c_void_p,
+                                         ctypes.c_char_p,
+                                         ctypes.c_char_p]),
+    'xmp_init': (check_error, None),
+    'xmp_iterator_free': (check_error, [ctypes.c_void_p]),
+    'xmp_iterator_new': (ctypes.c_void_p, [ctypes.c_void_p,
+                                           ctypes.c_char_p,
+                                           ctypes.c_char_p,
+                                           ctypes.c_int32]),
+    'xmp_iterator_next': (ctypes.c_bool, [ctypes.c_void_p,
+                                          ctypes.c_void_p,
+                                          ctypes.c_void_p,
+                                          ctypes.c_void_p,
+                                          ctypes.POINTER(ctypes.c_uint32)]),
+    'xmp_iterator_skip': (ctypes.c_bool, [ctypes.c_void_p, ctypes.c_int32]),
+    'xmp_namespace_prefix': (check_error, [ctypes.c_char_p, ctypes.c_void_p]),
+    'xmp_new_empty': (ctypes.c_void_p, None),
+    'xmp_parse': (check_error, [ctypes.c_void_p,
+                                ctypes.c_char_p,
+                                ctypes.c_size_t]),
+    'xmp_prefix_namespace_uri': (check_error, [ctypes.c_char_p,
+                                               ctypes.c_void_p]),
+    'xmp_register_namespace': (check_error, [ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_void_p]),
+    'xmp_serialize': (check_error, [ctypes.c_void_p,
+                                    ctypes.c_void_p,
+                                    ctypes.c_uint32,
+                                    ctypes.c_uint32]),
+    'xmp_serialize_and_format': (check_error, [ctypes.c_void_p,
+                                               ctypes.c_void_p,
+                                               ctypes.c_uint32,
+                                               ctypes.c_uint32,
+                                               ctypes.c_char_p,
+                                               ctypes.c_char_p,
+                                               ctypes.c_int32]),
+    'xmp_set_array_item': (check_error, [ctypes.c_void_p,
+                                         ctypes.c_char_p,
+                                         ctypes.c_char_p,
+                                         ctypes.c_int32,
+                                         ctypes.c_char_p,
+                                         ctypes.c_uint32]),
+    'xmp_set_localized_text': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_uint32]),
+    'xmp_set_property': (check_error, [ctypes.c_void_p,
+                                       ctypes.c_char_p,
+                                       ctypes.c_char_p,
+                                       ctypes.c_char_p,
+                                       ctypes.c_uint32]),
+    'xmp_set_property_bool': (check_error, [ctypes.c_void_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_bool,
+                                            ctypes.c_uint32]),
+    'xmp_set_property_date': (check_error, [ctypes.c_void_p,
+                                            ctypes.c_char_p,
+                                            ctypes.c_char_p,
+                                            ctypes.POINTER(XmpDateTime),
+                                            ctypes.c_uint32]),
+    'xmp_set_property_float': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_double,
+                                             ctypes.c_uint32]),
+    'xmp_set_property_int32': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_int32,
+                                             ctypes.c_uint32]),
+    'xmp_set_property_int64': (check_error, [ctypes.c_void_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_char_p,
+                                             ctypes.c_int64,
+                                             ctypes.c_uint32]),
+    'xmp_string_cstr': (ctypes.c_char_p, [ctypes.c_void_p]),
+    'xmp_string_free': (None, [ctypes.c_void_p]),
+    'xmp_string_new': (ctypes.c_void_p, None),
+    'xmp_terminate': (None, None),
+}
+
+_ALIASES = {
+    '_xmp_get_property_unchecked': 'xmp_get_property',
+}
+
+
+if os.environ.get('LIBXMP_INSTRUMENT', '0') not in ('', '0'):
+    from . import instrument
+    instrument.enable()
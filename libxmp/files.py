@@ -40,17 +40,231 @@ core pacakage can then be used to manipulate the individual XMP properties.
 efficiently access the XMP in specific file formats. It also includes a
 fallback packet scanner that can be used for unknown file formats.
 """
+import collections
+import contextlib
+import functools
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import warnings
+import weakref
 
 from . import XMPError, XMPMeta
+from . import consts
 from .consts import options_mask
 from .consts import XMP_CLOSE_NOOPTION
+from .consts import XMP_CLOSE_SAFEUPDATE
 from .consts import XMP_OPEN_OPTIONS
 from .consts import XMP_OPEN_NOOPTION
+from .consts import XMP_OPEN_FORUPDATE
 from . import exempi as _cexempi
 
-__all__ = ['XMPFiles']
+__all__ = ['XMPFiles', 'XMPFilesPool', 'FixedPadding', 'ProportionalPadding',
+           'AdaptivePadding', 'FileEvent', 'add_trace_hook',
+           'remove_trace_hook']
+
+# Formats storing the XMP packet as plain bytes, with no checksum or encoding
+# over it, so that a packet of the same length can be written over it.
+# PNG (CRC), InDesign (checksummed header) and MP3 (ID3 unsynchronisation)
+# are deliberately left out.
+_IN_PLACE_FORMATS = frozenset([
+    consts.XMP_FT_JPEG, consts.XMP_FT_TIFF, consts.XMP_FT_PHOTOSHOP,
+    consts.XMP_FT_PDF, consts.XMP_FT_PS, consts.XMP_FT_EPS,
+    consts.XMP_FT_ILLUSTRATOR, consts.XMP_FT_GIF, consts.XMP_FT_MOV,
+    consts.XMP_FT_MPEG4, consts.XMP_FT_AVI, consts.XMP_FT_WAV,
+    consts.XMP_FT_TEXT, consts.XMP_FT_XML, consts.XMP_FT_UNKNOWN,
+])
+
+# Formats whose file may consist of nothing but the XMP packet.
+_SIDECAR_FORMATS = frozenset([consts.XMP_FT_TEXT, consts.XMP_FT_XML])
+
+# XmpPacketInfo.charForm of UTF-8 packets.
+_CHAR_UTF8 = 0
+
+
+FileEvent = collections.namedtuple('FileEvent', [
+    'operation', 'path', 'file_format', 'open_flags', 'handler_flags',
+    'packet_size', 'duration', 'error'])
+FileEvent.__doc__ = """
+A call of an :class:`XMPFiles` method, as passed to trace hooks.
+
+:ivar str operation: 'open_file', 'get_xmp', 'put_xmp' or 'close_file'.
+:ivar str path: Path of the file.
+:ivar int file_format: Format detected by exempi, one of the XMP_FT_*
+    constants, or None if no file was open.
+:ivar int open_flags: Options the file was opened with, or None.
+:ivar int handler_flags: Capabilities of the format handler, or None.
+:ivar int packet_size: Bytes of the packet read by get_xmp, or of the packet
+    written by put_xmp when libxmp writes it itself, in place or to a sidecar
+    file. None for the other operations, for packets written by the exempi
+    file handler, which chooses their serialization and padding, or if
+    unknown.
+:ivar float duration: Wall time of the call in seconds.
+:ivar error: The exception raised by the call, or None.
+"""
+
+# Hooks are replaced rather than modified, so a call uses a consistent set.
+_trace_hooks = ()
+_trace_hooks_lock = threading.Lock()
+
+
+def add_trace_hook(hook):
+    """
+    Register a function called with a :class:`FileEvent` after every
+    :meth:`XMPFiles.open_file`, :meth:`XMPFiles.get_xmp`,
+    :meth:`XMPFiles.put_xmp` and :meth:`XMPFiles.close_file`, including the
+    calls that fail. Hooks are called in the thread doing the I/O, in the
+    order they were added, and exceptions they raise are propagated. While no
+    hook is registered, no information is collected.
+
+    :param hook: A callable taking a single :class:`FileEvent` argument.
+    """
+    global _trace_hooks
+    with _trace_hooks_lock:
+        _trace_hooks = _trace_hooks + (hook,)
+
+
+def remove_trace_hook(hook):
+    """
+    Unregister a function added with :func:`add_trace_hook`.
+
+    :raises ValueError: if the hook is not registered.
+    """
+    global _trace_hooks
+    with _trace_hooks_lock:
+        hooks = list(_trace_hooks)
+        hooks.remove(hook)
+        _trace_hooks = tuple(hooks)
+
+
+def _traced(method):
+    """Decorator for XMPFiles methods reported to the trace hooks."""
+    operation = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        hooks = _trace_hooks
+        if not hooks:
+            return method(self, *args, **kwargs)
+
+        # The file is no longer known to exempi once it is closed.
+        info = self._file_info() if operation == 'close_file' else None
+        path = self._file_path
+        if operation == 'open_file':
+            path = args[0] if args else kwargs.get('file_path')
+        error = None
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if info is None:
+                info = self._file_info()
+            path = self._file_path or path
+            size = None
+            if error is None:
+                size = self._traced_size(operation, result)
+            event = FileEvent(operation, path, *(info or (None,) * 3),
+                              packet_size=size, duration=duration,
+                              error=error)
+            for hook in hooks:
+                hook(event)
+        return result
+    return wrapper
+
+
+class FixedPadding(object):
+    """Padding policy reserving a fixed number of bytes.
+
+    :param int nbytes: Bytes of padding to reserve.
+    """
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def padding(self, size):
+        """
+        Number of padding bytes to reserve for a packet.
+
+        :param int size: Size of the packet without padding, in bytes.
+        """
+        return self.nbytes
+
+    def observe(self, old_size, new_size):
+        """
+        Record that a packet of `old_size` bytes was replaced by one of
+        `new_size` bytes, sizes excluding padding.
+        """
+        pass
+
+
+class ProportionalPadding(FixedPadding):
+    """Padding policy reserving a fraction of the packet size.
+
+    :param float fraction: Padding as a fraction of the packet size, e.g.
+        0.25 for 25%.
+    :param int minimum: Minimum bytes of padding to reserve.
+    """
+    def __init__(self, fraction, minimum=0):
+        self.fraction = fraction
+        self.minimum = minimum
+
+    def padding(self, size):
+        return max(self.minimum, int(size * self.fraction))
+
+
+class AdaptivePadding(FixedPadding):
+    """Padding policy sized from the growth of recent edits.
+
+    The policy remembers how much packets grew over the last `history`
+    writes it observed, and reserves `factor` times the largest growth, so
+    that the next few edits of the same kind fit in the padding. Share one
+    instance between the :class:`XMPFiles` of a pipeline to learn from all of
+    its edits.
+
+    :param int minimum: Minimum bytes of padding to reserve.
+    :param float factor: Multiple of the largest recent growth to reserve.
+    :param int history: Number of recent writes taken into account.
+    """
+    def __init__(self, minimum=2048, factor=4, history=32):
+        self.minimum = minimum
+        self.factor = factor
+        self._growth = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def padding(self, size):
+        with self._lock:
+            growth = max(self._growth, default=0)
+        return max(self.minimum, int(growth * self.factor))
+
+    def observe(self, old_size, new_size):
+        with self._lock:
+            self._growth.append(max(0, new_size - old_size))
+
+
+def _replace_file(path, data):
+    """Replace the content of a file through a temporary copy, so that it is
+    never left half written."""
+    path = os.fsdecode(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or None,
+                                    prefix='.' + os.path.basename(path),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fptr:
+            fptr.write(data)
+            fptr.flush()
+            os.fsync(fptr.fileno())
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 
 class XMPFiles(object):
     """API for access to the "main" metadata in a file.
@@ -65,15 +279,50 @@ class XMPFiles(object):
 
     Errors result in raising of an :exc:`libxmp.XMPError` exception.
 
+    Once :func:`close_file` has been called, the same instance can be used to
+    open another file, which avoids allocating a new native handle for every
+    file. See also :class:`XMPFilesPool`.
+
+    The native handle is released when the instance is garbage collected, or
+    as soon as :func:`close` is called. Instances can be used as context
+    managers, in which case :func:`close` is called on exit::
+
+        with XMPFiles(file_path=path, open_forupdate=True) as xmpfile:
+            xmp = xmpfile.get_xmp()
+            ...
+            xmpfile.put_xmp(xmp)
+
+    The padding reserved when the packet is written can be controlled with a
+    padding policy such as :class:`FixedPadding`, :class:`ProportionalPadding`
+    or :class:`AdaptivePadding`. Policies are also told how much each packet
+    grows, which :class:`AdaptivePadding` uses to size its padding.
+
+    .. warning::
+        Padding policies only apply to XMP sidecar files, which hold nothing
+        but the packet and are written by libxmp itself. The file handlers of
+        exempi choose the padding of the packets they embed in media files
+        (JPEG, TIFF, PNG, MOV...), so the policy has no effect on them, and
+        :func:`put_xmp` issues a :exc:`RuntimeWarning` when it is ignored.
+
     :keyword file_path:     Path to file to open.
+    :keyword padding_policy: Optional padding policy.
 
     .. todo::
         Documentation
     """
     def __init__(self, **kwargs ):
         self._file_path = None
+        # (offset, bytes, truncate, xmp_obj) of a packet to write on close.
+        self._pending_write = None
+        self.padding_policy = kwargs.pop('padding_policy', None)
         self.xmpfileptr = _cexempi.files_new()
 
+        # Free up the memory associated with the XMP file instance when the
+        # object is garbage collected.
+        self._finalizer = weakref.finalize(self, _cexempi.files_free,
+                                           self.xmpfileptr)
+        self._finalizer.atexit = False
+
         if 'file_path' in kwargs:
             file_path = kwargs['file_path']
             del kwargs['file_path']
@@ -88,24 +337,41 @@ class XMPFiles(object):
         msg = msg.format(self._file_path)
         return msg
 
-    def __del__(self):
-        """
-        Free up the memory associated with the XMP file instance.
-        """
-        _cexempi.files_free( self.xmpfileptr )
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
+    def close(self):
+        """
+        Close the open file, if any, and release the native handle right away
+        instead of waiting for garbage collection. The instance cannot be used
+        afterwards. Calling this method more than once is harmless.
 
+        :raises XMPError: in case of errors closing the file.
+        """
+        try:
+            if self._file_path is not None:
+                self.close_file()
+        finally:
+            self._finalizer()
+            self.xmpfileptr = None
+
+    @_traced
     def open_file(self, file_path, **kwargs ):
         """
         Open a given file and read XMP from file. File must be closed again with
-        :func:`close_file`
+        :func:`close_file`, after which another file may be opened.
 
-        :param str file_path: Path to file to open.
+        :param file_path: Path to file to open, as a str, bytes or path-like
+            object.
         :raises XMPError: in case of errors.
 
         .. todo::
             Change signature into using kwargs to set option flag
         """
+        file_path = os.fspath(file_path)
         if kwargs:
             open_flags = options_mask( XMP_OPEN_OPTIONS, **kwargs )
         else:
@@ -117,6 +383,7 @@ class XMPFiles(object):
         _cexempi.files_open( self.xmpfileptr, file_path, open_flags )
         self._file_path = file_path
 
+    @_traced
     def close_file( self, close_flags=XMP_CLOSE_NOOPTION):
         """
         Close file after use. XMP will not be written to file until
@@ -128,9 +395,29 @@ class XMPFiles(object):
         .. todo::
             Change signature into using kwargs to set option flag
         """
+        file_path, pending = self._file_path, self._pending_write
+        self._pending_write = None
+        if (pending is not None and not pending[2]
+                and close_flags & XMP_CLOSE_SAFEUPDATE):
+            # A safe update is left to the file handler, never done in place.
+            _cexempi.files_put_xmp(self.xmpfileptr, pending[3].xmpptr)
+            pending = None
         _cexempi.files_close( self.xmpfileptr, close_flags )
         self._file_path = None
 
+        if pending is not None:
+            offset, packet, truncate, _ = pending
+            if truncate and close_flags & XMP_CLOSE_SAFEUPDATE:
+                # The packet is the whole sidecar file.
+                _replace_file(file_path, packet)
+                return
+            with open(file_path, 'r+b') as fptr:
+                fptr.seek(offset)
+                fptr.write(packet)
+                if truncate:
+                    fptr.truncate()
+
+    @_traced
     def get_xmp( self ):
         """
         Get XMP from file.
@@ -145,18 +432,194 @@ class XMPFiles(object):
         else:
             return None
 
-    def put_xmp(self, xmp_obj):
+    @_traced
+    def put_xmp(self, xmp_obj, in_place=False):
         """
         Write XMPMeta object to file. See also :func:`can_put_xmp`.
 
+        With `in_place`, the new packet is serialized to exactly the length of
+        the packet already in the file, using its padding, and is written over
+        it when the file is closed. Nothing else in the file is touched, which
+        avoids rewriting large files. This requires a file opened for update
+        in a format storing the packet as plain UTF-8 bytes with a packet
+        wrapper, and a new packet that fits. Otherwise the XMP is written
+        through the file handler as usual.
+
+        An in-place update only replaces the XMP packet: the file handler does
+        not reconcile the native metadata of the format, such as EXIF or IPTC
+        in JPEG and TIFF files, with the new XMP as it does on a normal write.
+
+        Until the file is closed, :func:`get_xmp` still returns the old XMP
+        after an in-place update, and `xmp_obj` must not be modified. If the
+        file is closed with :data:`libxmp.consts.XMP_CLOSE_SAFEUPDATE`,
+        `xmp_obj` is written through the file handler instead.
+
+        The padding policy, if any, only applies to sidecar files, which are
+        rewritten with the policy's padding when the file is closed, through a
+        temporary file if it is closed with
+        :data:`libxmp.consts.XMP_CLOSE_SAFEUPDATE`. For other files, the
+        packet is written with the padding chosen by exempi and a
+        :exc:`RuntimeWarning` is issued.
+
         :param xmp_obj: An :class:`libxmp.core.XMPMeta` object
+        :param bool in_place: Try to overwrite the existing packet in place.
+        :return: True if the packet will be overwritten in place, False if it
+            is written through the file handler or, for sidecar files with a
+            padding policy, rewritten with the policy's padding.
         """
         xmpptr = xmp_obj.xmpptr
         if not self.can_put_xmp(xmp_obj):
             msg = 'Cannot write XMP packet into {filename}'
             msg = msg.format(filename=os.path.basename(self._file_path))
             raise XMPError(msg)
+        self._pending_write = None
+        policy = self._sidecar_policy()
+        current = None
+        if in_place or policy is not None:
+            current = self._current_packet()
+        if current is not None and policy is not None:
+            self._observe_growth(xmp_obj)
+
+        if in_place and current is not None:
+            packet = self._in_place_packet(xmp_obj, *current)
+            if packet is not None:
+                self._pending_write = packet + (False, xmp_obj)
+                return True
+        if current is not None and policy is not None:
+            packet = self._sidecar_packet(xmp_obj, *current)
+            if packet is not None:
+                self._pending_write = packet + (True, xmp_obj)
+                return False
+        if self.padding_policy is not None:
+            warnings.warn('Padding policy ignored for {0}: it only applies to '
+                          'sidecar files'.format(
+                              os.path.basename(self._file_path)),
+                          RuntimeWarning, stacklevel=3)
         _cexempi.files_put_xmp(self.xmpfileptr, xmpptr)
+        return False
+
+    def _file_info(self):
+        """
+        :return: (file_format, open_flags, handler_flags) of the open file, or
+            None if no file is open.
+        """
+        if self._file_path is None:
+            return None
+        _, options, file_format, handler_flags = (
+            _cexempi.files_get_file_info(self.xmpfileptr))
+        return file_format, options, handler_flags
+
+    def _sidecar_policy(self):
+        """
+        :return: The padding policy if the open file is a sidecar file, the
+            only files it applies to, otherwise None.
+        """
+        if self.padding_policy is None:
+            return None
+        _, _, file_format, _ = _cexempi.files_get_file_info(self.xmpfileptr)
+        if file_format not in _SIDECAR_FORMATS:
+            return None
+        return self.padding_policy
+
+    def _traced_size(self, operation, result):
+        """Size in bytes of the packet read or written by a traced call."""
+        if operation == 'get_xmp':
+            if result is None:
+                return 0
+            try:
+                _, info = _cexempi.files_get_xmp_xmpstring(self.xmpfileptr)
+            except XMPError:
+                return None
+            return info.length
+        if operation == 'put_xmp' and self._pending_write is not None:
+            return len(self._pending_write[1])
+        return None
+
+    def _current_packet(self):
+        """
+        Locate the packet of a file opened for update.
+
+        :return: (file_format, packet, packet_info) or None if the file is not
+            open for update or has no packet at a known location.
+        """
+        _, options, file_format, _ = _cexempi.files_get_file_info(
+            self.xmpfileptr)
+        if not options & XMP_OPEN_FORUPDATE:
+            return None
+
+        try:
+            old_packet, info = _cexempi.files_get_xmp_xmpstring(
+                self.xmpfileptr)
+        except XMPError:
+            # No packet in the file.
+            return None
+        if (info.offset < 0 or info.length <= 0 or not info.hasWrapper
+                or not info.writeable or info.charForm != _CHAR_UTF8):
+            # Read-only packets (end="r") must not be overwritten.
+            return None
+
+        # Make sure the handler reported where the packet really is.
+        with open(self._file_path, 'rb') as fptr:
+            fptr.seek(info.offset)
+            if fptr.read(info.length) != old_packet.encode('utf-8'):
+                return None
+
+        return file_format, old_packet, info
+
+    def _observe_growth(self, xmp_obj):
+        """Report the size change of the packet to the padding policy."""
+        # Not through get_xmp, which would be reported to the trace hooks.
+        xmpptr = _cexempi.files_get_new_xmp(self.xmpfileptr)
+        if not xmpptr:
+            return
+        old_xmp = XMPMeta(_xmp_internal_ref=xmpptr)
+        sizes = [len(xmp.serialize_to_str(omit_packet_wrapper=True,
+                                          use_compact_format=True)
+                     .encode('utf-8'))
+                 for xmp in (old_xmp, xmp_obj)]
+        self.padding_policy.observe(*sizes)
+
+    def _sidecar_packet(self, xmp_obj, file_format, old_packet, info):
+        """
+        Serialize the packet of a sidecar file with the policy's padding.
+
+        :return: (offset, bytes) to write, or None if the file holds more
+            than the packet and trailing white space.
+        """
+        if file_format not in _SIDECAR_FORMATS or info.offset != 0:
+            return None
+        with open(self._file_path, 'rb') as fptr:
+            fptr.seek(info.length)
+            tail = fptr.read()
+        if tail.strip():
+            return None
+
+        size = len(xmp_obj.serialize_to_str(padding=1).encode('utf-8'))
+        padding = max(1, self.padding_policy.padding(size))
+        packet = xmp_obj.serialize_to_str(padding=padding)
+        return 0, packet.encode('utf-8') + tail
+
+    def _in_place_packet(self, xmp_obj, file_format, old_packet, info):
+        """
+        Serialize a packet replacing the current one byte for byte.
+
+        :return: (offset, bytes) to write, or None if the packet cannot be
+            replaced in place.
+        """
+        if file_format not in _IN_PLACE_FORMATS:
+            return None
+
+        try:
+            packet = xmp_obj.serialize_to_str(padding=info.length,
+                                              exact_packet_length=True)
+        except XMPError:
+            # Does not fit in the available space.
+            return None
+        packet = packet.encode('utf-8')
+        if len(packet) != info.length:
+            return None
+
+        return info.offset, packet
 
     def can_put_xmp( self, xmp_obj ):
         """Determine if XMP can be written into the file.
@@ -177,3 +640,74 @@ class XMPFiles(object):
             return _cexempi.files_can_put_xmp(self.xmpfileptr, xmpptr)
         else:
             return False
+
+
+class XMPFilesPool(object):
+    """Pool of reusable :class:`XMPFiles` handles.
+
+    Handing out idle handles instead of creating a new :class:`XMPFiles` for
+    each file keeps the allocation and release of native handles out of the
+    per-file path in batch jobs. The pool is safe to share between threads;
+    each handle is used by one caller at a time::
+
+        pool = XMPFilesPool()
+        with pool.handle() as xmpfile:
+            xmpfile.open_file(path, open_read=True)
+            xmp = xmpfile.get_xmp()
+            xmpfile.close_file()
+
+    :param int maxsize: Maximum number of idle handles kept for reuse. Handles
+        released beyond this are freed. None means unbounded.
+    """
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self):
+        """
+        Get a handle with no open file, reusing an idle one if possible.
+
+        :return: An :class:`XMPFiles` instance.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return XMPFiles()
+
+    def release(self, xmpfile):
+        """
+        Return a handle to the pool. A file still open on it is closed first.
+
+        :param xmpfile: An :class:`XMPFiles` obtained from :func:`acquire`.
+        """
+        if xmpfile._file_path is not None:
+            xmpfile.close_file()
+        with self._lock:
+            if self.maxsize is None or len(self._idle) < self.maxsize:
+                self._idle.append(xmpfile)
+                return
+        xmpfile.close()
+
+    @contextlib.contextmanager
+    def handle(self):
+        """
+        Context manager acquiring a handle and releasing it on exit.
+        """
+        xmpfile = self.acquire()
+        try:
+            yield xmpfile
+        finally:
+            self.release(xmpfile)
+
+    def clear(self):
+        """
+        Release all idle handles.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for xmpfile in idle:
+            xmpfile.close()
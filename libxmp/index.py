@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Persistent index of the XMP found in a directory tree.
+
+:class:`XMPIndex` stores the properties of every file below a directory in a
+SQLite database. Updating the index only reads files whose device, inode,
+size or modification time changed since the previous run, or whose XMP could
+not be read then, and drops files that no longer exist::
+
+    from libxmp.index import XMPIndex
+
+    with XMPIndex('photos.db') as index:
+        print(index.update('/data/photos', workers=8))
+        for path in index.find(consts.XMP_NS_DC, 'format', 'image/jpeg'):
+            print(path)
+"""
+import collections
+import os
+import sqlite3
+
+from . import batch
+
+__all__ = ['XMPIndex', 'UpdateStats']
+
+UpdateStats = collections.namedtuple('UpdateStats', ['added', 'updated',
+                                                     'removed', 'unchanged',
+                                                     'failed'])
+UpdateStats.__doc__ = """
+Number of files in each state after :func:`XMPIndex.update`. ``failed``
+counts the added or updated files whose XMP could not be read, and the files
+left out of the index because their path is not valid UTF-8.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id       INTEGER PRIMARY KEY,
+    path     TEXT NOT NULL UNIQUE,
+    dev      INTEGER NOT NULL,
+    ino      INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    scan     INTEGER NOT NULL,
+    error    TEXT
+);
+CREATE TABLE IF NOT EXISTS properties (
+    file_id  INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    schema   TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    value    TEXT,
+    flags    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS properties_file ON properties(file_id);
+CREATE INDEX IF NOT EXISTS properties_name ON properties(schema, name);
+"""
+
+# Number of files written between two commits during an update.
+_COMMIT_EVERY = 1000
+
+# Number of paths looked up in the index and recorded as seen at once during
+# an update. Kept below SQLite's default limit of 999 query parameters.
+_SEEN_BATCH = 500
+
+
+def _identity(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class XMPIndex(object):
+    """SQLite index of the XMP properties of the files in directory trees.
+
+    :param str db_path: Path of the database file. It is created if needed.
+        ``':memory:'`` gives a temporary in-memory index.
+    """
+    def __init__(self, db_path):
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self._conn.close()
+
+    def update(self, root, workers=None, executor='thread'):
+        """
+        Bring the index up to date with the files below a directory.
+
+        Files that are new, whose stat identity changed or whose XMP could not
+        be read by the previous update are read with
+        :func:`libxmp.batch.extract`; the others are left untouched. Files
+        previously indexed below `root` that no longer exist are removed.
+        Files whose path cannot be stored in the database, because it is not
+        valid UTF-8, are skipped and counted as failed. If the update fails,
+        the changes not yet committed are rolled back.
+
+        :param str root: Directory to index.
+        :param workers: Number of workers, see :func:`libxmp.batch.extract`.
+        :param executor: ``'thread'`` or ``'process'``.
+        :return: An :class:`UpdateStats` named tuple.
+        :raises OSError: if a directory below `root` cannot be listed. No
+            file is then removed from the index, so that the files of that
+            directory are not dropped.
+        """
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        conn = self._conn
+        scan = conn.execute('SELECT COALESCE(MAX(scan), 0) + 1 '
+                            'FROM files').fetchone()[0]
+        counts = dict.fromkeys(UpdateStats._fields, 0)
+        # Stat identity of the files submitted for extraction, by path.
+        pending = {}
+
+        def check(entries):
+            # Record a batch of (path, identity) pairs as seen and look up
+            # their index rows with a single query.
+            conn.executemany('INSERT INTO temp.seen VALUES (?)',
+                             [(path,) for path, _ in entries])
+            stored = {row[0]: row[1:] for row in conn.execute(
+                'SELECT path, id, dev, ino, size, mtime_ns, error FROM files '
+                'WHERE path IN ({0})'.format(', '.join('?' * len(entries))),
+                [path for path, _ in entries])}
+            for path, ident in entries:
+                row = stored.get(path)
+                # Files whose previous extraction failed are read again.
+                if (row is not None and tuple(row[1:5]) == ident
+                        and row[5] is None):
+                    counts['unchanged'] += 1
+                    continue
+                pending[path] = (row, ident)
+                yield path
+
+        def changed_paths():
+            entries = []
+            for path in batch.iter_paths(root):
+                try:
+                    path.encode('utf-8')
+                except UnicodeEncodeError:
+                    # Undecodable file name, which SQLite cannot store.
+                    counts['failed'] += 1
+                    continue
+                try:
+                    ident = _identity(os.stat(path))
+                except OSError:
+                    continue
+                entries.append((path, ident))
+                if len(entries) == _SEEN_BATCH:
+                    yield from check(entries)
+                    entries = []
+            if entries:
+                yield from check(entries)
+
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen '
+                         '(path TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM temp.seen')
+            results = batch.extract(changed_paths(), workers=workers,
+                                    executor=executor, compact=True)
+            for written, result in enumerate(results, 1):
+                row, ident = pending.pop(result.path)
+                self._store(result, row, ident, scan)
+                counts['added' if row is None else 'updated'] += 1
+                if result.error is not None:
+                    counts['failed'] += 1
+                if written % _COMMIT_EVERY == 0:
+                    conn.commit()
+
+            cursor = conn.execute('DELETE FROM files '
+                                  'WHERE substr(path, 1, ?) = ? '
+                                  'AND path NOT IN (SELECT path FROM '
+                                  'temp.seen)',
+                                  (len(prefix), prefix))
+            counts['removed'] = cursor.rowcount
+            conn.execute('DELETE FROM temp.seen')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return UpdateStats(**counts)
+
+    def _store(self, result, row, ident, scan):
+        """Write the extraction result of one file."""
+        conn = self._conn
+        error = None if result.error is None else str(result.error)
+        if row is None:
+            file_id = conn.execute(
+                'INSERT INTO files (path, dev, ino, size, mtime_ns, scan, '
+                'error) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (result.path,) + ident + (scan, error)).lastrowid
+        else:
+            file_id = row[0]
+            conn.execute('UPDATE files SET dev = ?, ino = ?, size = ?, '
+                         'mtime_ns = ?, scan = ?, error = ? WHERE id = ?',
+                         ident + (scan, error, file_id))
+            conn.execute('DELETE FROM properties WHERE file_id = ?',
+                         (file_id,))
+        if result.xmp:
+            conn.executemany(
+                'INSERT INTO properties (file_id, schema, name, value, flags) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((file_id, schema, prop.name, prop.value, int(prop.flags))
+                 for schema, props in result.xmp.items()
+                 for prop in props))
+
+    def properties(self, path):
+        """
+        Get the indexed properties of a file.
+
+        :param str path: Path of the file, as below the indexed directory.
+        :return: A list of ``(schema, name, value, flags)`` tuples in document
+            order, where flags is the integer option bit mask.
+        """
+        path = os.path.abspath(path)
+        return self._conn.execute(
+            'SELECT schema, name, value, flags FROM properties '
+            'JOIN files ON files.id = properties.file_id '
+            'WHERE files.path = ? ORDER BY properties.rowid',
+            (path,)).fetchall()
+
+    def find(self, schema_ns, prop_name, value=None):
+        """
+        Find the files having a property.
+
+        :param str schema_ns: Namespace URI of the property.
+        :param str prop_name: Name of the property, including the prefix as
+            returned by :class:`libxmp.core.XMPIterator`, e.g. ``dc:format``.
+        :param str value: If given, only match properties with this value.
+        :return: A sorted list of file paths.
+        """
+        sql = ('SELECT DISTINCT files.path FROM properties '
+               'JOIN files ON files.id = properties.file_id '
+               'WHERE properties.schema = ? AND properties.name = ?')
+        params = [schema_ns, prop_name]
+        if value is not None:
+            sql += ' AND properties.value = ?'
+            params.append(value)
+        sql += ' ORDER BY files.path'
+        return [path for (path,) in self._conn.execute(sql, params)]
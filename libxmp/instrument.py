@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Opt-in instrumentation of the exempi wrappers.
+
+When enabled, every public wrapper of :mod:`libxmp.exempi` is replaced by a
+function counting its calls, the wall time spent in it and the errors it
+raised, which shows whether the time of a slow process goes to parsing,
+serialization, iteration or file I/O::
+
+    from libxmp import instrument
+
+    instrument.enable()
+    ...
+    for name, stats in instrument.snapshot().items():
+        print(name, stats['calls'], stats['seconds'], stats['errors'])
+
+Instrumentation is also enabled when libxmp.exempi is imported with the
+``LIBXMP_INSTRUMENT`` environment variable set to a value other than ``0``.
+Disabling it restores the original functions, so it costs nothing when off.
+Functions captured before instrumentation was enabled, such as the
+finalizers of existing objects, are not counted.
+"""
+import functools
+import threading
+import time
+
+__all__ = ['enable', 'disable', 'is_enabled', 'snapshot', 'reset']
+
+# Helpers of the exempi module which are not wrappers of library routines.
+_EXCLUDED = frozenset(['check_error', 'live_handles'])
+
+_lock = threading.Lock()
+# Original functions keyed by name while instrumentation is enabled.
+_originals = {}
+# [calls, seconds, errors] keyed by wrapper name.
+_counters = {}
+
+
+def _exempi():
+    """Return the exempi module.
+
+    It is not imported at module level because importing it enables
+    instrumentation when LIBXMP_INSTRUMENT is set.
+    """
+    from . import exempi
+    return exempi
+
+
+def _wrappers(module):
+    """Return the names of the wrappers of library routines in module."""
+    return sorted(name for name, obj in vars(module).items()
+                  if not name.startswith('_') and name not in _EXCLUDED
+                  and callable(obj) and not isinstance(obj, type)
+                  and getattr(obj, '__module__', None) == module.__name__)
+
+
+def _instrumented(name, func):
+    """Return func wrapped to update the counters of name."""
+    counters = _counters.setdefault(name, [0, 0.0, 0])
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        failed = False
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        except StopIteration:
+            # The normal end of an iteration, not a failure.
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = clock() - start
+            with _lock:
+                counters[0] += 1
+                counters[1] += elapsed
+                if failed:
+                    counters[2] += 1
+
+    return wrapper
+
+
+def enable():
+    """
+    Start counting the calls of the exempi wrappers. Calling this function
+    when instrumentation is already enabled has no effect.
+    """
+    module = _exempi()
+    with _lock:
+        if _originals:
+            return
+        for name in _wrappers(module):
+            func = getattr(module, name)
+            _originals[name] = func
+            setattr(module, name, _instrumented(name, func))
+
+
+def disable():
+    """
+    Restore the original exempi wrappers. The counters are kept until
+    :func:`reset` is called.
+    """
+    module = _exempi()
+    with _lock:
+        for name, func in _originals.items():
+            setattr(module, name, func)
+        _originals.clear()
+
+
+def is_enabled():
+    """
+    :returns: True if instrumentation is enabled.
+    """
+    return bool(_originals)
+
+
+def snapshot():
+    """
+    Return the counters of the wrappers that were called at least once.
+
+    :returns: A dict keyed by wrapper name, each value being a dict with the
+        number of 'calls', the cumulative wall time in 'seconds' and the
+        number of 'errors' raised.
+    """
+    with _lock:
+        return {name: {'calls': calls, 'seconds': seconds, 'errors': errors}
+                for name, (calls, seconds, errors) in _counters.items()
+                if calls}
+
+
+def reset():
+    """
+    Set all counters back to zero.
+    """
+    with _lock:
+        for counters in _counters.values():
+            counters[:] = [0, 0.0, 0]
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Prometheus metrics for libxmp operations.
+
+:func:`enable` registers a trace hook on :mod:`libxmp.files` which counts the
+XMPFiles operations by format, the bytes of XMP read and written, the errors
+by exempi error code and the latency of each operation. :func:`render`
+returns them in the Prometheus text exposition format, together with the
+counters of :mod:`libxmp.instrument` when it is enabled::
+
+    from libxmp import metrics
+
+    metrics.enable()
+    ...
+    body = metrics.render()
+"""
+import bisect
+import collections
+import threading
+
+from . import consts
+from . import files
+from . import instrument
+from .exempi import ERROR_MESSAGE
+
+__all__ = ['enable', 'disable', 'is_enabled', 'reset', 'render',
+           'DEFAULT_BUCKETS']
+
+#: Upper bounds in seconds of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+# Label of each file format, taken from the XMP_FT_* constant names.
+_FORMAT_NAMES = {value: name[len('XMP_FT_'):].lower()
+                 for name, value in vars(consts).items()
+                 if name.startswith('XMP_FT_')}
+
+_lock = threading.Lock()
+_buckets = DEFAULT_BUCKETS
+_enabled = False
+_operations = collections.Counter()
+_bytes_read = collections.Counter()
+_bytes_written = collections.Counter()
+_errors = collections.Counter()
+# [bucket counts..., sum] keyed by (operation, format).
+_latency = {}
+
+
+def _format_name(file_format):
+    if file_format is None:
+        return 'none'
+    return _FORMAT_NAMES.get(file_format, '{0:#x}'.format(file_format))
+
+
+def _record(event):
+    """Trace hook updating the metrics with a :class:`files.FileEvent`."""
+    fmt = _format_name(event.file_format)
+    key = (event.operation, fmt)
+    with _lock:
+        _operations[key] += 1
+        if event.packet_size:
+            if event.operation == 'get_xmp':
+                _bytes_read[fmt] += event.packet_size
+            elif event.operation == 'put_xmp':
+                _bytes_written[fmt] += event.packet_size
+        if event.error is not None:
+            code = getattr(event.error, 'code', None)
+            _errors[(event.operation, code, type(event.error).__name__)] += 1
+
+        histogram = _latency.get(key)
+        if histogram is None:
+            histogram = _latency[key] = [0] * (len(_buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(_buckets, event.duration)] += 1
+        histogram[-1] += event.duration
+
+
+def enable(buckets=None):
+    """
+    Start collecting metrics of XMPFiles operations. Calling this function
+    when metrics are already enabled only changes the buckets.
+
+    :param buckets: Increasing upper bounds in seconds of the latency
+        histogram buckets, :data:`DEFAULT_BUCKETS` if None. Changing the
+        buckets resets the collected metrics, as :func:`reset` does.
+    """
+    global _enabled, _buckets
+    buckets = tuple(sorted(buckets)) if buckets else DEFAULT_BUCKETS
+    with _lock:
+        if buckets != _buckets:
+            _buckets = buckets
+            _clear()
+        if not _enabled:
+            files.add_trace_hook(_record)
+            _enabled = True
+
+
+def disable():
+    """
+    Stop collecting metrics. The metrics collected so far are kept until
+    :func:`reset` is called.
+    """
+    global _enabled
+    with _lock:
+        if _enabled:
+            files.remove_trace_hook(_record)
+            _enabled = False
+
+
+def is_enabled():
+    """
+    :returns: True if metrics are being collected.
+    """
+    return _enabled
+
+
+def reset():
+    """
+    Clear the collected metrics.
+    """
+    with _lock:
+        _clear()
+
+
+def _clear():
+    """Clear the collected metrics. The caller holds _lock."""
+    for counter in (_operations, _bytes_read, _bytes_written, _errors,
+                    _latency):
+        counter.clear()
+
+
+def _labels(**labels):
+    """Format labels, sorted by name, as a Prometheus label set."""
+    if not labels:
+        return ''
+    items = []
+    for name, value in sorted(labels.items()):
+        value = (str(value).replace('\\', '\\\\').replace('"', '\\"')
+                 .replace('\n', '\\n'))
+        items.append('{0}="{1}"'.format(name, value))
+    return '{' + ','.join(items) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _family(out, name, kind, help_text, samples):
+    """Append a metric family with its (suffix, labels, value) samples."""
+    out.append('# HELP {0} {1}'.format(name, help_text))
+    out.append('# TYPE {0} {1}'.format(name, kind))
+    for suffix, labels, value in samples:
+        out.append('{0}{1}{2} {3}'.format(name, suffix, _labels(**labels),
+                                          _number(value)))
+
+
+def render():
+    """
+    Return the collected metrics in the Prometheus text exposition format.
+
+    The metrics are:
+
+    * ``libxmp_file_operations_total``: XMPFiles calls by operation and
+      format.
+    * ``libxmp_xmp_read_bytes_total`` and ``libxmp_xmp_written_bytes_total``:
+      bytes of XMP packets read and written, by format. Only the packets
+      libxmp writes itself count as written, see
+      :attr:`libxmp.files.FileEvent.packet_size`.
+    * ``libxmp_errors_total``: failed XMPFiles calls by operation, exempi
+      error code and message, and exception type.
+    * ``libxmp_file_operation_duration_seconds``: latency histogram by
+      operation and format.
+    * ``libxmp_exempi_calls_total``, ``libxmp_exempi_call_seconds_total`` and
+      ``libxmp_exempi_call_errors_total``: calls of each exempi wrapper, if
+      :mod:`libxmp.instrument` has collected any.
+
+    :returns: The metrics as a str, ending with a newline.
+    """
+    out = []
+    with _lock:
+        _family(out, 'libxmp_file_operations_total', 'counter',
+                'XMPFiles operations by operation and file format.',
+                [('', dict(operation=op, format=fmt), count)
+                 for (op, fmt), count in sorted(_operations.items())])
+        _family(out, 'libxmp_xmp_read_bytes_total', 'counter',
+                'Bytes of XMP packets read from files.',
+                [('', dict(format=fmt), count)
+                 for fmt, count in sorted(_bytes_read.items())])
+        _family(out, 'libxmp_xmp_written_bytes_total', 'counter',
+                'Bytes of XMP packets written to files.',
+                [('', dict(format=fmt), count)
+                 for fmt, count in sorted(_bytes_written.items())])
+
+        samples = []
+        for (op, code, exc_type), count in sorted(
+                _errors.items(), key=lambda item: repr(item[0])):
+            if code is None:
+                labels = dict(code='', message='')
+            else:
+                labels = dict(code=code, message=ERROR_MESSAGE.get(
+                    code, 'unexpected error code'))
+            samples.append(('', dict(labels, operation=op, type=exc_type),
+                            count))
+        _family(out, 'libxmp_errors_total', 'counter',
+                'Failed XMPFiles operations by exempi error code.', samples)
+
+        samples = []
+        for (op, fmt), histogram in sorted(_latency.items()):
+            labels = dict(operation=op, format=fmt)
+            cumulative = 0
+            for bound, count in zip(_buckets + ('+Inf',), histogram):
+                cumulative += count
+                samples.append(('_bucket', dict(labels, le=bound),
+                                cumulative))
+            samples.append(('_sum', labels, histogram[-1]))
+            samples.append(('_count', labels, cumulative))
+        _family(out, 'libxmp_file_operation_duration_seconds', 'histogram',
+                'Duration of XMPFiles operations.', samples)
+
+    calls = sorted(instrument.snapshot().items())
+    if calls:
+        _family(out, 'libxmp_exempi_calls_total', 'counter',
+                'Calls of exempi wrappers.',
+                [('', dict(function=name), stats['calls'])
+                 for name, stats in calls])
+        _family(out, 'libxmp_exempi_call_seconds_total', 'counter',
+                'Wall time spent in exempi wrappers.',
+                [('', dict(function=name), float(stats['seconds']))
+                 for name, stats in calls])
+        _family(out, 'libxmp_exempi_call_errors_total', 'counter',
+                'Errors raised by exempi wrappers.',
+                [('', dict(function=name), stats['errors'])
+                 for name, stats in calls])
+
+    return '\n'.join(out) + '\n'
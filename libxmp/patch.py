@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Structural differences between XMP packets.
+
+:func:`diff` compares two :class:`libxmp.core.XMPMeta` objects node by node
+and returns the changes turning the first into the second. :func:`apply_patch`
+replays such a change list on another object, so only the changes need to be
+stored or sent instead of the whole packet::
+
+    patch = libxmp.diff(old, new)
+    libxmp.apply_patch(replica, patch)
+"""
+import collections
+
+from . import XMPError
+from .consts import XMP_PROP_VALUE_IS_URI
+from .consts import XMP_PROP_VALUE_IS_STRUCT
+from .consts import XMP_PROP_VALUE_IS_ARRAY
+from .consts import XMP_PROP_ARRAY_FORM_MASK
+from .core import XMPMeta, XMPIterator
+from . import exempi as _cexempi
+
+__all__ = ['Change', 'diff', 'apply_patch']
+
+Change = collections.namedtuple('Change', ['op', 'schema', 'path', 'value',
+                                           'flags'])
+Change.__doc__ = """
+A single change of a patch.
+
+``op`` is ``'add'``, ``'remove'`` or ``'change'``. ``schema`` is the namespace
+URI and ``path`` the full path of the node, as yielded by
+:class:`libxmp.core.XMPIterator`, e.g. ``dc:subject[2]`` or
+``dc:title[1]/?xml:lang``. ``value`` and ``flags`` are the new value and
+option bits of the node; they are None for removals. Arrays and structs have
+a None value.
+"""
+
+# Options that describe the node itself; the others are derived from its
+# children, qualifiers or position in the tree.
+_SETTABLE = (XMP_PROP_VALUE_IS_URI | XMP_PROP_VALUE_IS_STRUCT
+             | XMP_PROP_VALUE_IS_ARRAY | XMP_PROP_ARRAY_FORM_MASK)
+
+_COMPOSITE = XMP_PROP_VALUE_IS_STRUCT | XMP_PROP_ARRAY_FORM_MASK
+
+
+def _nodes(xmp):
+    """Map (schema, path) to (value, flags) for every node, in document order.
+    """
+    nodes = {}
+    for schema, path, value, options in XMPIterator(xmp, raw=True):
+        if not path:
+            # Schema node.
+            continue
+        options &= _SETTABLE
+        if options & _COMPOSITE:
+            value = None
+        nodes[(schema, path)] = (value, options)
+    return nodes
+
+
+def _parent(path):
+    """Path of the node containing the given one, or None at the top level."""
+    if path.endswith(']'):
+        return path[:path.rindex('[')]
+    index = path.rfind('/')
+    return path[:index] if index >= 0 else None
+
+
+def _ancestors(key):
+    """Yield a node key followed by the keys of its ancestors."""
+    schema, path = key
+    while path is not None:
+        yield (schema, path)
+        path = _parent(path)
+
+
+def diff(xmp_a, xmp_b):
+    """
+    Compute the changes turning one XMP packet into another.
+
+    Array items are compared by position, so inserting an item in the middle
+    of an array shows up as changes to the following items. A removed array
+    or struct is reported as a single removal, and a node whose kind changes,
+    e.g. from a bag to a seq, is removed and added again.
+
+    :param xmp_a: The original :class:`libxmp.core.XMPMeta`.
+    :param xmp_b: The modified :class:`libxmp.core.XMPMeta`.
+    :returns: A list of :class:`Change`, suitable for :func:`apply_patch`.
+    """
+    nodes_a = _nodes(xmp_a)
+    nodes_b = _nodes(xmp_b)
+
+    replaced = set(key for key in nodes_a.keys() & nodes_b.keys()
+                   if (nodes_a[key][1] ^ nodes_b[key][1]) & _COMPOSITE)
+
+    def is_replaced(key):
+        return any(k in replaced for k in _ancestors(key))
+
+    removed = set(key for key in nodes_a
+                  if key not in nodes_b or is_replaced(key))
+    # Removing a node removes its children as well, so only the topmost
+    # removed nodes are listed. They are in reverse document order, so that
+    # removing an array item does not shift the index of another one still to
+    # be removed.
+    patch = [Change('remove', schema, path, None, None)
+             for schema, path in reversed(list(nodes_a))
+             if (schema, path) in removed
+             and (schema, _parent(path)) not in removed]
+
+    for key, (value, flags) in nodes_b.items():
+        if key in removed or key not in nodes_a:
+            patch.append(Change('add', key[0], key[1], value, flags))
+        elif nodes_a[key] != (value, flags):
+            patch.append(Change('change', key[0], key[1], value, flags))
+    return patch
+
+
+def apply_patch(xmp, patch):
+    """
+    Apply changes computed by :func:`diff` to an XMP packet.
+
+    Namespaces of the changed schemas are registered if needed, using the
+    prefix found in the change's path.
+
+    :param xmp: The :class:`libxmp.core.XMPMeta` to modify.
+    :param patch: An iterable of :class:`Change` or of equivalent tuples.
+    :raises XMPError: if a change cannot be applied.
+    """
+    known = set()
+    for op, schema, path, value, flags in patch:
+        if schema not in known:
+            try:
+                XMPMeta.get_prefix_for_namespace(schema)
+            except XMPError:
+                prefix = path.split(':', 1)[0].lstrip('?')
+                XMPMeta.register_namespace(schema, prefix)
+            known.add(schema)
+
+        if op == 'remove':
+            xmp.delete_property(schema, path)
+        elif op in ('add', 'change'):
+            xmp.invalidate()
+            _cexempi.set_property(xmp.xmpptr, schema, path, value,
+                                  flags & _SETTABLE)
+        else:
+            raise XMPError('Unknown patch operation {0!r}'.format(op))
@@ -38,21 +38,67 @@ Helper utilities.
 
 from . import XMPError
 from .files import XMPFiles
+from .core import XMPIterator
+from .consts import PropFlags, XMP_PROP_IS_SCHEMA
+import collections
 import os
+import sys
+import threading
 from .exempi import EXEMPI as _cexempi
 
-__all__ = ['terminate', 'object_to_dict', 'file_to_dict']
+__all__ = ['terminate', 'object_to_dict', 'file_to_dict', 'XMPProperty',
+           'FileDictCache']
 
-def object_to_dict(xmp):
+XMPProperty = collections.namedtuple('XMPProperty', ['name', 'value', 'flags'])
+XMPProperty.__doc__ = """
+Compact representation of a single property as returned by
+:func:`object_to_dict` with ``compact=True``. ``flags`` is a
+:class:`libxmp.consts.PropFlags` value shared between all properties having
+the same options.
+"""
+
+# One PropFlags instance per distinct option bits, shared by all results.
+_FLAGS_CACHE = {}
+
+def _shared_flags(bits):
+    try:
+        return _FLAGS_CACHE[bits]
+    except KeyError:
+        return _FLAGS_CACHE.setdefault(bits, PropFlags(bits))
+
+def _object_to_compact_dict(xmp):
+    dxmp = dict()
+    intern = sys.intern
+
+    for schema, name, value, options in XMPIterator(xmp, raw=True):
+        if options & XMP_PROP_IS_SCHEMA:
+            dxmp[intern(schema)] = []
+        else:
+            prop = XMPProperty(intern(name), value, _shared_flags(options))
+            dxmp[schema].append(prop)
+
+    return dxmp
+
+def object_to_dict(xmp, compact=False):
     """
     Extracts all XMP data from a given XMPMeta instance organizing it into a
     standard Python dictionary.
+
+    :param xmp: XMPMeta instance to extract data from.
+    :param compact: If True, each property is stored as a
+        :class:`XMPProperty` tuple whose options are a shared
+        :class:`libxmp.consts.PropFlags` value instead of a dictionary of
+        booleans. Property names and schemas are interned. This uses much
+        less memory when many objects are held at once.
     """
     dxmp = dict()
 
     if not xmp:
         return {}
 
+    if compact:
+        return _object_to_compact_dict(xmp)
+
     for item in xmp:
         if item[-1]['IS_SCHEMA']:
             dxmp[item[0]] = []
@@ -61,27 +107,146 @@ def object_to_dict(xmp):
 
     return dxmp
 
-def file_to_dict(file_path):
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'evictions',
+                                                 'entries', 'bytes'])
+
+def _approx_size(obj):
+    """Approximate memory used by a result of object_to_dict, in bytes."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _approx_size(key) + _approx_size(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += _approx_size(item)
+    return size
+
+class FileDictCache(object):
+    """
+    Size-bounded LRU cache of :func:`file_to_dict` results, for use with its
+    ``cache`` argument.
+
+    Entries are keyed on the identity of the file, i.e. its device, inode,
+    size and modification time, so a cached result is reused for as long as
+    the file is not modified or replaced. Cached results are shared between
+    callers and must not be modified.
+
+    The cache is safe to share between threads.
+
+    :param int maxsize: Maximum number of entries, or None for no limit.
+    :param int maxbytes: Maximum approximate memory held by the cached
+        results, or None for no limit.
+    """
+    def __init__(self, maxsize=1024, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Look up an entry, marking it as most recently used.
+
+        :param key: Cache key as built by :func:`file_to_dict`.
+        :return: The cached result or `default` if there is none.
+        """
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store an entry, evicting the least recently used ones as needed.
+
+        A result larger than ``maxbytes`` on its own is not stored.
+
+        :param key: Cache key as built by :func:`file_to_dict`.
+        :param value: The result to cache.
+        """
+        size = _approx_size(value)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while ((self.maxsize is not None
+                    and len(self._entries) > self.maxsize)
+                   or (self.maxbytes is not None
+                       and self._bytes > self.maxbytes)):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+
+    def clear(self):
+        """
+        Remove all entries. Statistics are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Report cache statistics.
+
+        :return: A ``CacheInfo(hits, misses, evictions, entries, bytes)``
+            named tuple.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions,
+                             len(self._entries), self._bytes)
+
+def file_to_dict(file_path, compact=False, cache=None):
     """
     Extracts all XMP data from a given file organizing it into a standard Python
     dictionary.
 
     :param file_path: Path to file to open.
+    :param compact: Use the compact representation, see :func:`object_to_dict`.
+    :param cache: Optional :class:`FileDictCache`. If the file is unchanged
+        since its result was cached, that result is returned without opening
+        the file.
     :return: An empty dictionary if there's no valid XMP in the file passed as
         an argument.
     """
     if not os.path.exists(file_path):
         raise IOError("No such file or directory:  '{0}'".format(file_path))
 
-    xmpfile = XMPFiles()
+    if cache is not None:
+        st = os.stat(file_path)
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, compact)
+        result = cache.get(key)
+        if result is not None:
+            return result
 
-    try:
-        xmpfile.open_file( file_path, open_read=True )
-        xmp = xmpfile.get_xmp()
-    except XMPError:
-        return {}
+    with XMPFiles() as xmpfile:
+        try:
+            xmpfile.open_file( file_path, open_read=True )
+            xmp = xmpfile.get_xmp()
+        except XMPError:
+            result = {}
+        else:
+            result = object_to_dict(xmp, compact=compact)
 
-    return object_to_dict(xmp)
+    if cache is not None:
+        cache.put(key, result)
+    return result
 
 
 
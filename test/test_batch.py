@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import libxmp
+from libxmp import XMPError, XMPFiles, batch
+from libxmp.consts import XMP_NS_XMP as NS_XAP
+from libxmp.utils import file_to_dict
+
+from .common_fixtures import setup_sample_files
+
+
+class BatchExtractTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.samplefiles, self.formats = setup_sample_files(self.tempdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_extract_ordered(self):
+        """Results come back in input order and match file_to_dict."""
+        results = list(batch.extract(self.samplefiles, workers=4,
+                                     ordered=True, max_in_flight=2))
+        self.assertEqual([r.path for r in results], self.samplefiles)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.xmp, file_to_dict(result.path))
+
+    def test_extract_directory(self):
+        """A directory is walked and every file is reported once."""
+        results = list(batch.extract(self.tempdir, workers=2))
+        self.assertEqual(sorted(r.path for r in results),
+                         sorted(self.samplefiles))
+
+    def test_extract_process(self):
+        results = list(batch.extract(self.samplefiles[:2], workers=2,
+                                     executor='process', ordered=True))
+        self.assertEqual([r.path for r in results], self.samplefiles[:2])
+        self.assertTrue(all(r.xmp for r in results))
+
+    def test_extract_errors(self):
+        """Failing files are reported without stopping the run."""
+        missing = os.path.join(self.tempdir, 'missing.jpg')
+        paths = [missing] + self.samplefiles[:1]
+        results = list(batch.extract(paths, ordered=True))
+        self.assertIsNone(results[0].xmp)
+        self.assertIsInstance(results[0].error, (XMPError, IOError))
+        self.assertIsNone(results[1].error)
+
+    def test_extract_path_types(self):
+        """Bytes, path-like and undecodable paths are read like str paths."""
+        jpeg = next(path for path in self.samplefiles
+                    if path.endswith('.jpg'))
+        undecodable = os.path.join(self.tempdir, os.fsdecode(b'b\xff.jpg'))
+        shutil.copyfile(jpeg, undecodable)
+        expected = file_to_dict(jpeg)
+
+        sources = [os.fsencode(undecodable), pathlib.Path(undecodable),
+                   [undecodable, pathlib.Path(jpeg)]]
+        for source in sources:
+            results = list(batch.extract(source, ordered=True))
+            self.assertTrue(results)
+            for result in results:
+                self.assertIsNone(result.error)
+                self.assertEqual(result.xmp, expected)
+
+        # The same file found by walking a str or a bytes directory.
+        for source in (self.tempdir, os.fsencode(self.tempdir)):
+            results = list(batch.extract(source))
+            found = [r for r in results
+                     if os.fsdecode(r.path) == undecodable]
+            self.assertEqual(len(found), 1)
+            self.assertEqual(found[0].xmp, expected)
+
+    def test_iter_paths_errors(self):
+        """Directories that cannot be listed are reported, not skipped."""
+        subdir = os.path.join(self.tempdir, 'sub')
+        os.mkdir(subdir)
+        scandir = os.scandir
+
+        def failing_scandir(path):
+            if path == subdir:
+                raise PermissionError(13, 'Permission denied', path)
+            return scandir(path)
+
+        with patch('os.scandir', failing_scandir):
+            with self.assertRaises(PermissionError):
+                list(batch.iter_paths(self.tempdir))
+            errors = []
+            paths = list(batch.iter_paths(self.tempdir, errors.append))
+        self.assertEqual(paths, sorted(self.samplefiles))
+        self.assertEqual([err.filename for err in errors], [subdir])
+
+    def test_bad_executor(self):
+        """Bad pool arguments are reported without iterating."""
+        with self.assertRaises(ValueError):
+            batch.extract(self.samplefiles, executor='fiber')
+        with self.assertRaises(ValueError):
+            batch.extract(self.samplefiles, workers=0)
+        with self.assertRaises(ValueError):
+            batch.apply(self.samplefiles, set_creator_tool, executor='fiber',
+                        journal=os.path.join(self.tempdir, 'journal'))
+
+
+def set_creator_tool(xmp):
+    xmp.set_property(NS_XAP, 'CreatorTool', 'libxmp batch')
+
+
+class BatchApplyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        samplefiles, _ = setup_sample_files(self.tempdir)
+        self.paths = [path for path in samplefiles
+                      if path.endswith(('.jpg', '.tif'))]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def creator_tool(self, path):
+        with XMPFiles(file_path=path) as xmpfile:
+            return xmpfile.get_xmp().get_property(NS_XAP, 'CreatorTool')
+
+    def test_apply_function(self):
+        results = list(batch.apply(self.paths, set_creator_tool, workers=2,
+                                   ordered=True))
+        self.assertEqual([r.path for r in results], self.paths)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertTrue(result.ok and result.changed)
+            self.assertGreater(result.duration, 0)
+            # A safe update rewrites the file.
+            self.assertFalse(result.in_place)
+            self.assertEqual(self.creator_tool(result.path), 'libxmp batch')
+
+        # Nothing to change the second time around.
+        results = list(batch.apply(self.paths, set_creator_tool))
+        self.assertFalse(any(r.changed for r in results))
+
+    def test_apply_patch(self):
+        path = self.paths[0]
+        with XMPFiles(file_path=path) as xmpfile:
+            old = xmpfile.get_xmp()
+        new = old.clone()
+        set_creator_tool(new)
+        patch = libxmp.diff(old, new)
+
+        results = list(batch.apply(self.paths, patch, safe_update=False,
+                                   ordered=True))
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(self.creator_tool(path), 'libxmp batch')
+        # The short property fits in the padding of the sample JPEG.
+        self.assertTrue(results[0].in_place)
+
+    def test_apply_resume(self):
+        journal = os.path.join(self.tempdir, 'journal.log')
+        results = batch.apply(self.paths, set_creator_tool, journal=journal,
+                              workers=1, ordered=True)
+        next(results)
+        results.close()
+
+        results = list(batch.apply(self.paths, set_creator_tool,
+                                   journal=journal))
+        self.assertEqual(sorted(r.path for r in results),
+                         sorted(self.paths[1:]))
+        with open(journal) as fptr:
+            self.assertEqual(len(fptr.readlines()), len(self.paths))
+
+    def test_apply_journal_paths(self):
+        """Bytes and path-like paths are edited and recorded as text in the
+        journal."""
+        journal = os.path.join(self.tempdir, 'journal.log')
+        paths = [os.fsencode(self.paths[0]), pathlib.Path(self.paths[1])]
+        results = list(batch.apply(paths, set_creator_tool, journal=journal,
+                                   ordered=True))
+        self.assertEqual([r.path for r in results], paths)
+        self.assertTrue(all(r.ok for r in results))
+        for path in self.paths[:2]:
+            self.assertEqual(self.creator_tool(path), 'libxmp batch')
+        with open(journal) as fptr:
+            recorded = [json.loads(line)['path'] for line in fptr]
+        self.assertEqual(recorded, self.paths[:2])
+
+    def test_apply_errors(self):
+        def fail(xmp):
+            raise RuntimeError('edit failed')
+        results = list(batch.apply(self.paths, fail))
+        self.assertFalse(any(r.ok for r in results))
+        self.assertIsInstance(results[0].error, RuntimeError)
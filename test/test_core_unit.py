@@ -41,16 +41,16 @@ import importlib.resources
 import shutil
 import tempfile
 
-import pytz
-
 import libxmp
-from libxmp import XMPFiles, XMPMeta, XMPError
-from libxmp.utils import file_to_dict, object_to_dict
+from libxmp import XMPFiles, XMPMeta, XMPError, XMPIterator
+from libxmp import exempi
+from libxmp.utils import file_to_dict, object_to_dict, XMPProperty
+from libxmp.utils import FileDictCache
 
 from .common_fixtures import setup_sample_files
 from . import xmpcoverage
 
-from libxmp.consts import XMP_ITERATOR_OPTIONS, XMP_SKIP_OPTIONS
+from libxmp.consts import XMP_ITERATOR_OPTIONS, XMP_SKIP_OPTIONS, PropFlags
 from libxmp.consts import XMP_NS_XMP as NS_XAP
 from libxmp.consts import XMP_NS_CC as NS_CC
 from libxmp.consts import XMP_NS_DC as NS_DC
@@ -76,6 +76,20 @@ class XMPMetaTestCase(unittest.TestCase):
         self.assertTrue( xmp.xmpptr )
         del xmp
 
+    def test_context_manager(self):
+        """Native objects are released on exit and by free()."""
+        before = exempi.live_handles()
+        with XMPMeta() as xmp:
+            self.assertTrue( xmp.xmpptr )
+            for _ in xmp:
+                pass
+            self.assertEqual( exempi.live_handles()['xmp'], before['xmp'] + 1 )
+        self.assertIsNone( xmp.xmpptr )
+        self.assertEqual( exempi.live_handles(), before )
+        # Freeing twice is harmless.
+        xmp.free()
+        self.assertEqual( exempi.live_handles(), before )
+
     def test_test_files(self):
         for f in self.samplefiles:
             self.assertTrue( os.path.exists(f), "Test file does not exists." )
@@ -109,6 +123,116 @@ class XMPMetaTestCase(unittest.TestCase):
         self.assertEqual(prop, u"Simple1 value" )
         del xmp
 
+    def test_get_properties(self):
+        xmp = XMPMeta()
+        xmp.parse_from_str( xmpcoverage.RDFCoverage, xmpmeta_wrap=True )
+        props = [(xmpcoverage.NS1, "SimpleProp1"),
+                 (xmpcoverage.NS1, "SimpleProp2"),
+                 (xmpcoverage.NS1, "NotReallyThere")]
+        values = xmp.get_properties(props, default='missing')
+        self.assertEqual(values, {props[0]: "Simple1 value",
+                                  props[1]: "Simple2 value",
+                                  props[2]: "missing"})
+        self.assertEqual(xmp.get_properties([]), {})
+        del xmp
+
+    def test_set_properties(self):
+        when = datetime.datetime(2020, 5, 17, 8, 30,
+                                 tzinfo=datetime.timezone.utc)
+        values = {(NS_XAP, 'CreatorTool'): 'libxmp <&>',
+                  (NS_XAP, 'Rating'): 3,
+                  (NS_CAMERA_RAW_SETTINGS, 'Exposure'): 1.5,
+                  (NS_CAMERA_RAW_SETTINGS, 'AutoBrightness'): True,
+                  (NS_XAP, 'CreateDate'): when,
+                  (NS_DC, 'format'): 42}
+        for single_parse in (False, True):
+            xmp = XMPMeta()
+            xmp.set_property(NS_XAP, 'CreatorTool', 'overwritten')
+            xmp.set_properties(values, types={(NS_DC, 'format'): 'str'},
+                               single_parse=single_parse)
+            self.assertEqual(xmp.get_property(NS_XAP, 'CreatorTool'),
+                             'libxmp <&>')
+            self.assertEqual(xmp.get_property_int(NS_XAP, 'Rating'), 3)
+            self.assertEqual(
+                xmp.get_property_float(NS_CAMERA_RAW_SETTINGS, 'Exposure'),
+                1.5)
+            self.assertTrue(
+                xmp.get_property_bool(NS_CAMERA_RAW_SETTINGS,
+                                      'AutoBrightness'))
+            self.assertEqual(xmp.get_property_datetime(NS_XAP, 'CreateDate'),
+                             when)
+            self.assertEqual(xmp.get_property(NS_DC, 'format'), '42')
+
+        with self.assertRaises(XMPError):
+            xmp.set_properties({(NS_XAP, 'Rating'): object()})
+
+    def test_set_properties_type_mismatch(self):
+        """Values not matching their type name are rejected."""
+        when = datetime.datetime(2020, 5, 17, 8, 30,
+                                 tzinfo=datetime.timezone.utc)
+        for type_name, value in (('str', None), ('bool', 'false'),
+                                 ('int', 1.5), ('long', '3'),
+                                 ('float', '1.5'), ('datetime', '2020-05-17'),
+                                 ('datetime', when.date())):
+            xmp = XMPMeta()
+            with self.assertRaises(XMPError):
+                xmp.set_properties({(NS_XAP, 'Label'): value},
+                                   types={(NS_XAP, 'Label'): type_name})
+            self.assertFalse(xmp.does_property_exist(NS_XAP, 'Label'))
+
+        xmp = XMPMeta()
+        xmp.set_properties({(NS_XAP, 'Rating'): 2},
+                           types={(NS_XAP, 'Rating'): 'float'})
+        self.assertEqual(xmp.get_property_float(NS_XAP, 'Rating'), 2.0)
+
+    def test_set_properties_single_parse(self):
+        """Unprefixed names go through the generated RDF, and the packet is
+        the same as when setting the properties one by one."""
+        values = {(NS_XAP, 'CreatorTool'): 'libxmp <&>',
+                  (NS_XAP, 'Rating'): 3,
+                  (NS_XAP, 'Label'): 'label',
+                  (NS_CAMERA_RAW_SETTINGS, 'Exposure'): 1.5,
+                  (NS_CAMERA_RAW_SETTINGS, 'AutoBrightness'): True,
+                  (NS_CAMERA_RAW_SETTINGS, 'crs:Contrast'): 25}
+        props = [(schema, name, libxmp.core._value_kind(value), value, 0)
+                 for (schema, name), value in values.items()]
+        self.assertEqual(XMPMeta()._set_by_parse(props), [])
+
+        one_by_one = XMPMeta()
+        one_by_one.set_properties(values)
+        parsed = XMPMeta()
+        parsed.set_properties(values, single_parse=True)
+        self.assertEqual(object_to_dict(parsed), object_to_dict(one_by_one))
+        self.assertEqual(
+            parsed.get_property(NS_CAMERA_RAW_SETTINGS, 'Exposure'),
+            one_by_one.get_property(NS_CAMERA_RAW_SETTINGS, 'Exposure'))
+
+    def test_set_properties_int_range(self):
+        """Integers that would wrap around in exempi are rejected."""
+        self.assertEqual(libxmp.core._value_kind(2**63 - 1), 'int64')
+        self.assertEqual(libxmp.core._value_kind(-2**63), 'int64')
+        for value in (2**63, -2**63 - 1, 2**70):
+            with self.assertRaises(XMPError):
+                libxmp.core._value_kind(value)
+
+        for single_parse in (False, True):
+            xmp = XMPMeta()
+            with self.assertRaises(XMPError):
+                xmp.set_properties({(NS_XAP, 'Rating'): 2**70},
+                                   single_parse=single_parse)
+            with self.assertRaises(XMPError):
+                xmp.set_properties({(NS_XAP, 'Rating'): 2**40},
+                                   types={(NS_XAP, 'Rating'): 'int'},
+                                   single_parse=single_parse)
+            self.assertFalse(xmp.does_property_exist(NS_XAP, 'Rating'))
+
+        xmp = XMPMeta()
+        with self.assertRaises(XMPError):
+            xmp.set_property_int(NS_XAP, 'Rating', 2**31)
+        with self.assertRaises(XMPError):
+            xmp.set_property_long(NS_XAP, 'Rating', -2**63 - 1)
+        self.assertFalse(xmp.does_property_exist(NS_XAP, 'Rating'))
+
     def test_shorthand_rdf(self):
         """
         Tests pass so long as no error is issued.
@@ -166,6 +290,27 @@ class XMPMetaTestCase(unittest.TestCase):
 
         del xmp
 
+    def test_serialize_cache(self):
+        """Serializations are reused until the packet changes."""
+        xmp = XMPMeta()
+        xmp.parse_from_str( xmpcoverage.RDFCoverage, xmpmeta_wrap=True )
+        first = xmp.serialize_to_str(use_compact_format=True)
+        self.assertIs( xmp.serialize_to_str(use_compact_format=True), first )
+        self.assertIsNot( xmp.serialize_to_str(), first )
+        self.assertIs( str(xmp), str(xmp) )
+
+        xmp.set_property( NS_DC, 'format', 'image/x-test' )
+        second = xmp.serialize_to_str(use_compact_format=True)
+        self.assertIn( 'image/x-test', second )
+        self.assertIn( 'image/x-test', str(xmp) )
+
+        xmp.delete_property( NS_DC, 'format' )
+        self.assertNotIn( 'image/x-test',
+                          xmp.serialize_to_str(use_compact_format=True) )
+
+        xmp.parse_from_str( xmpcoverage.ShorthandRDF, xmpmeta_wrap=True )
+        self.assertIn( 'Canon PowerShot S300', str(xmp) )
+
     def test_serialize_and_format(self):
         xmp = XMPMeta()
         xmp.parse_from_str(xmpcoverage.RDFCoverage, xmpmeta_wrap=True)
@@ -196,11 +341,34 @@ class XMPMetaTestCase(unittest.TestCase):
         self.assertTrue( xmp1 == xmp1, "XMP1 not equal it self" )
         self.assertFalse( xmp1 != xmp1, "XMP1 is equal it self" )
         xmp2 = xmp1.clone()
+        self.assertTrue( xmp1 == xmp2, "Clone holds the same properties" )
+        self.assertFalse( xmp1 != xmp2, "Clone holds the same properties" )
+        xmp2.set_property( NS_DC, 'format', 'image/jpeg' )
         self.assertFalse( xmp1 == xmp2, "XMP1 is not equal XMP2" )
         self.assertTrue( xmp1 != xmp2, "XMP1 is not equal XMP2" )
         del xmp1
         del xmp2
 
+    def test_fingerprint(self):
+        xmp1 = XMPMeta()
+        xmp1.set_property( NS_DC, 'format', 'image/jpeg' )
+        xmp1.set_property( NS_XAP, 'CreatorTool', 'libxmp' )
+        xmp2 = XMPMeta()
+        xmp2.set_property( NS_XAP, 'CreatorTool', 'libxmp' )
+        xmp2.set_property( NS_DC, 'format', 'image/jpeg' )
+
+        # Insertion order does not matter.
+        self.assertEqual( len(xmp1.fingerprint()), 16 )
+        self.assertEqual( xmp1.fingerprint(), xmp2.fingerprint() )
+        self.assertEqual( xmp1, xmp2 )
+        self.assertEqual( hash(xmp1), hash(xmp2) )
+        self.assertEqual( len({xmp1, xmp2}), 1 )
+        self.assertEqual( XMPMeta(xmp_str=str(xmp1)), xmp1 )
+
+        xmp2.set_property( NS_DC, 'format', 'image/png' )
+        self.assertNotEqual( xmp1, xmp2 )
+        self.assertNotEqual( xmp1, 'not a packet' )
+
     def test_text_property_450_file(self):
         files = ["fixtures/BlueSquare450.xmp",
                  "fixtures/BlueSquare450.tif"]
@@ -264,7 +432,8 @@ class XMPMetaTestCase(unittest.TestCase):
         xmp.set_property(NS_CC, "License", "Foo")
         self.assertEqual(xmp.get_property(NS_CC, "License"), "Foo")
 
-        the_dt = datetime.datetime(2005, 12, 25, 12, 42, 42, tzinfo=pytz.utc)
+        the_dt = datetime.datetime(2005, 12, 25, 12, 42, 42,
+                                   tzinfo=datetime.timezone.utc)
         xmp.set_property_datetime(NS_EXIF, "DateTimeOriginal", the_dt)
         self.assertEqual(xmp.get_property(NS_EXIF, "DateTimeOriginal"),
                          "2005-12-25T12:42:42")
@@ -272,7 +441,16 @@ class XMPMetaTestCase(unittest.TestCase):
         prop = xmp.get_property_datetime(NS_EXIF, "DateTimeOriginal")
         self.assertEqual(prop.year, 2005)
         self.assertEqual(prop.minute, 42)
-        self.assertEqual(prop.tzinfo, pytz.utc)
+        self.assertEqual(prop.tzinfo, datetime.timezone.utc)
+
+        # Offsets and fractional seconds are preserved.
+        tzinfo = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+        the_dt = datetime.datetime(2005, 12, 25, 12, 42, 42, 123456,
+                                   tzinfo=tzinfo)
+        xmp.set_property_datetime(NS_EXIF, "DateTimeOriginal", the_dt)
+        prop = xmp.get_property_datetime(NS_EXIF, "DateTimeOriginal")
+        self.assertEqual(prop, the_dt)
+        self.assertEqual(prop.utcoffset(), tzinfo.utcoffset(None))
 
 
     def test_write_new_struct_in_array(self):
@@ -356,8 +534,9 @@ class XMPMetaTestCase(unittest.TestCase):
 
         the_prop = xmp.get_property_datetime(NS_EXIF, "DateTimeOriginal")
         self.assertEqual(the_prop.year, 2006) 
+        self.assertEqual(the_prop.hour, 23)
         self.assertEqual(the_prop.minute, 20)
-        self.assertEqual(the_prop.tzinfo, pytz.utc)
+        self.assertEqual(the_prop.utcoffset(), datetime.timedelta(hours=-5))
 
         prop = xmp.get_property(NS_XAP, "Rating")
         self.assertEqual(prop, "3")
@@ -418,6 +597,20 @@ class XMPMetaTestCase(unittest.TestCase):
         xmp.append_array_item(NS_DC, "creator", "donuts")
         self.assertEqual(xmp.count_array_items(NS_DC, "creator"), 4)
 
+    def test_iterator_raw(self):
+        """Raw iteration reports the option flags as an integer bit mask."""
+        xmp = XMPMeta()
+        xmp.parse_from_str(xmpcoverage.RDFCoverage, xmpmeta_wrap=True)
+
+        nodes = list(XMPIterator(xmp))
+        raw_nodes = list(XMPIterator(xmp, raw=True))
+        self.assertEqual(len(nodes), len(raw_nodes))
+        for node, raw_node in zip(nodes, raw_nodes):
+            self.assertEqual(node[:3], raw_node[:3])
+            for opt, value in node[3].items():
+                bit = getattr(libxmp.consts, 'XMP_PROP_' + opt)
+                self.assertEqual(value, bool(raw_node[3] & bit))
+
     def test_skip(self):
         """Verify usage of XMPMeta skip method.
         """
@@ -470,6 +663,89 @@ class UtilsTestCase(unittest.TestCase):
         for filename in self.samplefiles:
             self.assertTrue( file_to_dict(filename), "Expected dictionary" )
 
+    def test_object_to_dict_compact(self):
+        for filename in self.samplefiles:
+            xmpfile = XMPFiles( file_path=filename )
+            xmp = xmpfile.get_xmp()
+            expected = object_to_dict( xmp )
+            compact = object_to_dict( xmp, compact=True )
+            xmpfile.close_file()
+            self.assertEqual( list(compact.keys()), list(expected.keys()) )
+            for schema, props in expected.items():
+                self.assertEqual( len(compact[schema]), len(props) )
+                for prop, (name, value, options) in zip(compact[schema], props):
+                    self.assertIsInstance( prop, XMPProperty )
+                    self.assertEqual( (prop.name, prop.value), (name, value) )
+                    for opt, is_set in options.items():
+                        flag = getattr( PropFlags, opt )
+                        self.assertEqual( bool(prop.flags & flag), is_set )
+
+    def test_from_dict(self):
+        for filename in self.samplefiles:
+            xmpfile = XMPFiles( file_path=filename )
+            xmp = xmpfile.get_xmp()
+            xmpfile.close_file()
+            if xmp is None:
+                continue
+            for compact in (False, True):
+                dxmp = object_to_dict( xmp, compact=compact )
+                built = XMPMeta.from_dict( dxmp )
+                self.assertEqual( object_to_dict( built, compact=compact ),
+                                  dxmp )
+                self.assertEqual( built, xmp )
+
+        self.assertEqual( object_to_dict( XMPMeta.from_dict( {} ) ), {} )
+
+    def test_from_dict_bad_values(self):
+        with self.assertRaises( XMPError ):
+            XMPMeta.from_dict( {NS_XAP: [('xmp:Label', None, 0)]} )
+        with self.assertRaises( XMPError ):
+            XMPMeta.from_dict( {NS_XAP: [('xmp:Rating', 3, 0)]} )
+
+    def test_from_dict_later_namespace(self):
+        """A struct field may use the prefix of a later schema."""
+        late_ns = 'http://ns.example.com/fromdict/late/'
+        dxmp = {NS_XAP: [('xmp:Info', '', int(PropFlags.VALUE_IS_STRUCT)),
+                         ('xmp:Info/fdlate:Field', 'field', 0)],
+                late_ns: [('fdlate:Top', 'top', 0)]}
+        xmp = XMPMeta.from_dict( dxmp )
+        self.assertEqual( xmp.get_property( late_ns, 'Top' ), 'top' )
+        self.assertEqual( xmp.get_property( NS_XAP, 'Info/fdlate:Field' ),
+                          'field' )
+
+    def test_file_to_dict_cache(self):
+        cache = FileDictCache(maxsize=2)
+        filename = self.samplefiles[0]
+        first = file_to_dict(filename, cache=cache)
+        self.assertIs( file_to_dict(filename, cache=cache), first )
+        self.assertEqual( cache.stats()[:3], (1, 1, 0) )
+
+        # A modified file is read again.
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        second = file_to_dict(filename, cache=cache)
+        self.assertIsNot( second, first )
+        self.assertEqual( second, first )
+
+        file_to_dict(self.samplefiles[1], cache=cache)
+        info = cache.stats()
+        self.assertEqual( (info.misses, info.evictions, info.entries),
+                          (3, 1, 2) )
+        self.assertTrue( info.bytes > 0 )
+
+    def test_file_dict_cache_maxbytes(self):
+        cache = FileDictCache(maxsize=None, maxbytes=1000)
+        cache.put('a', 'x' * 400)
+        cache.put('b', 'x' * 400)
+        self.assertEqual( cache.get('a'), 'x' * 400 )
+        cache.put('c', 'x' * 400)
+        # 'b' was the least recently used entry.
+        self.assertIsNone( cache.get('b') )
+        self.assertEqual( len(cache), 2 )
+        cache.put('d', 'x' * 2000)
+        self.assertIsNone( cache.get('d') )
+        self.assertEqual( cache.stats().evictions, 1 )
+
     def test_file_to_dict_nofile(self):
         self.assertRaises( IOError, file_to_dict, "nonexistingfile.ext" )
 
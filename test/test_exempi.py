@@ -16,8 +16,6 @@ import tempfile
 
 import unittest
 
-import pytz
-
 import libxmp
 from libxmp import consts
 from libxmp import exempi
@@ -85,6 +83,17 @@ class TestPythonXmpToolkit(unittest.TestCase):
         with self.assertRaises(IOError):
             exempi.files_check_file_format('notthere.xmp')
 
+    def test_prototypes_bound_on_load(self):
+        """
+        Function prototypes are configured once, when the library is loaded.
+        """
+        exempi.get_error()
+        for name, (restype, argtypes) in exempi._PROTOTYPES.items():
+            func = exempi.EXEMPI.__dict__[name]
+            self.assertIs(func.restype, restype)
+            if argtypes is not None:
+                self.assertEqual(list(func.argtypes), argtypes)
+
 class TestExempi(unittest.TestCase):
     """
     Test suite for libexempi routine wrappers.
@@ -134,7 +143,8 @@ class TestExempi(unittest.TestCase):
         the_prop, _ = exempi.get_property(xmp, NS_CC, "License")
         self.assertEqual(the_prop, "Foo")
 
-        the_dt = datetime.datetime(2005, 12, 25, 12, 42, 42, tzinfo=pytz.utc)
+        the_dt = datetime.datetime(2005, 12, 25, 12, 42, 42,
+                                   tzinfo=datetime.timezone.utc)
         exempi.set_property_date(xmp, NS_EXIF, "DateTimeOriginal", the_dt, 0)
         the_prop, _ = exempi.get_property(xmp, NS_EXIF, "DateTimeOriginal")
         self.assertEqual("2005-12-25T12:42:42", the_prop)
@@ -142,7 +152,7 @@ class TestExempi(unittest.TestCase):
         the_prop, _ = exempi.get_property_date(xmp, NS_EXIF, "DateTimeOriginal")
         self.assertEqual(the_prop.year, 2005)
         self.assertEqual(the_prop.minute, 42)
-        self.assertEqual(the_prop.tzinfo, pytz.utc)
+        self.assertEqual(the_prop.tzinfo, datetime.timezone.utc)
 
         exempi.free(xmp)
 
@@ -245,11 +255,12 @@ class TestExempi(unittest.TestCase):
         the_prop, _ = exempi.get_property(xmp, NS_EXIF, "DateTimeOriginal")
         self.assertEqual(the_prop, "2006-12-07T23:20:43-05:00")
 
-        # When the time information is read back, it is UTC.
+        # The time information is read back with its UTC offset.
         the_prop, _ = exempi.get_property_date(xmp, NS_EXIF, "DateTimeOriginal")
         self.assertEqual(the_prop.year, 2006)
+        self.assertEqual(the_prop.hour, 23)
         self.assertEqual(the_prop.minute, 20)
-        self.assertEqual(the_prop.tzinfo, pytz.utc)
+        self.assertEqual(the_prop.utcoffset(), datetime.timedelta(hours=-5))
 
         the_prop, _ = exempi.get_property(xmp, NS_XAP, "Rating")
         self.assertEqual(the_prop, "3")
@@ -349,6 +360,33 @@ class TestExempi(unittest.TestCase):
 
         exempi.free(xmp)
 
+    def test_string_pool(self):
+        """XmpString handles are recycled, also when a wrapper raises."""
+        traversable = importlib.resources.files(__package__) / "samples/test1.xmp"
+        with importlib.resources.as_file(traversable) as path:
+            filename = str(path)
+            with open(filename, 'r') as fptr:
+                strbuffer = fptr.read()
+
+        xmp = exempi.new_empty()
+        exempi.parse(xmp, strbuffer)
+
+        iterator = exempi.iterator_new(xmp, None, None, 0)
+        exempi.iterator_next(iterator)
+        exempi.iterator_free(iterator)
+        handles = list(exempi._string_pool.pool.handles)
+        self.assertTrue(len(handles) >= 3)
+
+        the_prop, _ = exempi.get_property(xmp, NS_XAP, "Rating")
+        self.assertEqual(the_prop, "3")
+        with self.assertRaises(libxmp.XMPError):
+            exempi.get_property(xmp, NS_XAP, "NotReallyThere")
+        exempi.serialize(xmp, 0, 0)
+        self.assertEqual(sorted(exempi._string_pool.pool.handles),
+                         sorted(handles))
+
+        exempi.free(xmp)
+
 
     def test_tiff_leak(self):
         """Corresponds to test-tiff-leak.cpp"""
@@ -396,7 +434,7 @@ class TestExempi(unittest.TestCase):
         self.assertEqual(the_prop.year, 2005)
         self.assertEqual(the_prop.minute, 42)
         self.assertEqual(the_prop, datetime.datetime(2005, 12, 25, 12, 42, 42,
-                                   tzinfo=pytz.utc))
+                                   tzinfo=datetime.timezone.utc))
 
         exempi.free(xmp)
 
@@ -46,12 +46,17 @@ from unittest.mock import patch
 from io import StringIO
 
 from libxmp import XMPFiles, XMPMeta, XMPError
+from libxmp.files import XMPFilesPool
+from libxmp.files import FixedPadding, ProportionalPadding, AdaptivePadding
+from libxmp.files import add_trace_hook, remove_trace_hook
 from libxmp.consts import XMP_NS_Photoshop as NS_PHOTOSHOP
+from libxmp.consts import XMP_CLOSE_SAFEUPDATE
 from libxmp.consts import XMP_FT_TEXT
 from libxmp.consts import XMP_FT_PDF
 from libxmp.consts import XMP_FT_ILLUSTRATOR
 from libxmp.consts import XMP_FT_MOV
 from libxmp.consts import XMP_FT_XML
+from libxmp.consts import XMP_FT_JPEG
 from libxmp import exempi
 from .common_fixtures import setup_sample_files
 from .samples import open_flags
@@ -185,6 +190,252 @@ class XMPFilesTestCase(unittest.TestCase):
             xmpfile = XMPFiles( file_path=filename )
             xmpfile.close_file()
 
+    def test_context_manager(self):
+        before = exempi.live_handles()
+        with XMPFiles(file_path=self.samplefiles[0]) as xmpfile:
+            self.assertIsInstance(xmpfile.get_xmp(), XMPMeta)
+        self.assertIsNone(xmpfile.xmpfileptr)
+        self.assertEqual(repr(xmpfile), 'XMPFiles()')
+        self.assertEqual(exempi.live_handles()['files'], before['files'])
+        xmpfile.close()
+
+    def test_trace_hooks(self):
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        events = []
+        add_trace_hook(events.append)
+        try:
+            with XMPFiles(file_path=filename, open_forupdate=True) as xmpfile:
+                xmp = xmpfile.get_xmp()
+                self.assertTrue(xmpfile.put_xmp(xmp, in_place=True))
+            missing = os.path.join(self.tempdir, 'missing.jpg')
+            self.assertRaises(IOError, XMPFiles().open_file, missing)
+        finally:
+            remove_trace_hook(events.append)
+
+        self.assertEqual([event.operation for event in events],
+                         ['open_file', 'get_xmp', 'put_xmp', 'close_file',
+                          'open_file'])
+        for event in events[:4]:
+            self.assertEqual(event.path, filename)
+            self.assertEqual(event.file_format, XMP_FT_JPEG)
+            self.assertIsNone(event.error)
+            self.assertTrue(event.duration >= 0)
+        self.assertTrue(events[1].packet_size > 0)
+        # The in-place packet has the length of the packet it replaces.
+        self.assertEqual(events[2].packet_size, events[1].packet_size)
+        self.assertEqual(events[4].path, missing)
+        self.assertIsNone(events[4].file_format)
+        self.assertIsInstance(events[4].error, IOError)
+
+        # No more events once the hook is removed.
+        XMPFiles(file_path=filename).close_file()
+        self.assertEqual(len(events), 5)
+
+        # A put with a padding policy reads the old packet internally, which
+        # is not reported.
+        filename = os.path.join(self.tempdir, 'sig05-002a.xmp')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True,
+                           padding_policy=FixedPadding(4096))
+        xmp = xmpfile.get_xmp()
+        del events[:]
+        add_trace_hook(events.append)
+        try:
+            xmpfile.put_xmp(xmp)
+        finally:
+            remove_trace_hook(events.append)
+        xmpfile.close_file()
+        self.assertEqual([event.operation for event in events], ['put_xmp'])
+        self.assertGreater(events[0].packet_size, 4096)
+
+        # The size of a packet written by the file handler is unknown.
+        filename = os.path.join(self.tempdir, 'BlueSquare.tif')
+        with XMPFiles(file_path=filename, open_forupdate=True) as xmpfile:
+            xmp = xmpfile.get_xmp()
+            del events[:]
+            add_trace_hook(events.append)
+            try:
+                self.assertFalse(xmpfile.put_xmp(xmp))
+            finally:
+                remove_trace_hook(events.append)
+        self.assertIsNone(events[0].packet_size)
+
+    def test_reopen(self):
+        """One handle can open many files in sequence."""
+        xmpfile = XMPFiles()
+        xmpfileptr = xmpfile.xmpfileptr
+        for filename in self.samplefiles:
+            xmpfile.open_file(filename, open_read=True)
+            self.assertIsInstance(xmpfile.get_xmp(), XMPMeta)
+            xmpfile.close_file()
+        self.assertEqual(xmpfile.xmpfileptr, xmpfileptr)
+
+    def test_pool(self):
+        pool = XMPFilesPool(maxsize=1)
+        with pool.handle() as xmpfile:
+            xmpfile.open_file(self.samplefiles[0], open_read=True)
+        # The file is closed on release and the handle is reused.
+        self.assertEqual(len(pool), 1)
+        self.assertIs(pool.acquire(), xmpfile)
+        self.assertEqual(repr(xmpfile), 'XMPFiles()')
+
+        other = XMPFiles()
+        pool.release(xmpfile)
+        pool.release(other)
+        self.assertEqual(len(pool), 1)
+        pool.clear()
+        self.assertEqual(len(pool), 0)
+
+    def test_put_xmp_in_place(self):
+        """A packet that fits in the padding is written over the old one."""
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        size = os.path.getsize(filename)
+        with open(filename, 'rb') as fptr:
+            head = fptr.read(64)
+
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertTrue(xmpfile.put_xmp(xmp, in_place=True))
+        xmpfile.close_file()
+
+        self.assertEqual(os.path.getsize(filename), size)
+        with open(filename, 'rb') as fptr:
+            self.assertEqual(fptr.read(64), head)
+        xmpfile.open_file(filename)
+        xmp = xmpfile.get_xmp()
+        self.assertEqual(xmp.get_property(NS_PHOTOSHOP, 'ICCProfile'), 'foo')
+        xmpfile.close_file()
+
+    def test_put_xmp_in_place_fallback(self):
+        """A packet too large for the padding is written the usual way."""
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'x' * 100000)
+        self.assertFalse(xmpfile.put_xmp(xmp, in_place=True))
+        xmpfile.close_file()
+
+        xmpfile.open_file(filename)
+        xmp = xmpfile.get_xmp()
+        self.assertEqual(xmp.get_property(NS_PHOTOSHOP, 'ICCProfile'),
+                         'x' * 100000)
+        xmpfile.close_file()
+
+        # PNG chunks are checksummed, so they are never patched in place.
+        filename = os.path.join(self.tempdir, 'BlueSquare.png')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertFalse(xmpfile.put_xmp(xmp, in_place=True))
+        xmpfile.close_file()
+
+    def test_put_xmp_in_place_safe_update(self):
+        """A safe update is done by the file handler, not in place."""
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertTrue(xmpfile.put_xmp(xmp, in_place=True))
+        with patch.object(exempi, 'files_put_xmp',
+                          wraps=exempi.files_put_xmp) as put:
+            xmpfile.close_file(XMP_CLOSE_SAFEUPDATE)
+        self.assertEqual(put.call_count, 1)
+
+        xmpfile.open_file(filename)
+        xmp = xmpfile.get_xmp()
+        self.assertEqual(xmp.get_property(NS_PHOTOSHOP, 'ICCProfile'), 'foo')
+        xmpfile.close_file()
+
+    def test_put_xmp_in_place_readonly(self):
+        """A read-only packet is never overwritten in place."""
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        with open(filename, 'rb') as fptr:
+            data = fptr.read()
+        with open(filename, 'wb') as fptr:
+            fptr.write(data.replace(b'<?xpacket end="w"?>',
+                                    b'<?xpacket end="r"?>'))
+
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertFalse(xmpfile.put_xmp(xmp, in_place=True))
+        xmpfile.close_file()
+
+    def test_padding_policy_sidecar(self):
+        """Sidecar files are written with the policy's padding."""
+        filename = os.path.join(self.tempdir, 'sig05-002a.xmp')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True,
+                           padding_policy=FixedPadding(20000))
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertFalse(xmpfile.put_xmp(xmp))
+        xmpfile.close_file()
+        size = os.path.getsize(filename)
+        self.assertGreater(size, 20000)
+
+        # Later edits fit in the reserved space.
+        xmpfile.open_file(filename, open_forupdate=True)
+        xmp = xmpfile.get_xmp()
+        self.assertEqual(xmp.get_property(NS_PHOTOSHOP, 'ICCProfile'), 'foo')
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'x' * 10000)
+        self.assertTrue(xmpfile.put_xmp(xmp, in_place=True))
+        xmpfile.close_file()
+        self.assertEqual(os.path.getsize(filename), size)
+
+    def test_padding_policy_safe_update(self):
+        """A safe update of a sidecar file replaces it with a padded copy."""
+        filename = os.path.join(self.tempdir, 'sig05-002a.xmp')
+        inode = os.stat(filename).st_ino
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True,
+                           padding_policy=FixedPadding(20000))
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        self.assertFalse(xmpfile.put_xmp(xmp))
+        xmpfile.close_file(XMP_CLOSE_SAFEUPDATE)
+        self.assertNotEqual(os.stat(filename).st_ino, inode)
+        self.assertGreater(os.path.getsize(filename), 20000)
+        self.assertEqual(os.listdir(self.tempdir).count('sig05-002a.xmp'), 1)
+        self.assertFalse([name for name in os.listdir(self.tempdir)
+                          if name.endswith('.tmp')])
+
+        xmpfile.open_file(filename)
+        xmp = xmpfile.get_xmp()
+        self.assertEqual(xmp.get_property(NS_PHOTOSHOP, 'ICCProfile'), 'foo')
+        xmpfile.close_file()
+
+    def test_padding_policy_other_formats(self):
+        """The policy is neither consulted nor fed by non-sidecar files."""
+        policy = FixedPadding(4096)
+        filename = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        xmpfile = XMPFiles(file_path=filename, open_forupdate=True,
+                           padding_policy=policy)
+        xmp = xmpfile.get_xmp()
+        xmp.set_property(NS_PHOTOSHOP, 'ICCProfile', 'foo')
+        with patch.object(policy, 'observe') as observe, \
+                patch.object(policy, 'padding') as padding, \
+                patch.object(exempi, 'files_get_new_xmp') as get_new_xmp:
+            with self.assertWarns(RuntimeWarning):
+                self.assertFalse(xmpfile.put_xmp(xmp))
+        xmpfile.close_file()
+        observe.assert_not_called()
+        padding.assert_not_called()
+        get_new_xmp.assert_not_called()
+
+    def test_padding_policies(self):
+        self.assertEqual(FixedPadding(100).padding(5000), 100)
+        policy = ProportionalPadding(0.5, minimum=1000)
+        self.assertEqual(policy.padding(5000), 2500)
+        self.assertEqual(policy.padding(100), 1000)
+
+        policy = AdaptivePadding(minimum=1000, factor=3, history=2)
+        self.assertEqual(policy.padding(5000), 1000)
+        policy.observe(5000, 6000)
+        self.assertEqual(policy.padding(6000), 3000)
+        policy.observe(6000, 5000)
+        policy.observe(5000, 5100)
+        # The 1000 bytes growth is out of the history window.
+        self.assertEqual(policy.padding(5100), 1000)
+
     def test_get_xmp(self):
         for flg in open_flags:
             kwargs = { flg: True }
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Test suite for the libxmp package namespace.
+"""
+
+import subprocess
+import sys
+import unittest
+
+import libxmp
+
+
+class ImportTestCase(unittest.TestCase):
+
+    def test_import_is_lazy(self):
+        """Importing libxmp must not load the exempi bindings or ctypes."""
+        code = ('import sys, libxmp; '
+                'print(" ".join(sorted(sys.modules)))')
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         universal_newlines=True)
+        modules = output.split()
+        self.assertIn('libxmp', modules)
+        for name in ('libxmp.core', 'libxmp.exempi', 'libxmp.files',
+                     'libxmp.utils', 'ctypes'):
+            self.assertNotIn(name, modules)
+
+    def test_lazy_attributes(self):
+        from libxmp.core import XMPMeta
+        from libxmp.files import XMPFiles
+        from libxmp.version import VERSION
+        self.assertIs(libxmp.XMPMeta, XMPMeta)
+        self.assertIs(libxmp.XMPFiles, XMPFiles)
+        self.assertEqual(libxmp.__version__, VERSION)
+        self.assertIs(libxmp.exempi, sys.modules['libxmp.exempi'])
+        self.assertIn('XMPMeta', dir(libxmp))
+        with self.assertRaises(AttributeError):
+            libxmp.no_such_attribute
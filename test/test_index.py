@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from libxmp import batch
+from libxmp.consts import XMP_NS_DC
+from libxmp.index import XMPIndex, UpdateStats
+
+from .common_fixtures import setup_sample_files
+
+
+class XMPIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.samplefiles, self.formats = setup_sample_files(self.tempdir)
+        self.dbdir = tempfile.mkdtemp()
+        self.index = XMPIndex(os.path.join(self.dbdir, 'index.db'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tempdir)
+        shutil.rmtree(self.dbdir)
+
+    def test_update(self):
+        stats = self.index.update(self.tempdir, workers=2)
+        self.assertEqual(stats.added, len(self.samplefiles))
+        self.assertEqual(stats.updated + stats.removed + stats.unchanged, 0)
+
+        jpeg = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        self.assertIn(jpeg, self.index.find(XMP_NS_DC, 'dc:format'))
+        self.assertEqual(self.index.find(XMP_NS_DC, 'dc:format', 'image/jpeg'),
+                         [jpeg])
+        self.assertTrue(self.index.properties(jpeg))
+
+    def test_incremental_update(self):
+        self.index.update(self.tempdir)
+
+        jpeg = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        png = os.path.join(self.tempdir, 'BlueSquare.png')
+        st = os.stat(jpeg)
+        os.utime(jpeg, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        os.remove(png)
+
+        stats = self.index.update(self.tempdir)
+        self.assertEqual(stats, UpdateStats(added=0, updated=1, removed=1,
+                                            unchanged=len(self.samplefiles) - 2,
+                                            failed=0))
+        self.assertTrue(self.index.properties(jpeg))
+        self.assertEqual(self.index.properties(png), [])
+
+    def test_noop_update(self):
+        """Unchanged files are not rewritten."""
+        self.index.update(self.tempdir)
+        rows = self.index._conn.execute('SELECT * FROM files').fetchall()
+        stats = self.index.update(self.tempdir)
+        self.assertEqual(stats.unchanged, len(self.samplefiles))
+        self.assertEqual(
+            self.index._conn.execute('SELECT * FROM files').fetchall(), rows)
+
+    def test_retry_failed(self):
+        """Files whose extraction failed are read again."""
+        def locked(path, compact):
+            return batch.ExtractResult(path, None, OSError('locked'))
+
+        with patch.object(batch, '_extract_file', locked):
+            stats = self.index.update(self.tempdir)
+        self.assertEqual(stats.failed, len(self.samplefiles))
+
+        stats = self.index.update(self.tempdir)
+        self.assertEqual(stats, UpdateStats(added=0,
+                                            updated=len(self.samplefiles),
+                                            removed=0, unchanged=0, failed=0))
+        jpeg = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        self.assertTrue(self.index.properties(jpeg))
+
+    def test_undecodable_path(self):
+        """Paths SQLite cannot store are counted as failed, not fatal."""
+        jpeg = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        shutil.copyfile(jpeg, os.path.join(self.tempdir,
+                                           os.fsdecode(b'b\xff.jpg')))
+        stats = self.index.update(self.tempdir)
+        self.assertEqual(stats.added, len(self.samplefiles))
+        self.assertEqual(stats.failed, 1)
+        self.assertFalse(self.index._conn.in_transaction)
+        self.assertTrue(self.index.properties(jpeg))
+
+    def test_update_rollback(self):
+        """A failing update leaves no transaction open."""
+        with patch.object(XMPIndex, '_store', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.index.update(self.tempdir)
+        self.assertFalse(self.index._conn.in_transaction)
+        self.assertEqual(self.index.update(self.tempdir).added,
+                         len(self.samplefiles))
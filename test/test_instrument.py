@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Test suite for the instrumentation of the exempi wrappers.
+"""
+
+import unittest
+
+from libxmp import XMPMeta, XMPIterator
+from libxmp import exempi
+from libxmp import instrument
+
+from . import xmpcoverage
+
+
+class InstrumentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_enable_disable(self):
+        original = exempi.parse
+        instrument.enable()
+        self.assertTrue(instrument.is_enabled())
+        self.assertIsNot(exempi.parse, original)
+
+        xmp = XMPMeta()
+        xmp.parse_from_str(xmpcoverage.RDFCoverage, xmpmeta_wrap=True)
+        nodes = len(list(XMPIterator(xmp)))
+        stats = instrument.snapshot()
+        self.assertEqual(stats['parse']['calls'], 1)
+        self.assertEqual(stats['parse']['errors'], 0)
+        self.assertTrue(stats['parse']['seconds'] > 0)
+        # The final call ending the iteration is not an error.
+        self.assertEqual(stats['iterator_next']['calls'], nodes + 1)
+        self.assertEqual(stats['iterator_next']['errors'], 0)
+
+        instrument.disable()
+        self.assertFalse(instrument.is_enabled())
+        self.assertIs(exempi.parse, original)
+        xmp.parse_from_str(xmpcoverage.RDFCoverage, xmpmeta_wrap=True)
+        self.assertEqual(instrument.snapshot()['parse']['calls'], 1)
+
+        instrument.reset()
+        self.assertEqual(instrument.snapshot(), {})
+
+    def test_errors(self):
+        def fail():
+            raise ValueError('failed')
+
+        wrapper = instrument._instrumented('fail', fail)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                wrapper()
+        stats = instrument.snapshot()['fail']
+        self.assertEqual((stats['calls'], stats['errors']), (2, 2))
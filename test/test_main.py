@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Test suite for the command line interface.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from libxmp.__main__ import main
+from libxmp.consts import XMP_NS_DC as NS_DC
+
+from .common_fixtures import setup_sample_files
+
+
+class DumpTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.samplefiles, _ = setup_sample_files(self.tempdir)
+        self.outdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.outdir, 'out.ndjson')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        shutil.rmtree(self.outdir)
+
+    def dump(self, *args):
+        self.assertEqual(main(['dump', self.tempdir, '-o', self.output]
+                              + list(args)), 0)
+        with open(self.output) as fptr:
+            return [json.loads(line) for line in fptr]
+
+    def test_dump(self):
+        records = self.dump('--workers', '2', '--ordered')
+        self.assertEqual([record['path'] for record in records],
+                         sorted(self.samplefiles))
+        for record in records:
+            self.assertIsNone(record['error'])
+        self.assertTrue(any(record['xmp'] for record in records))
+
+    def test_dump_bad_workers(self):
+        """An invalid number of workers is a usage error."""
+        for workers in ('0', '-1', 'two'):
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm:
+                    main(['dump', self.tempdir, '--workers', workers])
+            self.assertEqual(cm.exception.code, 2)
+            self.assertIn('positive integer', stderr.getvalue())
+
+    def test_dump_skips_output(self):
+        """An output file inside the dumped tree is not dumped itself."""
+        self.output = os.path.join(self.tempdir, 'out.ndjson')
+        records = self.dump()
+        self.assertEqual(sorted(record['path'] for record in records),
+                         sorted(self.samplefiles))
+
+    def test_dump_bad_files(self):
+        """Odd files get a line of their own and do not stop the dump."""
+        jpeg = os.path.join(self.tempdir, 'BlueSquare.jpg')
+        undecodable = os.path.join(self.tempdir, os.fsdecode(b'b\xff.jpg'))
+        shutil.copyfile(jpeg, undecodable)
+        dangling = os.path.join(self.tempdir, 'dangling.jpg')
+        os.symlink(os.path.join(self.tempdir, 'missing.jpg'), dangling)
+
+        records = {record['path']: record for record in self.dump()}
+        self.assertEqual(sorted(records),
+                         sorted(self.samplefiles + [undecodable, dangling]))
+        self.assertIsNone(records[undecodable]['error'])
+        self.assertEqual(records[undecodable]['xmp'], records[jpeg]['xmp'])
+        self.assertIsNone(records[dangling]['xmp'])
+        self.assertIsNotNone(records[dangling]['error'])
+
+    def test_dump_filters(self):
+        records = self.dump('--schema', 'dc', '--property', 'dc:format')
+        self.assertTrue(any(record['xmp'] for record in records))
+        for record in records:
+            for schema, props in (record['xmp'] or {}).items():
+                self.assertEqual(schema, NS_DC)
+                self.assertEqual([name for name, _, _ in props],
+                                 ['dc:format'])
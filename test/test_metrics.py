@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+"""
+Test suite for the Prometheus metrics of libxmp operations.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from libxmp import XMPError, XMPFiles
+from libxmp import files, metrics
+from libxmp.consts import XMP_FT_JPEG
+from libxmp.files import FileEvent
+
+from .common_fixtures import setup_sample_files
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_render(self):
+        error = XMPError('bad object')
+        error.code = -3
+        events = [
+            FileEvent('get_xmp', '/a.jpg', XMP_FT_JPEG, 0, 0, 100, 0.003,
+                      None),
+            FileEvent('put_xmp', '/a.jpg', XMP_FT_JPEG, 0, 0, 120, 0.02,
+                      None),
+            FileEvent('open_file', '/b', None, None, None, None, 0.5, error),
+        ]
+        for event in events:
+            metrics._record(event)
+        lines = metrics.render().splitlines()
+
+        self.assertIn('# TYPE libxmp_file_operations_total counter', lines)
+        self.assertIn('libxmp_file_operations_total'
+                      '{format="jpeg",operation="get_xmp"} 1', lines)
+        self.assertIn('libxmp_xmp_read_bytes_total{format="jpeg"} 100', lines)
+        self.assertIn('libxmp_xmp_written_bytes_total{format="jpeg"} 120',
+                      lines)
+        self.assertIn('libxmp_errors_total{code="-3",message="bad object",'
+                      'operation="open_file",type="XMPError"} 1', lines)
+        self.assertIn('libxmp_file_operation_duration_seconds_bucket'
+                      '{format="jpeg",le="0.0025",operation="get_xmp"} 0',
+                      lines)
+        self.assertIn('libxmp_file_operation_duration_seconds_bucket'
+                      '{format="jpeg",le="0.005",operation="get_xmp"} 1',
+                      lines)
+        self.assertIn('libxmp_file_operation_duration_seconds_bucket'
+                      '{format="none",le="+Inf",operation="open_file"} 1',
+                      lines)
+        self.assertIn('libxmp_file_operation_duration_seconds_count'
+                      '{format="none",operation="open_file"} 1', lines)
+
+        metrics.reset()
+        self.assertNotIn('libxmp_xmp_read_bytes_total{format="jpeg"} 100',
+                         metrics.render().splitlines())
+
+    def test_enable_buckets(self):
+        """Changing the buckets resets every metric; the hook is added
+        once."""
+        metrics._record(FileEvent('get_xmp', '/a.jpg', XMP_FT_JPEG, 0, 0,
+                                  100, 0.003, None))
+        try:
+            metrics.enable(buckets=[1.0])
+            metrics.enable(buckets=[1.0])
+            self.assertEqual(files._trace_hooks.count(metrics._record), 1)
+            self.assertNotIn('libxmp_xmp_read_bytes_total{format="jpeg"} 100',
+                             metrics.render().splitlines())
+            self.assertNotIn('libxmp_file_operations_total'
+                             '{format="jpeg",operation="get_xmp"} 1',
+                             metrics.render().splitlines())
+        finally:
+            metrics.enable()
+            metrics.disable()
+        self.assertNotIn(metrics._record, files._trace_hooks)
+
+    def test_file_operations(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            setup_sample_files(tempdir)
+            filename = os.path.join(tempdir, 'BlueSquare.jpg')
+            metrics.enable()
+            with XMPFiles(file_path=filename) as xmpfile:
+                xmpfile.get_xmp()
+        finally:
+            shutil.rmtree(tempdir)
+
+        lines = metrics.render().splitlines()
+        for operation in ('open_file', 'get_xmp', 'close_file'):
+            self.assertIn('libxmp_file_operations_total'
+                          '{{format="jpeg",operation="{0}"}} 1'
+                          .format(operation), lines)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2008-2009, European Space Agency & European Southern
+# Observatory (ESA/ESO)
+# Copyright (c) 2008-2009, CRS4 - Centre for Advanced Studies, Research and
+# Development in Sardinia
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#     * Neither the name of the European Space Agency, European Southern
+#       Observatory, CRS4 nor the names of its contributors may be used to
+#       endorse or promote products derived from this software without specific
+#       prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY ESA/ESO AND CRS4 ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL ESA/ESO BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER # IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
+
+import unittest
+
+import libxmp
+from libxmp import XMPMeta
+from libxmp.consts import XMP_NS_DC as NS_DC
+from libxmp.consts import XMP_NS_XMP as NS_XAP
+from libxmp.patch import Change
+
+from . import xmpcoverage
+
+
+class DiffPatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.old = XMPMeta()
+        self.old.parse_from_str(xmpcoverage.RDFCoverage, xmpmeta_wrap=True)
+
+    def roundtrip(self, new):
+        patch = libxmp.diff(self.old, new)
+        replica = self.old.clone()
+        libxmp.apply_patch(replica, patch)
+        self.assertEqual(replica, new)
+        return patch
+
+    def test_no_changes(self):
+        self.assertEqual(libxmp.diff(self.old, self.old.clone()), [])
+
+    def test_simple_property(self):
+        new = self.old.clone()
+        new.set_property(NS_XAP, 'CreatorTool', 'libxmp')
+        patch = self.roundtrip(new)
+        self.assertEqual(patch, [Change('add', NS_XAP, 'xmp:CreatorTool',
+                                        'libxmp', 0)])
+
+        newer = new.clone()
+        newer.set_property(NS_XAP, 'CreatorTool', 'libxmp 2')
+        self.assertEqual(libxmp.diff(new, newer),
+                         [Change('change', NS_XAP, 'xmp:CreatorTool',
+                                 'libxmp 2', 0)])
+
+    def test_arrays(self):
+        new = self.old.clone()
+        new.append_array_item(NS_DC, 'subject', 'one',
+                              {'prop_value_is_array': True})
+        new.append_array_item(NS_DC, 'subject', 'two')
+        new.set_localized_text(NS_DC, 'title', None, 'x-default', 'Title')
+        self.roundtrip(new)
+
+        # Removing the array again is a single change.
+        newer = new.clone()
+        newer.delete_property(NS_DC, 'subject')
+        self.assertEqual(libxmp.diff(new, newer),
+                         [Change('remove', NS_DC, 'dc:subject', None, None)])
+
+    def test_removed_items(self):
+        new = self.old.clone()
+        for value in ('one', 'two', 'three'):
+            new.append_array_item(NS_DC, 'subject', value,
+                                  {'prop_value_is_array': True})
+        self.old = new.clone()
+        new.delete_property(NS_DC, 'subject[1]')
+        new.delete_property(NS_DC, 'subject[1]')
+        patch = self.roundtrip(new)
+        self.assertEqual([c.op for c in patch],
+                         ['remove', 'remove', 'change'])
@@ -11,8 +11,6 @@ import shutil
 import sys
 import tempfile
 
-import pytz
-
 import unittest
 
 from libxmp import XMPFiles, XMPMeta